@@ -1,31 +1,75 @@
-import streamlit as st
+import os
+import shutil
+import tempfile
+import time
+
 import pandas as pd
-from io import BytesIO
+import streamlit as st
+
+from conversion_xls import convertir_lote, preparar_entradas
+from paralelo import trabajadores_por_defecto
 
 st.title("Convertidor XLS a XLSX")
 
-uploaded_file = st.file_uploader("Sube tu archivo .xls aquí", type=["xls"])
+uploaded_files = st.file_uploader("Sube tus archivos .xls (o un ZIP con varios) aquí",
+                                  type=["xls", "zip"], accept_multiple_files=True)
+trabajadores = st.number_input("Procesos en paralelo", min_value=1, max_value=32,
+                               value=trabajadores_por_defecto(), step=1)
+
+# Cada conversión trabaja en su propia carpeta temporal. Solo se conserva la de la
+# última conversión de la sesión (la del ZIP que se ofrece para descargar): al
+# empezar otra, o si la nueva falla, la carpeta que sobra se borra.
+def borrar_conversion_anterior():
+    carpeta = st.session_state.pop("carpeta_conversion", None)
+    st.session_state.pop("conversion", None)
+    if carpeta:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
 
-if uploaded_file is not None:
+if uploaded_files and st.button("Convertir"):
+    borrar_conversion_anterior()
+    carpeta = tempfile.mkdtemp(prefix="xls_")
+    st.session_state["carpeta_conversion"] = carpeta
     try:
-        # Leer archivo .xls con xlrd
-        df = pd.read_excel(uploaded_file, engine='xlrd')
+        # Los archivos subidos se copian a disco y cada proceso lee el suyo; el ZIP de
+        # salida se arma a medida que terminan, sin juntar todos los libros en memoria
+        rutas = preparar_entradas([(archivo.name, archivo) for archivo in uploaded_files], carpeta)
+        if not rutas:
+            raise ValueError("no se encontraron archivos .xls")
 
-        # Convertir DataFrame a archivo Excel en memoria (.xlsx)
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False)
-        data = output.getvalue()
+        barra = st.progress(0.0)
+        estado = st.empty()
 
-        st.success("Archivo convertido correctamente!")
+        def progreso(completados, total, archivo):
+            barra.progress(completados / total if total else 1.0)
+            estado.text(f"Convertidos {completados}/{total} (último: {archivo})")
 
-        # Botón para descargar el archivo .xlsx convertido
+        inicio = time.perf_counter()
+        ruta_zip, resumen = convertir_lote(rutas, os.path.join(carpeta, "archivos_convertidos.zip"),
+                                           trabajadores=int(trabajadores), progreso=progreso)
+        # Los .xls copiados ya no hacen falta: en la carpeta queda solo el ZIP
+        for ruta in rutas:
+            os.remove(ruta)
+        st.session_state["conversion"] = (ruta_zip, resumen, time.perf_counter() - inicio)
+    except Exception as e:
+        borrar_conversion_anterior()
+        st.error(f"Error al convertir los archivos: {e}")
+
+if "conversion" in st.session_state:
+    ruta_zip, resumen, segundos = st.session_state["conversion"]
+    errores = [fila for fila in resumen if fila["estado"] != "ok"]
+    if errores:
+        st.warning(f"{len(errores)} de {len(resumen)} archivos no se pudieron convertir.")
+    else:
+        st.success("Archivos convertidos correctamente!")
+    st.dataframe(pd.DataFrame(resumen))
+    st.markdown(f"**Tiempo total:** {segundos:.1f} s")
+
+    # Botón para descargar los archivos .xlsx convertidos
+    with open(ruta_zip, "rb") as f:
         st.download_button(
-            label="Descargar archivo convertido (.xlsx)",
-            data=data,
-            file_name="archivo_convertido.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            label="Descargar archivos convertidos (ZIP)",
+            data=f,
+            file_name="archivos_convertidos.zip",
+            mime="application/zip"
         )
-
-    except Exception as e:
-        st.error(f"Error al convertir el archivo: {e}")
\ No newline at end of file
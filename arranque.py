@@ -0,0 +1,119 @@
+import argparse
+import base64
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+# Momento en que el proceso cargó este módulo (el primer import de la app)
+INICIO = time.perf_counter()
+
+# Módulos pesados que la app usa recién al subir archivos o generar
+MODULOS_APP = ("pandas", "openpyxl", "st_aggrid", "beneficiarios", "ingesta", "plantillas", "generacion")
+
+# Etapas medidas en este proceso: etapa -> (segundos, error o None), en orden
+_etapas = {}
+_lock = threading.Lock()
+_hilo = None
+
+
+# Mide una etapa del precalentamiento; un error queda anotado en lugar de propagarse
+@contextmanager
+def _etapa(etapa):
+    inicio = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        with _lock:
+            _etapas[etapa] = (time.perf_counter() - inicio, error)
+
+
+# Regla @font-face con la fuente incrustada en base64; se lee y codifica una sola vez
+# por proceso en lugar de en cada rerun de Streamlit
+@lru_cache(maxsize=None)
+def css_fuente(ruta, familia):
+    with open(ruta, "rb") as f:
+        datos = base64.b64encode(f.read()).decode()
+    return (f"@font-face {{ font-family: '{familia}'; "
+            f"src: url(data:font/ttf;base64,{datos}) format('truetype'); }}")
+
+
+# Lo que la primera generación pagaría: importar los módulos pesados, leer la
+# plantilla completa, cargar el logo y abrir el convertidor de PDF. Cada etapa
+# se mide por separado y un error (p. ej. sin LibreOffice) no detiene las demás.
+def _precalentar(modulos, logo_path, convertidor, plantilla):
+    inicio = time.perf_counter()
+    for modulo in modulos:
+        with _etapa(f"importar {modulo}"):
+            importlib.import_module(modulo)
+
+    from plantillas import RUTA_PLANTILLA, hojas_plantilla, leer_imagen
+    with _etapa("leer plantilla"):
+        hojas_plantilla(plantilla or RUTA_PLANTILLA)
+    with _etapa("cargar logo"):
+        leer_imagen(logo_path)
+
+    if convertidor:
+        from conversion_pdf import DIRECTO, obtener_convertidor
+        with _etapa(f"convertidor {convertidor}"):
+            if convertidor == DIRECTO:
+                from pdf_directo import precalentar_fondos
+                precalentar_fondos(logo_path=logo_path, plantilla=plantilla or RUTA_PLANTILLA)
+            else:
+                obtener_convertidor(convertidor)
+    with _lock:
+        _etapas["precalentamiento completo"] = (time.perf_counter() - inicio, None)
+
+
+# Inicia el precalentamiento en un hilo de fondo, una sola vez por proceso: los
+# reruns de Streamlit lo encuentran ya iniciado. Si el usuario genera antes de que
+# termine, la lectura de la plantilla espera a la que está en curso en vez de repetirla.
+def precalentar(modulos=MODULOS_APP, logo_path="logo_maga.png", convertidor=None, plantilla=None):
+    global _hilo
+    with _lock:
+        if _hilo is None:
+            _hilo = threading.Thread(target=_precalentar, args=(modulos, logo_path, convertidor, plantilla),
+                                     name="precalentamiento", daemon=True)
+            _hilo.start()
+        return _hilo
+
+
+def precalentamiento_listo():
+    return _hilo is not None and not _hilo.is_alive()
+
+
+# Tiempos de arranque medidos hasta ahora, para mostrarlos en la app o en consola
+def reporte_arranque():
+    with _lock:
+        etapas = list(_etapas.items())
+    filas = [{"etapa": etapa, "segundos": round(segundos, 3), "estado": error or "ok"}
+             for etapa, (segundos, error) in etapas]
+    if not precalentamiento_listo():
+        filas.append({"etapa": "precalentamiento", "segundos": round(time.perf_counter() - INICIO, 3),
+                      "estado": "en curso" if _hilo is not None else "no iniciado"})
+    return filas
+
+
+# Uso desde consola: mide el arranque completo sin Streamlit
+#   python arranque.py --convertidor directo
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Mide el tiempo de arranque de la app de planillas.")
+    parser.add_argument("--convertidor", default=None,
+                        help="Convertidor de PDF a abrir (excel, libreoffice o directo)")
+    parser.add_argument("--plantilla", default=None)
+    parser.add_argument("--logo", default="logo_maga.png")
+    args = parser.parse_args(argumentos)
+
+    precalentar(convertidor=args.convertidor, logo_path=args.logo, plantilla=args.plantilla).join()
+    reporte = reporte_arranque()
+    for fila in reporte:
+        print(f"{fila['etapa']:<30} {fila['segundos']:>8.3f} s  {fila['estado']}")
+    return 0 if all(fila["estado"] == "ok" for fila in reporte) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
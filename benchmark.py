@@ -0,0 +1,310 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from io import BytesIO
+
+# Mide cada etapa de la generación de planillas con datos sintéticos (ver
+# sinteticos.py) y guarda el resultado en un historial JSON, comparándolo con la
+# corrida anterior de la misma escala para ver regresiones entre versiones. Corre
+# sin Streamlit ni Excel; las etapas que necesitan algo ausente (p. ej. LibreOffice)
+# quedan como "omitida".
+#
+#   python benchmark.py --beneficiarios 10 1000 100000
+#   python benchmark.py --beneficiarios 5000 --etapas llenar_planilla guardar_xlsx
+
+HISTORIAL = os.path.join("benchmarks", "historial.json")
+# Una etapa más lenta que la corrida anterior por encima de este margen se marca
+# (y por más de MINIMO_REGRESION segundos, para no marcar ruido en etapas de milisegundos)
+UMBRAL_REGRESION = 0.20
+MINIMO_REGRESION = 0.005
+# Hoja de la planilla de entrega, la que se mide en las etapas de plantilla
+HOJA = "PLANILLAS"
+
+
+# Ejecuta `funcion` `repeticiones` veces; devuelve (mínimo, mediana) en segundos y
+# el último resultado
+def _medir(funcion, repeticiones):
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), statistics.median(tiempos), resultado
+
+
+# Estado compartido entre etapas de una corrida (datos leídos, libro lleno, etc.)
+class _Contexto:
+    def __init__(self, beneficiarios, semilla, repeticiones, plantilla):
+        import sinteticos
+        self.repeticiones = repeticiones
+        self.plantilla = plantilla
+        self.df_comunidades, self.df_beneficiarios = sinteticos.generar_datos(beneficiarios, semilla=semilla)
+        self.excel_comunidades = sinteticos.a_excel(self.df_comunidades)
+        self.excel_beneficiarios = sinteticos.a_excel(self.df_beneficiarios)
+        self.indice = None
+        self.wb = None
+
+    # La comunidad con más beneficiarios: la planilla con más páginas
+    def comunidad_mayor(self):
+        from generacion import datos_comunidad
+        filas = self.df_comunidades.to_dict(orient="records")
+        fila = max(filas, key=lambda f: self.indice.cantidad(f["Comunidad/ Establecimiento"]))
+        registros = self.indice.registros(fila["Comunidad/ Establecimiento"])
+        return datos_comunidad(fila, "DAPA", "DAPA-001-2025", 1, len(registros)), registros
+
+
+def _etapa_ingesta_comunidades(ctx):
+    from ingesta import leer_comunidades
+    minimo, mediana, df = _medir(lambda: leer_comunidades(ctx.excel_comunidades), ctx.repeticiones)
+    return {"segundos": minimo, "mediana": mediana, "filas": len(df), "bytes": len(ctx.excel_comunidades)}
+
+
+def _etapa_ingesta_beneficiarios(ctx):
+    from ingesta import _leer_columnas_beneficiarios, motor_excel
+
+    # La misma lectura que ingesta.leer_beneficiarios, sin su cache en disco
+    minimo, mediana, df = _medir(lambda: _leer_columnas_beneficiarios(ctx.excel_beneficiarios), ctx.repeticiones)
+    ctx.df_leido = df
+    return {"segundos": minimo, "mediana": mediana, "filas": len(df), "bytes": len(ctx.excel_beneficiarios),
+            "motor": motor_excel() or "openpyxl"}
+
+
+def _etapa_armar_nombres(ctx):
+    from beneficiarios import IndiceBeneficiarios
+    df = getattr(ctx, "df_leido", ctx.df_beneficiarios)
+    minimo, mediana, indice = _medir(lambda: IndiceBeneficiarios(df), ctx.repeticiones)
+    ctx.indice = indice
+    return {"segundos": minimo, "mediana": mediana, "filas": len(indice), "comunidades": len(indice.comunidades())}
+
+
+# La lectura en frío no depende de la escala: se mide una vez por proceso y plantilla
+_plantilla_fria = {}
+
+
+def _etapa_plantilla_fria(ctx):
+    from plantillas import hojas_plantilla, limpiar_cache_plantillas
+    if ctx.plantilla not in _plantilla_fria:
+        limpiar_cache_plantillas()
+        inicio = time.perf_counter()
+        hojas = hojas_plantilla(ctx.plantilla)
+        _plantilla_fria[ctx.plantilla] = {"segundos": time.perf_counter() - inicio, "hojas": len(hojas)}
+    return _plantilla_fria[ctx.plantilla]
+
+
+def _etapa_plantilla_copia(ctx):
+    from plantillas import obtener_plantilla
+    obtener_plantilla(HOJA, ctx.plantilla)
+    minimo, mediana, _ = _medir(lambda: obtener_plantilla(HOJA, ctx.plantilla), ctx.repeticiones)
+    return {"segundos": minimo, "mediana": mediana}
+
+
+def _etapa_llenar_planilla(ctx):
+    from generacion import llenar_planilla
+    datos, registros = ctx.comunidad_mayor()
+    minimo, mediana, wb = _medir(lambda: llenar_planilla("entrega", datos, registros, plantilla=ctx.plantilla),
+                                 ctx.repeticiones)
+    ctx.wb = wb
+    return {"segundos": minimo, "mediana": mediana, "beneficiarios": len(registros), "hojas": len(wb.worksheets)}
+
+
+def _etapa_set_cell_value_safe(ctx):
+    from plantillas import obtener_plantilla, set_cell_value_safe
+    ws = obtener_plantilla(HOJA, ctx.plantilla)[HOJA]
+    llamadas = 10_000
+
+    def escribir():
+        for i in range(llamadas):
+            set_cell_value_safe(ws, 12 + i % 20, "B", "Nombre de prueba")
+
+    minimo, mediana, _ = _medir(escribir, ctx.repeticiones)
+    return {"segundos": minimo, "mediana": mediana, "llamadas": llamadas,
+            "microsegundos_por_llamada": round(minimo / llamadas * 1e6, 3)}
+
+
+def _etapa_guardar_xlsx(ctx):
+    from plantillas import guardar_libro
+    if ctx.wb is None:
+        _etapa_llenar_planilla(ctx)
+
+    def guardar():
+        salida = BytesIO()
+        guardar_libro(ctx.wb, salida)
+        return salida.getvalue()
+
+    minimo, mediana, datos = _medir(guardar, ctx.repeticiones)
+    return {"segundos": minimo, "mediana": mediana, "bytes": len(datos)}
+
+
+def _etapa_pdf_directo(ctx):
+    from pdf_directo import renderizar_planilla
+    datos, registros = ctx.comunidad_mayor()
+    renderizar_planilla("entrega", datos, registros, plantilla=ctx.plantilla)  # fondos de la plantilla
+    minimo, mediana, pdf = _medir(lambda: renderizar_planilla("entrega", datos, registros, plantilla=ctx.plantilla),
+                                  ctx.repeticiones)
+    return {"segundos": minimo, "mediana": mediana, "bytes": len(pdf)}
+
+
+def _etapa_pdf_libreoffice(ctx):
+    import tempfile
+    from conversion_pdf import convertir_a_pdf, obtener_convertidor
+    from plantillas import guardar_libro
+    obtener_convertidor("libreoffice")  # sin LibreOffice la etapa queda omitida
+    if ctx.wb is None:
+        _etapa_llenar_planilla(ctx)
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "planilla.xlsx")
+        guardar_libro(ctx.wb, ruta)
+        minimo, mediana, pdf = _medir(lambda: convertir_a_pdf(ruta, nombre="libreoffice"), ctx.repeticiones)
+        return {"segundos": minimo, "mediana": mediana, "bytes": os.path.getsize(pdf)}
+
+
+def _etapa_lote(ctx):
+    from generacion import generar_lote
+    from conversion_pdf import DIRECTO
+    inicio = time.perf_counter()
+    resumen, archivo_zip, _ = generar_lote(ctx.df_comunidades, ctx.indice, ["entrega"], "DAPA-001-2025", "DAPA",
+                                           convertidor=DIRECTO, plantilla=ctx.plantilla, espejo=False)
+    segundos = time.perf_counter() - inicio
+    tamano = 0
+    if archivo_zip:
+        tamano = archivo_zip.seek(0, os.SEEK_END)
+        archivo_zip.close()
+    return {"segundos": segundos, "comunidades": len(resumen), "bytes": tamano}
+
+
+# Etapas en el orden en que se ejecutan; las que dependen de otras las encuentran ya hechas
+ETAPAS = {
+    "ingesta_comunidades": _etapa_ingesta_comunidades,
+    "ingesta_beneficiarios": _etapa_ingesta_beneficiarios,
+    "armar_nombres": _etapa_armar_nombres,
+    "plantilla_fria": _etapa_plantilla_fria,
+    "plantilla_copia": _etapa_plantilla_copia,
+    "llenar_planilla": _etapa_llenar_planilla,
+    "set_cell_value_safe": _etapa_set_cell_value_safe,
+    "guardar_xlsx": _etapa_guardar_xlsx,
+    "pdf_directo": _etapa_pdf_directo,
+    "pdf_libreoffice": _etapa_pdf_libreoffice,
+    "lote": _etapa_lote,
+}
+# Etapas que se omiten si no se piden explícitamente (tardan minutos a gran escala)
+ETAPAS_OPCIONALES = ("lote",)
+
+
+def _version():
+    try:
+        salida = subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return salida.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# Corre las etapas para una escala; devuelve el registro que va al historial
+def medir(beneficiarios, etapas=None, semilla=0, repeticiones=3, plantilla=None):
+    from plantillas import RUTA_PLANTILLA
+    etapas = etapas or [etapa for etapa in ETAPAS if etapa not in ETAPAS_OPCIONALES]
+    ctx = _Contexto(beneficiarios, semilla, repeticiones, plantilla or RUTA_PLANTILLA)
+    # El índice de beneficiarios lo necesitan casi todas las etapas
+    if "armar_nombres" not in etapas:
+        from beneficiarios import IndiceBeneficiarios
+        ctx.indice = IndiceBeneficiarios(ctx.df_beneficiarios)
+
+    resultados = {}
+    for etapa in ETAPAS:
+        if etapa not in etapas:
+            continue
+        try:
+            resultados[etapa] = {clave: round(valor, 6) if isinstance(valor, float) else valor
+                                 for clave, valor in ETAPAS[etapa](ctx).items()}
+        except Exception as e:
+            resultados[etapa] = {"omitida": f"{type(e).__name__}: {e}"}
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "version": _version(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "escala": {"beneficiarios": beneficiarios, "comunidades": len(ctx.df_comunidades), "semilla": semilla},
+        "etapas": resultados,
+    }
+
+
+def leer_historial(ruta=HISTORIAL):
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def guardar_historial(historial, ruta=HISTORIAL):
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(historial, f, ensure_ascii=False, indent=1)
+    os.replace(temporal, ruta)
+
+
+# Compara una corrida con la última del historial de la misma escala; devuelve por
+# etapa (segundos antes, segundos ahora, cambio relativo)
+def comparar(corrida, historial):
+    anteriores = [r for r in historial if r["escala"] == corrida["escala"]]
+    if not anteriores:
+        return {}
+    anterior = anteriores[-1]["etapas"]
+    cambios = {}
+    for etapa, medida in corrida["etapas"].items():
+        antes = anterior.get(etapa, {}).get("segundos")
+        ahora = medida.get("segundos")
+        if antes and ahora is not None:
+            cambios[etapa] = (antes, ahora, (ahora - antes) / antes)
+    return cambios
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Mide las etapas de la generación de planillas con datos sintéticos.")
+    parser.add_argument("--beneficiarios", type=int, nargs="+", default=[1000],
+                        help="Escalas a medir (cantidad total de beneficiarios)")
+    parser.add_argument("--etapas", nargs="+", choices=list(ETAPAS), default=None,
+                        help=f"Etapas a medir (por defecto todas menos {', '.join(ETAPAS_OPCIONALES)})")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--plantilla", default=None)
+    parser.add_argument("--historial", default=HISTORIAL, help="Archivo JSON donde se acumulan las corridas")
+    parser.add_argument("--sin-guardar", action="store_true", help="No agregar la corrida al historial")
+    parser.add_argument("--estricto", action="store_true", help="Salir con error si alguna etapa empeoró")
+    args = parser.parse_args(argumentos)
+
+    historial = leer_historial(args.historial)
+    regresiones = 0
+    for beneficiarios in args.beneficiarios:
+        corrida = medir(beneficiarios, args.etapas, args.semilla, args.repeticiones, args.plantilla)
+        cambios = comparar(corrida, historial)
+        print(f"\n{beneficiarios} beneficiarios, {corrida['escala']['comunidades']} comunidades ({corrida['version']})")
+        for etapa, medida in corrida["etapas"].items():
+            if "omitida" in medida:
+                print(f"  {etapa:<22} omitida: {medida['omitida']}")
+                continue
+            linea = f"  {etapa:<22} {medida['segundos']:>10.4f} s"
+            if etapa in cambios:
+                antes, ahora, cambio = cambios[etapa]
+                linea += f"  {cambio:+.0%}"
+                if cambio > UMBRAL_REGRESION and ahora - antes > MINIMO_REGRESION:
+                    linea += "  REGRESIÓN"
+                    regresiones += 1
+            print(linea)
+        historial.append(corrida)
+    if not args.sin_guardar:
+        guardar_historial(historial, args.historial)
+        print(f"\nHistorial: {args.historial}")
+    return 1 if args.estricto and regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
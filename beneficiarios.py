@@ -0,0 +1,113 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+from cui import IndiceCUI
+
+COLUMNAS_NOMBRE = ['PRIMER NOMBRE', 'SEGUNDO NOMBRE', 'TERCER NOMBRE', 'PRIMER APELLIDO', 'SEGUNDO APELLIDO', 'APELLIDO CASADA']
+COLUMNAS_NECESARIAS = COLUMNAS_NOMBRE + ['CUI']
+# Únicas columnas del archivo de beneficiarios que usa la generación
+COLUMNAS_BENEFICIARIOS = ['REFERENCIA'] + COLUMNAS_NECESARIAS
+
+
+# Clave con la que se compara una comunidad con la columna Referencia
+def clave_comunidad(comunidad):
+    return str(comunidad).strip().lower()
+
+
+# Nombre de columna sin espacios sobrantes ni \xa0, en mayúsculas
+def canonizar_columna(nombre):
+    return str(nombre).replace('\xa0', ' ').strip().upper()
+
+
+def canonizar_columnas(columnas):
+    return pd.Index([canonizar_columna(nombre) for nombre in columnas])
+
+
+# CUI como texto; los CUI leídos como número con decimales (por celdas vacías) pierden el ".0"
+def cui_a_texto(serie):
+    if pd.api.types.is_float_dtype(serie):
+        valores = serie.dropna()
+        if (valores == valores.round()).all():
+            return serie.astype('Int64').astype(str).where(serie.notna(), '')
+    return serie.fillna('').astype(str).str.strip()
+
+
+# Nombre completo de todas las filas en una sola pasada
+def armar_nombre_completo(df):
+    partes = df[COLUMNAS_NOMBRE].fillna('').astype(str)
+    return (
+        partes[COLUMNAS_NOMBRE[0]].str.cat([partes[col] for col in COLUMNAS_NOMBRE[1:]], sep=' ')
+    ).str.replace(r'\s+', ' ', regex=True).str.strip()
+
+
+# Archivo de beneficiarios normalizado una sola vez al subirlo: columnas canónicas,
+# referencia en minúsculas, nombre completo y CUI para todas las filas y un mapa
+# comunidad -> posiciones de sus filas. Ver una comunidad es un corte directo.
+class IndiceBeneficiarios:
+    def __init__(self, df_beneficiarios):
+        df = df_beneficiarios.reset_index(drop=True)
+        df.columns = canonizar_columnas(df.columns)
+        if 'REFERENCIA' not in df.columns:
+            raise ValueError("No se encontró la columna 'Referencia' en beneficiarios.")
+        df['REFERENCIA'] = df['REFERENCIA'].astype(str).str.strip().str.lower()
+        self.df = df
+        self.ref_col = 'REFERENCIA'
+
+        # Solo se arma el listado si están todas las columnas de nombre y CUI
+        self.completo = all(col in df.columns for col in COLUMNAS_NECESARIAS)
+        if self.completo:
+            self.nombres = pd.DataFrame({
+                'NOMBRE COMPLETO': armar_nombre_completo(df),
+                'CUI': cui_a_texto(df['CUI']),
+            })
+            # CUI repetidos o en varias comunidades, para revisarlos antes de generar (ver cui.py)
+            self.indice_cui = IndiceCUI(self.nombres['CUI'], df['REFERENCIA'])
+        else:
+            self.nombres = None
+            self.indice_cui = None
+
+        self.grupos = df.groupby('REFERENCIA', sort=False).indices
+        # Comunidad -> referencias que se le asignaron aunque no se escriban igual (ver
+        # coincidencias.emparejar); sin asignar, una comunidad toma su referencia exacta
+        self.asignadas = {}
+
+    def __len__(self):
+        return len(self.df)
+
+    def comunidades(self):
+        return list(self.grupos)
+
+    # Copia del índice (comparte el DataFrame y los grupos, que no cambian) con las
+    # referencias asignadas a cada comunidad; este índice queda como estaba
+    def con_asignadas(self, asignadas):
+        indice = copy.copy(self)
+        indice.asignadas = {clave_comunidad(comunidad): list(referencias) for comunidad, referencias in asignadas.items()}
+        return indice
+
+    def posiciones(self, comunidad):
+        clave = clave_comunidad(comunidad)
+        referencias = self.asignadas.get(clave)
+        if not referencias:
+            return self.grupos.get(clave, [])
+        if len(referencias) == 1:
+            return self.grupos[referencias[0]]
+        return np.sort(np.concatenate([self.grupos[referencia] for referencia in referencias]))
+
+    def cantidad(self, comunidad):
+        return len(self.posiciones(comunidad))
+
+    # Filas originales (normalizadas) de la comunidad
+    def filas(self, comunidad):
+        return self.df.iloc[self.posiciones(comunidad)]
+
+    # Nombre completo y CUI de la comunidad (None si faltan columnas)
+    def listado(self, comunidad):
+        if self.nombres is None:
+            return None
+        return self.nombres.iloc[self.posiciones(comunidad)]
+
+    def registros(self, comunidad):
+        listado = self.listado(comunidad)
+        return [] if listado is None else listado.to_dict(orient='records')
@@ -0,0 +1,118 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+from manifiesto import huella
+
+# Caché en disco de PDF ya generados, por contenido: la clave es la huella de todo lo
+# que define la planilla (tipo, plantilla, logo, encabezado, beneficiarios, convertidor;
+# ver manifiesto.huella), así que volver a pedir la misma planilla devuelve el PDF
+# anterior sin llenar ni convertir nada. Cuando la carpeta pasa de `max_bytes` se
+# borran los menos usados (cada acierto renueva la fecha del archivo).
+#
+#   cache = cache_por_defecto()
+#   clave = clave_planilla("entrega", datos, beneficiarios, "directo", plantilla, logo)
+#   datos_pdf = cache.obtener(clave)   # None si no está
+#   cache.guardar(clave, datos_pdf)
+
+# Carpeta (dentro de la cache de la app, como la de ingesta) y tamaño máximo en MB (0 la
+# desactiva), configurables por variable de entorno
+CARPETA_CACHE = os.path.join(
+    os.environ.get("PLANILLAS_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "planillas")), "pdf")
+MAX_MB = int(os.environ.get("PLANILLAS_CACHE_MB", "512"))
+# Al recortar se deja la carpeta en esta fracción del máximo, para no recortar en cada guardado
+LLENADO_TRAS_RECORTE = 0.9
+
+
+# Clave de una planilla en la caché
+def clave_planilla(tipo, datos, beneficiarios, convertidor, plantilla, logo_path):
+    contenido = f"{tipo}:{huella(datos, beneficiarios, convertidor, plantilla, logo_path)}"
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+class CachePDF:
+    def __init__(self, carpeta=CARPETA_CACHE, max_bytes=MAX_MB * 1024 * 1024):
+        self.carpeta = carpeta
+        self.max_bytes = max_bytes
+        self._tamano = None  # bytes en la carpeta; None hasta la primera revisión
+        self._lock = threading.Lock()
+
+    def ruta(self, clave):
+        return os.path.join(self.carpeta, f"{clave}.pdf")
+
+    # Bytes del PDF guardado con esa clave, o None
+    def obtener(self, clave):
+        ruta = self.ruta(clave)
+        try:
+            with open(ruta, "rb") as f:
+                datos = f.read()
+            os.utime(ruta)  # recién usado: es el último en salir
+        except OSError:
+            return None
+        return datos
+
+    # Guarda el PDF (escribiendo en un temporal y renombrando, así un lector en otro
+    # hilo o proceso nunca ve un archivo a medias) y recorta la carpeta si se pasó
+    def guardar(self, clave, datos):
+        try:
+            os.makedirs(self.carpeta, exist_ok=True)
+            descriptor, temporal = tempfile.mkstemp(dir=self.carpeta, suffix=".tmp")
+            with os.fdopen(descriptor, "wb") as f:
+                f.write(datos)
+            os.replace(temporal, self.ruta(clave))
+        except OSError:
+            return  # Sin caché la planilla se genera igual la próxima vez
+        with self._lock:
+            if self._tamano is not None:
+                self._tamano += len(datos)
+            if self._tamano is None or self._tamano > self.max_bytes:
+                self._recortar()
+
+    # Borra los PDF usados hace más tiempo hasta dejar la carpeta bajo el máximo
+    def _recortar(self):
+        archivos = []
+        for entrada in os.scandir(self.carpeta):
+            if entrada.name.endswith(".pdf"):
+                try:
+                    estado = entrada.stat()
+                except OSError:
+                    continue
+                archivos.append((estado.st_mtime, estado.st_size, entrada.path))
+        total = sum(tamano for _, tamano, _ in archivos)
+        if total > self.max_bytes:
+            limite = self.max_bytes * LLENADO_TRAS_RECORTE
+            for _, tamano, ruta in sorted(archivos):
+                if total <= limite:
+                    break
+                try:
+                    os.remove(ruta)
+                    total -= tamano
+                except OSError:
+                    pass
+        self._tamano = total
+
+    def limpiar(self):
+        if not os.path.isdir(self.carpeta):
+            return
+        with self._lock:
+            for entrada in os.scandir(self.carpeta):
+                if entrada.name.endswith((".pdf", ".tmp")):
+                    try:
+                        os.remove(entrada.path)
+                    except OSError:
+                        pass
+            self._tamano = 0
+
+
+_cache = None
+
+
+# Caché compartida del proceso, o None si está desactivada (PLANILLAS_CACHE_MB=0)
+def cache_por_defecto():
+    global _cache
+    if MAX_MB <= 0:
+        return None
+    if _cache is None:
+        _cache = CachePDF()
+    return _cache
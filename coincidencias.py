@@ -0,0 +1,161 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Empareja cada Referencia del archivo de beneficiarios con una comunidad del archivo
+# de comunidades aunque no se escriban igual: sin tildes, mayúsculas ni espacios de
+# más ("Caserío  Pérez" = "caserio perez") y, si aun así no hay una igual, por
+# trigramas de letras (Dice), tolerando errores de tipeo ("caserio peres").
+#
+# Los nombres de comunidad se indexan una sola vez (clave normalizada -> comunidad y
+# trigrama -> comunidades que lo tienen, con un peso por trigrama); cada Referencia
+# distinta se resuelve con una búsqueda en el diccionario o, si hace falta, con un
+# bincount sobre las listas de sus trigramas, sin comparar cadenas de a pares.
+#
+# Las exactas se asignan solas; las aproximadas solo cuando alguien las confirma,
+# porque un error de tipeo y otra comunidad parecida se ven igual desde aquí.
+#
+#   resultado = emparejar(indice_beneficiarios, df_comunidades['Comunidad/ Establecimiento'])
+#   resultado[resultado["Estado"] != EXACTA]   # lo que conviene revisar
+#   indice_beneficiarios = asignar(indice_beneficiarios, resultado, confirmadas={"caserio peres"})
+
+# Parecido mínimo (0 a 1) para aceptar una comunidad aproximada, y ventaja mínima
+# sobre la segunda mejor para no considerarla ambigua
+UMBRAL = 0.75
+MARGEN = 0.1
+
+EXACTA = "exacta"
+APROXIMADA = "aproximada"
+AMBIGUA = "ambigua"
+SIN_COINCIDENCIA = "sin coincidencia"
+
+
+# Clave de comparación: sin tildes, en minúsculas y con un solo espacio entre palabras
+def normalizar(texto):
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", " ", texto.lower()).strip()
+
+
+def _trigramas(clave):
+    relleno = f" {clave} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+# Números de un nombre ("Aldea López 11" -> "11"): dos comunidades con números
+# distintos nunca se confunden, por mucho que se parezca el resto
+def _numeros(clave):
+    return " ".join(re.findall(r"\d+", clave))
+
+
+class IndiceComunidades:
+    def __init__(self, comunidades):
+        self.por_clave = {}  # clave normalizada -> nombres de comunidad con esa clave
+        for nombre in pd.Series(comunidades).dropna().astype(str).str.strip().unique():
+            self.por_clave.setdefault(normalizar(nombre), []).append(nombre)
+        self.claves = list(self.por_clave)
+        self.numeros = np.array([_numeros(clave) for clave in self.claves], dtype=object)
+
+        trigramas = {}  # trigrama -> posiciones (en self.claves) de las comunidades que lo tienen
+        propios_por_clave = []
+        for posicion, clave in enumerate(self.claves):
+            propios = _trigramas(clave)
+            propios_por_clave.append(propios)
+            for trigrama in propios:
+                trigramas.setdefault(trigrama, []).append(posicion)
+        # Cada trigrama pesa según lo raro que es (idf): "escuela oficial rural mixta"
+        # aparece en cientos de nombres y casi no distingue a uno de otro
+        total = max(len(self.claves), 1)
+        self.trigramas = {trigrama: np.array(posiciones) for trigrama, posiciones in trigramas.items()}
+        self.pesos = {trigrama: np.log1p(total / len(posiciones)) for trigrama, posiciones in trigramas.items()}
+        self.peso_desconocido = np.log1p(total)
+        self.tamanos = np.array([sum(self.pesos[t] for t in propios) for propios in propios_por_clave])
+
+    def __len__(self):
+        return len(self.claves)
+
+    # (comunidad, confianza, estado, alternativa) para un texto
+    def resolver(self, texto):
+        clave = normalizar(texto)
+        nombres = self.por_clave.get(clave)
+        if nombres:
+            if len(nombres) == 1:
+                return nombres[0], 1.0, EXACTA, None
+            return None, 1.0, AMBIGUA, ", ".join(nombres)
+        if not clave or not self.claves:
+            return None, 0.0, SIN_COINCIDENCIA, None
+
+        propios = _trigramas(clave)
+        conocidos = [t for t in propios if t in self.trigramas]
+        if not conocidos:
+            return None, 0.0, SIN_COINCIDENCIA, None
+        # Peso de los trigramas compartidos con cada comunidad, en una sola pasada
+        comunes = np.bincount(np.concatenate([self.trigramas[t] for t in conocidos]),
+                              weights=np.concatenate([np.full(len(self.trigramas[t]), self.pesos[t]) for t in conocidos]),
+                              minlength=len(self.claves))
+        tamano = sum(self.pesos[t] for t in conocidos) + self.peso_desconocido * (len(propios) - len(conocidos))
+        parecido = 2 * comunes / (tamano + self.tamanos)
+        parecido[self.numeros != _numeros(clave)] = 0.0
+        mejores = np.argsort(parecido)[-2:][::-1]
+        mejor = mejores[0]
+        segunda = parecido[mejores[1]] if len(mejores) > 1 else 0.0
+        confianza = round(float(parecido[mejor]), 3)
+        if confianza < UMBRAL:
+            return None, confianza, SIN_COINCIDENCIA, self.por_clave[self.claves[mejor]][0] if confianza else None
+        if confianza - segunda < MARGEN or len(self.por_clave[self.claves[mejor]]) > 1:
+            alternativas = [self.por_clave[self.claves[mejor]][0], self.por_clave[self.claves[mejores[1]]][0]]
+            return None, confianza, AMBIGUA, ", ".join(alternativas)
+        return self.por_clave[self.claves[mejor]][0], confianza, APROXIMADA, None
+
+
+# Resuelve las referencias distintas del archivo de beneficiarios ((referencia, filas)
+# en el orden del archivo) contra las comunidades. Es una función pura: con las mismas
+# referencias y comunidades (cada rerun de la app) devuelve el resultado ya calculado,
+# y lru_cache la deja usar desde varias sesiones a la vez. El resultado compartido no
+# se modifica; quien lo usa trabaja sobre copias.
+@lru_cache(maxsize=4)
+def _emparejar(referencias, comunidades):
+    indice = IndiceComunidades(comunidades)
+    filas = []
+    for referencia, cantidad in referencias:
+        comunidad, confianza, estado, alternativa = indice.resolver(referencia)
+        filas.append({"Referencia": referencia, "Filas": cantidad, "Comunidad": comunidad,
+                      "Confianza": confianza, "Estado": estado, "Alternativa": alternativa})
+    return pd.DataFrame(filas, columns=["Referencia", "Filas", "Comunidad", "Confianza", "Estado", "Alternativa"])
+
+
+# Empareja todas las referencias del archivo de beneficiarios con todas las comunidades
+# del archivo (no solo las filtradas: una referencia puede ser de una comunidad que no
+# se está mostrando). Devuelve una fila por referencia: Referencia, Filas, Comunidad,
+# Confianza, Estado y Alternativa (las comunidades entre las que duda, o la más
+# parecida si no alcanzó el umbral).
+def emparejar(indice_beneficiarios, comunidades):
+    comunidades = tuple(pd.Series(comunidades).dropna().astype(str))
+    referencias = tuple((referencia, len(posiciones)) for referencia, posiciones in indice_beneficiarios.grupos.items())
+    return _emparejar(referencias, comunidades).copy()
+
+
+# Copia del índice de beneficiarios que asigna a cada comunidad sus referencias exactas
+# y, de las aproximadas, solo las confirmadas (ver IndiceBeneficiarios.con_asignadas),
+# así sus planillas incluyen esas filas. El índice recibido, que puede estar compartido
+# en la caché de la app, no cambia.
+def asignar(indice_beneficiarios, resultado, confirmadas=()):
+    confirmadas = set(confirmadas)
+    asignadas = {}
+    for referencia, comunidad, estado in zip(resultado["Referencia"], resultado["Comunidad"], resultado["Estado"]):
+        if estado == EXACTA or (estado == APROXIMADA and referencia in confirmadas):
+            asignadas.setdefault(comunidad, []).append(referencia)
+    return indice_beneficiarios.con_asignadas(asignadas)
+
+
+# Filas de beneficiarios por estado, de la más a la menos segura
+def resumen(resultado):
+    filas = resultado.groupby("Estado")["Filas"].sum()
+    return {estado: int(filas[estado]) for estado in (EXACTA, APROXIMADA, AMBIGUA, SIN_COINCIDENCIA) if estado in filas}
+
+
+# Referencias que no coincidieron exactamente, para revisarlas (y descargarlas)
+def por_revisar(resultado):
+    return resultado[resultado["Estado"] != EXACTA].sort_values(["Estado", "Confianza"], ignore_index=True)
@@ -0,0 +1,329 @@
+import abc
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as EsperaAgotada
+from multiprocessing.util import Finalize
+
+import tiempos
+
+
+# Interfaz común de los convertidores xlsx -> PDF.
+# Cada convertidor se abre una vez y se reutiliza para todos los archivos mientras
+# siga vivo (ver obtener_convertidor).
+class ConvertidorPDF(abc.ABC):
+    nombre = None
+
+    @abc.abstractmethod
+    def convertir(self, output_excel, pdf_output=None):
+        ...
+
+    # False si el programa detrás del convertidor se cerró o dejó de responder
+    def vivo(self):
+        return True
+
+    def cerrar(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+# Exporta libros a PDF con una sola instancia de Excel abierta mientras viva el objeto.
+# COM exige usar Excel desde el hilo que lo creó, así que todas las llamadas se
+# atienden en un hilo propio y Streamlit puede llamar desde cualquier hilo. Si Excel
+# se cierra o deja de responder (alguien lo cerró, se colgó) el hilo termina y el
+# convertidor deja de estar vivo, así obtener_convertidor abre otro.
+class ConvertidorExcel(ConvertidorPDF):
+    nombre = "excel"
+
+    def __init__(self):
+        self._muerto = False
+        self._pedidos = queue.Queue()
+        listo = Future()
+        self._hilo = threading.Thread(target=self._atender, args=(listo,), daemon=True)
+        self._hilo.start()
+        listo.result()
+
+    def _atender(self, listo):
+        import pythoncom
+        from win32com import client
+
+        pythoncom.CoInitialize()
+        try:
+            try:
+                excel = client.Dispatch("Excel.Application")
+                excel.Application.Visible = False
+            except Exception as e:
+                listo.set_exception(e)
+                return
+            listo.set_result(None)
+            try:
+                while True:
+                    pedido = self._pedidos.get()
+                    if pedido is None:
+                        break
+                    output_excel, pdf_output, resultado = pedido
+                    try:
+                        wb_pdf = excel.Workbooks.Open(os.path.abspath(output_excel))
+                        try:
+                            wb_pdf.ExportAsFixedFormat(0, os.path.abspath(pdf_output))
+                        finally:
+                            wb_pdf.Close(False)
+                        resultado.set_result(pdf_output)
+                    except Exception as e:
+                        resultado.set_exception(e)
+                        if not self._responde(excel):
+                            self._muerto = True
+                            break
+            finally:
+                try:
+                    excel.Quit()
+                except Exception:
+                    pass
+        finally:
+            pythoncom.CoUninitialize()
+
+    # Una propiedad cualquiera: si Excel ya no existe, COM falla al pedirla
+    @staticmethod
+    def _responde(excel):
+        try:
+            excel.Visible
+            return True
+        except Exception:
+            return False
+
+    def vivo(self):
+        return not self._muerto and self._hilo is not None and self._hilo.is_alive()
+
+    def convertir(self, output_excel, pdf_output=None):
+        pdf_output = pdf_output or output_excel.replace(".xlsx", ".pdf")
+        resultado = Future()
+        self._pedidos.put((output_excel, pdf_output, resultado))
+        # Si el hilo terminó con el pedido en cola nadie lo va a atender
+        while True:
+            try:
+                return resultado.result(timeout=1)
+            except EsperaAgotada:
+                if not self.vivo():
+                    raise RuntimeError("Excel se cerró o dejó de responder.")
+
+    def cerrar(self):
+        if self._hilo is not None:
+            self._pedidos.put(None)
+            self._hilo.join()
+            self._hilo = None
+
+
+# Busca el ejecutable de LibreOffice en el PATH o en las rutas habituales
+def _buscar_soffice():
+    for nombre in ("soffice", "libreoffice"):
+        ruta = shutil.which(nombre)
+        if ruta:
+            return ruta
+    candidatos = [
+        "/usr/lib/libreoffice/program/soffice",
+        "/opt/libreoffice/program/soffice",
+        "/Applications/LibreOffice.app/Contents/MacOS/soffice",
+        r"C:\Program Files\LibreOffice\program\soffice.exe",
+    ]
+    return next((ruta for ruta in candidatos if os.path.exists(ruta)), None)
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# Convierte con LibreOffice en modo headless, sin Office ni Windows.
+# Con el módulo `uno` disponible mantiene un solo proceso soffice escuchando y
+# cada archivo se convierte sobre ese proceso ya caliente; sin `uno` usa la línea
+# de comandos con un perfil persistente para no pagar la creación del perfil cada vez.
+class ConvertidorLibreOffice(ConvertidorPDF):
+    nombre = "libreoffice"
+
+    def __init__(self, soffice=None, espera=30):
+        self.soffice = soffice or _buscar_soffice()
+        if self.soffice is None:
+            raise RuntimeError("No se encontró LibreOffice (soffice) en este equipo.")
+        self._perfil = tempfile.mkdtemp(prefix="planillas_lo_")
+        self._lock = threading.Lock()
+        self._proceso = None
+        self._escritorio = None
+        try:
+            import uno  # noqa: F401
+        except ImportError:
+            return
+        self._iniciar_servidor(espera)
+
+    def _argumentos_base(self):
+        perfil_url = "file:///" + self._perfil.replace(os.sep, "/").lstrip("/")
+        return [self.soffice, f"-env:UserInstallation={perfil_url}",
+                "--headless", "--invisible", "--nologo", "--norestore", "--nodefault"]
+
+    def _iniciar_servidor(self, espera):
+        import uno
+
+        puerto = _puerto_libre()
+        self._proceso = subprocess.Popen(
+            self._argumentos_base() + [f"--accept=socket,host=127.0.0.1,port={puerto};urp;StarOffice.ComponentContext"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        limite = time.monotonic() + espera
+        while True:
+            try:
+                ctx = resolver.resolve(f"uno:socket,host=127.0.0.1,port={puerto};urp;StarOffice.ComponentContext")
+                break
+            except Exception:
+                if time.monotonic() > limite or self._proceso.poll() is not None:
+                    self.cerrar()
+                    raise RuntimeError("LibreOffice no respondió al iniciar el convertidor.")
+                time.sleep(0.2)
+        self._escritorio = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+
+    # Sin `uno` cada conversión lanza su propio soffice; con él, vive lo que viva el servidor
+    def vivo(self):
+        return self._proceso is None or self._proceso.poll() is None
+
+    @staticmethod
+    def _propiedades(**valores):
+        from com.sun.star.beans import PropertyValue
+
+        propiedades = []
+        for nombre, valor in valores.items():
+            propiedad = PropertyValue()
+            propiedad.Name = nombre
+            propiedad.Value = valor
+            propiedades.append(propiedad)
+        return tuple(propiedades)
+
+    def convertir(self, output_excel, pdf_output=None):
+        pdf_output = pdf_output or output_excel.replace(".xlsx", ".pdf")
+        with self._lock:
+            if self._escritorio is not None:
+                self._convertir_uno(output_excel, pdf_output)
+            else:
+                self._convertir_cli(output_excel, pdf_output)
+        return pdf_output
+
+    def _convertir_uno(self, output_excel, pdf_output):
+        import uno
+
+        doc = self._escritorio.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(output_excel)), "_blank", 0, self._propiedades(Hidden=True))
+        try:
+            doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(pdf_output)),
+                           self._propiedades(FilterName="calc_pdf_Export"))
+        finally:
+            doc.close(True)
+
+    def _convertir_cli(self, output_excel, pdf_output):
+        with tempfile.TemporaryDirectory() as carpeta:
+            subprocess.run(
+                self._argumentos_base() + ["--convert-to", "pdf", "--outdir", carpeta, os.path.abspath(output_excel)],
+                check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            generado = os.path.join(carpeta, os.path.splitext(os.path.basename(output_excel))[0] + ".pdf")
+            shutil.move(generado, pdf_output)
+
+    def cerrar(self):
+        if self._escritorio is not None:
+            try:
+                self._escritorio.terminate()
+            except Exception:
+                pass
+            self._escritorio = None
+        if self._proceso is not None:
+            try:
+                self._proceso.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._proceso.kill()
+            self._proceso = None
+        shutil.rmtree(self._perfil, ignore_errors=True)
+
+
+CONVERTIDORES = {
+    ConvertidorExcel.nombre: ConvertidorExcel,
+    ConvertidorLibreOffice.nombre: ConvertidorLibreOffice,
+}
+
+# Alternativa a los convertidores: dibujar el PDF directamente desde la plantilla
+# (ver pdf_directo). Se elige con el mismo nombre en PLANILLAS_CONVERTIDOR o --pdf.
+DIRECTO = "directo"
+
+
+# Convertidor a usar: variable PLANILLAS_CONVERTIDOR, o Excel en Windows y LibreOffice en los demás
+def convertidor_por_defecto():
+    elegido = os.environ.get("PLANILLAS_CONVERTIDOR", "").strip().lower()
+    if elegido:
+        return elegido
+    if sys.platform == "win32":
+        try:
+            import win32com.client  # noqa: F401
+            return ConvertidorExcel.nombre
+        except ImportError:
+            pass
+    return ConvertidorLibreOffice.nombre
+
+
+# Convertidores abiertos en este proceso, reutilizados entre clics y entre reruns de Streamlit.
+# La clave incluye el pid para que un proceso hijo creado con fork no use el de su padre.
+# Uno que ya no está vivo (Excel o soffice cerrados) se descarta y se abre otro.
+_convertidores = {}
+_lock_convertidores = threading.Lock()
+
+
+def obtener_convertidor(nombre=None):
+    nombre = nombre or convertidor_por_defecto()
+    if nombre not in CONVERTIDORES:
+        raise ValueError(f"Convertidor de PDF desconocido: '{nombre}'")
+    clave = (os.getpid(), nombre)
+    with _lock_convertidores:
+        convertidor = _convertidores.get(clave)
+        if convertidor is not None and not convertidor.vivo():
+            _convertidores.pop(clave)
+            try:
+                convertidor.cerrar()
+            except Exception:
+                pass
+            convertidor = None
+        if convertidor is None:
+            convertidor = CONVERTIDORES[nombre]()
+            _convertidores[clave] = convertidor
+            # Cierra Excel/LibreOffice al terminar el proceso, también en procesos trabajadores
+            Finalize(None, convertidor.cerrar, exitpriority=10)
+        return convertidor
+
+
+def cerrar_convertidores():
+    with _lock_convertidores:
+        for clave in [clave for clave in _convertidores if clave[0] == os.getpid()]:
+            try:
+                _convertidores.pop(clave).cerrar()
+            except Exception:
+                pass
+
+
+# Convierte un libro a PDF con el convertidor caliente del proceso. Si el convertidor
+# murió durante la conversión se reintenta una vez con uno nuevo.
+def convertir_a_pdf(output_excel, pdf_output=None, nombre=None):
+    convertidor = obtener_convertidor(nombre)
+    with tiempos.etapa(f"pdf {convertidor.nombre}"):
+        try:
+            return convertidor.convertir(output_excel, pdf_output)
+        except Exception:
+            if convertidor.vivo():
+                raise
+            return obtener_convertidor(nombre).convertir(output_excel, pdf_output)
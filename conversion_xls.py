@@ -0,0 +1,255 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from copy import copy
+from datetime import time as hora
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+from paralelo import ejecutar_en_paralelo
+
+# Conversión de archivos Excel 97-2003 (.xls) a .xlsx: todas las hojas, con valores
+# tipados (fechas, números, booleanos), anchos de columna, altos de fila, celdas
+# combinadas y formato de cada celda (fuente, relleno, bordes, alineación y formato
+# numérico). Cada archivo se lee con xlrd hoja por hoja y se escribe con openpyxl
+# en modo write_only, que vuelca las filas a disco en lugar de armar el libro en memoria.
+
+# Alineaciones de xlrd (códigos BIFF) a sus nombres en openpyxl
+_HORIZONTAL = {1: "left", 2: "center", 3: "right", 4: "fill", 5: "justify", 6: "centerContinuous", 7: "distributed"}
+_VERTICAL = {0: "top", 1: "center", 2: "bottom", 3: "justify", 4: "distributed"}
+_BORDES = {1: "thin", 2: "medium", 3: "dashed", 4: "dotted", 5: "thick", 6: "double", 7: "hair",
+           8: "mediumDashed", 9: "dashDot", 10: "mediumDashDot", 11: "dashDotDot", 12: "mediumDashDotDot",
+           13: "slantDashDot"}
+
+
+def _xlrd():
+    try:
+        import xlrd
+    except ImportError as e:
+        raise RuntimeError("Convertir archivos .xls necesita xlrd (pip install xlrd).") from e
+    return xlrd
+
+
+def _color(libro, indice):
+    rgb = libro.colour_map.get(indice)
+    return "FF%02X%02X%02X" % rgb if rgb else None
+
+
+# Estilo de openpyxl equivalente a un registro XF de xlrd; se arma una vez por XF
+def _estilo(libro, indice_xf):
+    xf = libro.xf_list[indice_xf]
+    fuente = libro.font_list[xf.font_index]
+    color_fuente = _color(libro, fuente.colour_index)
+    estilo = {
+        "font": Font(name=fuente.name, size=fuente.height / 20, bold=bool(fuente.bold),
+                     italic=bool(fuente.italic), underline="single" if fuente.underline_type else None,
+                     strike=bool(fuente.struck_out), color=color_fuente),
+        "alignment": Alignment(horizontal=_HORIZONTAL.get(xf.alignment.hor_align),
+                               vertical=_VERTICAL.get(xf.alignment.vert_align),
+                               wrap_text=bool(xf.alignment.text_wrapped),
+                               text_rotation=xf.alignment.rotation if xf.alignment.rotation <= 180 else 0,
+                               indent=xf.alignment.indent_level),
+        "number_format": libro.format_map[xf.format_key].format_str if xf.format_key in libro.format_map else "General",
+    }
+    fondo = _color(libro, xf.background.pattern_colour_index) if xf.background.fill_pattern == 1 else None
+    if fondo:
+        estilo["fill"] = PatternFill(fill_type="solid", start_color=fondo, end_color=fondo)
+    b = xf.border
+
+    def lado(tipo, color):
+        return Side(style=_BORDES[tipo], color=_color(libro, color)) if tipo in _BORDES else Side()
+
+    if b.left_line_style or b.right_line_style or b.top_line_style or b.bottom_line_style:
+        estilo["border"] = Border(left=lado(b.left_line_style, b.left_colour_index),
+                                  right=lado(b.right_line_style, b.right_colour_index),
+                                  top=lado(b.top_line_style, b.top_colour_index),
+                                  bottom=lado(b.bottom_line_style, b.bottom_colour_index))
+    return estilo
+
+
+# Valor de openpyxl para una celda de xlrd; None para vacías y errores
+def _valor(xlrd, libro, celda):
+    tipo = celda.ctype
+    if tipo == xlrd.XL_CELL_DATE:
+        try:
+            fecha = xlrd.xldate_as_datetime(celda.value, libro.datemode)
+        except (ValueError, OverflowError):
+            return celda.value
+        return fecha.time() if celda.value < 1 else fecha
+    if tipo == xlrd.XL_CELL_NUMBER:
+        return int(celda.value) if celda.value.is_integer() and abs(celda.value) < 2 ** 53 else celda.value
+    if tipo == xlrd.XL_CELL_BOOLEAN:
+        return bool(celda.value)
+    if tipo == xlrd.XL_CELL_TEXT:
+        return celda.value
+    return None
+
+
+# Copia una hoja de xlrd a una hoja write_only de openpyxl; devuelve las filas copiadas
+def _copiar_hoja(xlrd, libro, hoja, ws, estilos):
+    con_formato = libro.formatting_info
+    if con_formato:
+        for col, info in hoja.colinfo_map.items():
+            dimension = ws.column_dimensions[get_column_letter(col + 1)]
+            dimension.width = round(info.width / 256, 2)
+            dimension.hidden = bool(info.hidden)
+        for fila, info in hoja.rowinfo_map.items():
+            if fila < hoja.nrows and (info.has_default_height == 0 or info.hidden):
+                dimension = ws.row_dimensions[fila + 1]
+                dimension.height = info.height / 20
+                dimension.hidden = bool(info.hidden)
+        for fila_ini, fila_fin, col_ini, col_fin in hoja.merged_cells:
+            ws.merged_cells.add(f"{get_column_letter(col_ini + 1)}{fila_ini + 1}:"
+                                f"{get_column_letter(col_fin)}{fila_fin}")
+
+    for r in range(hoja.nrows):
+        fila = []
+        for c, celda in enumerate(hoja.row(r)):
+            valor = _valor(xlrd, libro, celda)
+            if not con_formato:
+                fila.append(valor)
+                continue
+            clave = (celda.xf_index, isinstance(valor, hora))
+            if clave not in estilos:
+                # Registrar el estilo en el libro cuesta: se hace una vez por XF y las
+                # demás celdas reciben una copia de los índices ya calculados
+                estilo = _estilo(libro, celda.xf_index)
+                if clave[1] and estilo["number_format"] == "General":
+                    estilo["number_format"] = "hh:mm:ss"
+                muestra = WriteOnlyCell(ws)
+                for atributo, formato in estilo.items():
+                    setattr(muestra, atributo, formato)
+                estilos[clave] = (muestra._style, "border" in estilo or "fill" in estilo)
+            indices, visible_vacia = estilos[clave]
+            # Una celda vacía sin bordes ni relleno no se ve: no se escribe
+            if valor is None and not visible_vacia:
+                fila.append(None)
+                continue
+            salida = WriteOnlyCell(ws, valor)
+            salida._style = copy(indices)
+            fila.append(salida)
+        ws.append(fila)
+    return hoja.nrows
+
+
+# Convierte un .xls a .xlsx. Devuelve el resumen del archivo: hojas, filas y segundos.
+def convertir_xls(origen, destino):
+    xlrd = _xlrd()
+    inicio = time.perf_counter()
+    try:
+        libro = xlrd.open_workbook(origen, formatting_info=True, on_demand=True)
+    except NotImplementedError:
+        # Algunos .xls (p. ej. exportados por otros programas) no traen formato legible
+        libro = xlrd.open_workbook(origen, on_demand=True)
+    salida = Workbook(write_only=True)
+    estilos = {}
+    filas = 0
+    try:
+        for indice, nombre in enumerate(libro.sheet_names()):
+            hoja = libro.sheet_by_index(indice)
+            filas += _copiar_hoja(xlrd, libro, hoja, salida.create_sheet(nombre[:31]), estilos)
+            libro.unload_sheet(indice)
+    finally:
+        libro.release_resources()
+    salida.save(destino)
+    return {"hojas": libro.nsheets, "filas": filas, "segundos": round(time.perf_counter() - inicio, 3)}
+
+
+# Nombre que no choque con los ya usados (dos archivos iguales en distintos ZIP)
+def _nombre_libre(nombre, usados):
+    base, extension = os.path.splitext(nombre)
+    candidato, n = nombre, 2
+    while candidato.lower() in usados:
+        candidato = f"{base} ({n}){extension}"
+        n += 1
+    usados.add(candidato.lower())
+    return candidato
+
+
+# Copia a `carpeta` cada .xls recibido; los ZIP se recorren miembro por miembro.
+# `entradas` son pares (nombre, archivo abierto en binario) o rutas. Devuelve las rutas copiadas.
+def preparar_entradas(entradas, carpeta):
+    usados = set()
+    rutas = []
+
+    def copiar(nombre, archivo):
+        ruta = os.path.join(carpeta, _nombre_libre(os.path.basename(nombre), usados))
+        with open(ruta, "wb") as f:
+            shutil.copyfileobj(archivo, f, 1024 * 1024)
+        rutas.append(ruta)
+
+    for entrada in entradas:
+        nombre, archivo = (entrada, None) if isinstance(entrada, (str, os.PathLike)) else entrada
+        if archivo is None:
+            archivo = open(nombre, "rb")
+        with archivo:
+            if nombre.lower().endswith(".zip"):
+                with zipfile.ZipFile(archivo) as zf:
+                    for miembro in zf.infolist():
+                        if not miembro.is_dir() and miembro.filename.lower().endswith(".xls"):
+                            with zf.open(miembro) as contenido:
+                                copiar(miembro.filename, contenido)
+            elif nombre.lower().endswith(".xls"):
+                copiar(nombre, archivo)
+    return rutas
+
+
+# Convierte varios .xls en un grupo de procesos y arma un ZIP con los .xlsx a medida
+# que terminan: cada resultado se agrega al ZIP y se borra, así en disco y en memoria
+# solo quedan los que están en curso. Devuelve (ruta del ZIP, resumen por archivo).
+# `progreso(completados, total, archivo)` se llama al terminar cada uno.
+def convertir_lote(rutas, ruta_zip, trabajadores=None, progreso=None):
+    carpeta = tempfile.mkdtemp(prefix="xlsx_")
+    destinos = [os.path.join(carpeta, f"{i}.xlsx") for i in range(len(rutas))]
+    resumen = [{"archivo": os.path.basename(ruta), "hojas": 0, "filas": 0, "segundos": 0.0, "estado": "pendiente"}
+               for ruta in rutas]
+
+    with zipfile.ZipFile(ruta_zip, "w", zipfile.ZIP_DEFLATED) as zf:
+        def al_terminar(indice, resultado_error):
+            resultado, error = resultado_error
+            if error:
+                resumen[indice]["estado"] = f"error: {error.splitlines()[0]}"
+                return
+            resumen[indice].update(resultado, estado="ok")
+            zf.write(destinos[indice], arcname=os.path.splitext(resumen[indice]["archivo"])[0] + ".xlsx")
+            os.remove(destinos[indice])
+
+        def _progreso(completados, total, indice):
+            if progreso:
+                progreso(completados, total, resumen[indice]["archivo"])
+
+        ejecutar_en_paralelo(convertir_xls, list(zip(rutas, destinos)), trabajadores=trabajadores,
+                             progreso=_progreso, al_terminar=al_terminar)
+    shutil.rmtree(carpeta, ignore_errors=True)
+    return ruta_zip, resumen
+
+
+# Uso desde consola:
+#   python conversion_xls.py beneficiarios1.xls beneficiarios2.xls ronda.zip --salida convertidos.zip
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Convierte archivos .xls (o ZIP con .xls) a .xlsx.")
+    parser.add_argument("archivos", nargs="+", help="Archivos .xls o .zip")
+    parser.add_argument("--salida", default="convertidos.zip", help="ZIP de salida")
+    parser.add_argument("--trabajadores", type=int, default=None, help="Procesos en paralelo")
+    args = parser.parse_args(argumentos)
+
+    with tempfile.TemporaryDirectory(prefix="xls_") as carpeta:
+        rutas = preparar_entradas(args.archivos, carpeta)
+        inicio = time.perf_counter()
+        _, resumen = convertir_lote(rutas, args.salida, args.trabajadores,
+                                    lambda completados, total, archivo: print(f"[{completados}/{total}] {archivo}", flush=True))
+    for fila in resumen:
+        print(f"{fila['archivo']}: {fila['hojas']} hojas, {fila['filas']} filas, {fila['segundos']} s, {fila['estado']}")
+    print(f"Tiempo total: {time.perf_counter() - inicio:.1f} s")
+    print(f"ZIP: {args.salida}")
+    return 0 if all(fila["estado"] == "ok" for fila in resumen) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
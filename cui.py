@@ -0,0 +1,136 @@
+import json
+import os
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+from manifiesto import NOMBRE_MANIFIESTO
+
+# Revisión de CUI de un archivo de beneficiarios antes de generar: CUI repetidos en la
+# misma comunidad, el mismo CUI en varias comunidades, CUI que ya salieron en oficios
+# anteriores (según los manifiestos de PLANILLAS 2025) y CUI vacíos o mal escritos.
+# Todo se resuelve con operaciones de columna y búsquedas por hash (duplicated, isin,
+# groupby), sin comparar filas de a pares.
+
+LARGO_CUI = 13
+
+REPETIDO = "repetido en la comunidad"
+VARIAS_COMUNIDADES = "en varias comunidades"
+OFICIO_ANTERIOR = "en un oficio anterior"
+INVALIDO = "CUI inválido"
+SIN_CUI = "sin CUI"
+
+
+# Solo los dígitos del CUI ("2 345 67890 0101" y "2345678900101" son el mismo)
+def normalizar_cui(serie):
+    return serie.fillna("").astype(str).str.replace(r"\D", "", regex=True)
+
+
+# Lo mismo para un solo valor
+def cui_normalizado(valor):
+    return re.sub(r"\D", "", "" if valor is None else str(valor))
+
+
+# CUI normalizados de un archivo con la comunidad de cada fila y cuántas veces y en
+# cuántas comunidades aparece cada uno; se arma una vez al leer el archivo (ver
+# beneficiarios.IndiceBeneficiarios) y viaja con él en la cache
+class IndiceCUI:
+    def __init__(self, cuis, referencias):
+        df = pd.DataFrame({"CUI": normalizar_cui(cuis).to_numpy(), "REFERENCIA": referencias.to_numpy()})
+        con_cui = df["CUI"] != ""
+        grupos = df[con_cui].groupby("CUI", sort=False)["REFERENCIA"]
+        df["VECES"] = grupos.transform("size").reindex(df.index, fill_value=0).astype(int)
+        df["COMUNIDADES"] = grupos.transform("nunique").reindex(df.index, fill_value=0).astype(int)
+        self.df = df
+
+    def __len__(self):
+        return len(self.df)
+
+    def cuis(self):
+        return set(self.df.loc[self.df["CUI"] != "", "CUI"])
+
+
+# CUI de los manifiestos indicados ((carpeta, ruta, mtime), ordenados): {cui: "CODIGO
+# (comunidad); ..."}. Es una función pura de la lista, con la fecha de cada manifiesto
+# en la clave, así lru_cache reutiliza la lectura mientras ninguno cambie y se puede
+# llamar desde varias sesiones a la vez. El diccionario devuelto no se modifica.
+@lru_cache(maxsize=4)
+def _leer_historial(manifiestos):
+    historial = {}
+    for carpeta, ruta, _ in manifiestos:
+        codigo = carpeta.rsplit("_", 1)[-1]
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                cuis = json.load(f).get("cuis", {})
+        except (OSError, ValueError, AttributeError):
+            continue
+        for comunidad, lista in cuis.items():
+            for cui in lista:
+                anterior = historial.get(cui)
+                origen = f"{codigo} ({comunidad})"
+                historial[cui] = f"{anterior}; {origen}" if anterior else origen
+    return historial
+
+
+# CUI de oficios ya generados: lee los manifiestos de cada carpeta Planillas_<dep>_<codigo>
+# de `carpeta_base` y devuelve {cui: "CODIGO (comunidad); ..."}. Las carpetas del oficio
+# `excluir_oficio` (el que se está por generar) no cuentan. Se vuelve a leer solo si
+# algún manifiesto cambió.
+def historial_cui(carpeta_base, excluir_oficio=None):
+    manifiestos = []
+    if os.path.isdir(carpeta_base):
+        for entrada in os.scandir(carpeta_base):
+            ruta = os.path.join(entrada.path, NOMBRE_MANIFIESTO)
+            if entrada.is_dir() and os.path.exists(ruta):
+                if excluir_oficio and entrada.name.endswith(f"_{excluir_oficio.strip()}"):
+                    continue
+                manifiestos.append((entrada.name, os.path.abspath(ruta), os.path.getmtime(ruta)))
+    return _leer_historial(tuple(sorted(manifiestos)))
+
+
+# Reporte con una fila por problema encontrado: fila del Excel, comunidad, nombre, CUI,
+# problema y detalle (las otras comunidades u oficios donde aparece). Vacío si no hay.
+def reporte(indice_beneficiarios, historial=None):
+    indice = indice_beneficiarios.indice_cui
+    df = indice.df
+    nombres = indice_beneficiarios.nombres["NOMBRE COMPLETO"].to_numpy()
+    partes = []
+
+    def agregar(mascara, problema, detalle=""):
+        if not mascara.any():
+            return
+        filas = df[mascara]
+        partes.append(pd.DataFrame({
+            "Fila": filas.index + 2,  # fila en Excel (encabezado en la 1)
+            "Comunidad": filas["REFERENCIA"].to_numpy(),
+            "Nombre": nombres[filas.index],
+            "CUI": filas["CUI"].to_numpy(),
+            "Problema": problema,
+            "Detalle": detalle if isinstance(detalle, str) else detalle[mascara].to_numpy(),
+        }))
+
+    agregar(df["CUI"] == "", SIN_CUI)
+    agregar((df["CUI"] != "") & (df["CUI"].str.len() != LARGO_CUI), INVALIDO,
+            f"debe tener {LARGO_CUI} dígitos")
+    agregar((df["VECES"] > 1) & (df["COMUNIDADES"] == 1), REPETIDO,
+            df["VECES"].astype(str) + " veces")
+    varias = df["COMUNIDADES"] > 1
+    if varias.any():
+        comunidades = df[varias].groupby("CUI")["REFERENCIA"].agg(lambda refs: ", ".join(sorted(set(refs))))
+        agregar(varias, VARIAS_COMUNIDADES, df["CUI"].map(comunidades))
+    if historial:
+        anteriores = df["CUI"].isin(historial.keys())
+        agregar(anteriores, OFICIO_ANTERIOR, df["CUI"].map(historial))
+
+    columnas = ["Fila", "Comunidad", "Nombre", "CUI", "Problema", "Detalle"]
+    if not partes:
+        return pd.DataFrame(columns=columnas)
+    return pd.concat(partes, ignore_index=True).sort_values(["Problema", "CUI", "Fila"], ignore_index=True)
+
+
+# Bytes del reporte como CSV para descargar (con BOM, para que Excel respete las tildes);
+# el CUI va como texto para que Excel no lo pase a notación científica
+def reporte_csv(df_reporte):
+    df = df_reporte.assign(CUI='="' + df_reporte["CUI"].astype(str) + '"')
+    return df.to_csv(index=False).encode("utf-8-sig")
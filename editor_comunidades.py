@@ -0,0 +1,127 @@
+import math
+
+import pandas as pd
+import streamlit as st
+
+# Tabla editable de comunidades para archivos grandes. En vez de mandar todo
+# df_comunidades a AgGrid y reconstruirlo en cada edición, el navegador recibe solo
+# una página (filtrada y paginada aquí, en el servidor); al editar una celda se
+# comparan las filas de esa página con las enviadas y solo las celdas que cambiaron
+# se aplican como parche a la copia editada que vive en la sesión.
+#
+#   df_comunidades = editar_comunidades(cargar_comunidades(archivo))
+
+FILAS_POR_PAGINA = 100
+COLUMNA_FILA = "_fila"  # posición de la fila en la tabla completa, oculta en la grilla
+COLUMNA_COMUNIDAD = "Comunidad/ Establecimiento"
+
+
+# True si dos valores de celda son el mismo (la grilla devuelve JSON: None por NaN,
+# 5.0 por 5, etc.)
+def _iguales(a, b):
+    if a is None or (isinstance(a, float) and math.isnan(a)):
+        return b is None or (isinstance(b, float) and math.isnan(b)) or b == ""
+    if b is None or (isinstance(b, float) and math.isnan(b)):
+        return a == ""
+    if a == b:
+        return True
+    try:
+        return float(a) == float(b)
+    except (TypeError, ValueError):
+        return str(a) == str(b)
+
+
+# Celdas de `editada` que difieren de `enviada` (las dos con COLUMNA_FILA), como
+# lista de (fila, columna, valor nuevo)
+def diferencias(enviada, editada):
+    originales = enviada.set_index(COLUMNA_FILA)
+    cambios = []
+    for registro in editada.to_dict(orient="records"):
+        fila = registro.pop(COLUMNA_FILA, None)
+        if fila not in originales.index:
+            continue
+        original = originales.loc[fila]
+        for columna, valor in registro.items():
+            if columna in originales.columns and not _iguales(original[columna], valor):
+                cambios.append((int(fila), columna, valor))
+    return cambios
+
+
+# Aplica los cambios sobre df (en su lugar); una columna numérica que recibe texto
+# pasa a object, como pasaba al rearmar la tabla desde la grilla
+def aplicar(df, cambios):
+    for fila, columna, valor in cambios:
+        posicion = df.columns.get_loc(columna)
+        try:
+            df.iloc[fila, posicion] = valor
+        except (TypeError, ValueError):
+            df[columna] = df[columna].astype(object)
+            df.iloc[fila, posicion] = valor
+
+
+# Muestra la tabla paginada y devuelve df_comunidades con las ediciones de la sesión.
+# Con texto en "Buscar" se devuelven solo las filas que coinciden, como el filtro de
+# la grilla anterior (la generación por lote usa solo esas comunidades). El índice es
+# siempre la fila en el archivo, también filtrado: de él sale el número de cada
+# comunidad (ver generacion.numeros_comunidad).
+def editar_comunidades(df, clave="comunidades", filas_por_pagina=FILAS_POR_PAGINA, altura=300):
+    from st_aggrid import AgGrid, GridOptionsBuilder, DataReturnMode, GridUpdateMode
+
+    # La copia editada se conserva mientras no cambie el archivo (ni se descarten los cambios)
+    huella = int(pd.util.hash_pandas_object(df, index=False).sum()) if len(df) else 0
+    estado = st.session_state.get(clave)
+    if estado is None or estado["huella"] != huella:
+        estado = {"huella": huella, "df": df.reset_index(drop=True).copy(), "ediciones": 0, "version": 0}
+        st.session_state[clave] = estado
+    editado = estado["df"]
+
+    col_buscar, col_pagina, col_info = st.columns([3, 1, 2])
+    buscar = col_buscar.text_input("Buscar", key=f"{clave}-buscar",
+                                   help="Filtra por cualquier columna; el lote usa solo las comunidades filtradas.")
+    posiciones = editado.index
+    if buscar:
+        texto = buscar.strip().lower()
+        coincide = editado.astype(str).apply(lambda columna: columna.str.lower().str.contains(texto, regex=False))
+        posiciones = editado.index[coincide.any(axis=1)]
+    paginas = max(1, math.ceil(len(posiciones) / filas_por_pagina))
+    pagina = col_pagina.number_input("Página", min_value=1, max_value=paginas, value=1, step=1,
+                                     key=f"{clave}-pagina")
+    pagina = min(int(pagina), paginas)
+    col_info.caption(f"{len(posiciones)} filas · página {pagina} de {paginas} · {estado['ediciones']} ediciones")
+
+    enviada = editado.loc[posiciones[(pagina - 1) * filas_por_pagina:pagina * filas_por_pagina]].copy()
+    enviada.insert(0, COLUMNA_FILA, enviada.index)
+    gb = GridOptionsBuilder.from_dataframe(enviada)
+    gb.configure_default_column(editable=True, filter=True, sortable=True)
+    gb.configure_column(COLUMNA_FILA, hide=True, editable=False)
+    respuesta = AgGrid(
+        enviada,
+        gridOptions=gb.build(),
+        data_return_mode=DataReturnMode.AS_INPUT,
+        update_mode=GridUpdateMode.VALUE_CHANGED,
+        fit_columns_on_grid_load=True,
+        height=altura,
+        # Una grilla por página (y por versión, para rearmarla al descartar cambios)
+        key=f"{clave}-{estado['version']}-{buscar}-{pagina}",
+    )
+
+    datos = respuesta["data"]
+    if datos is not None and len(datos):
+        cambios = diferencias(enviada, pd.DataFrame(datos))
+        if cambios:
+            aplicar(editado, cambios)
+            estado["ediciones"] += len(cambios)
+            st.rerun()  # para que el contador y las demás secciones vean el cambio
+
+    if estado["ediciones"] and st.button("Descartar cambios", key=f"{clave}-descartar"):
+        estado.update({"df": df.reset_index(drop=True).copy(), "ediciones": 0, "version": estado["version"] + 1})
+        st.rerun()
+
+    return editado.loc[posiciones] if buscar else editado
+
+
+# La tabla completa con las ediciones de la sesión, sin el filtro de "Buscar" (llamar
+# después de editar_comunidades): con ella se emparejan los beneficiarios, que pueden
+# ser de comunidades que no se están mostrando
+def comunidades_editadas(clave="comunidades"):
+    return st.session_state[clave]["df"]
@@ -0,0 +1,732 @@
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from beneficiarios import clave_comunidad
+from conversion_pdf import DIRECTO, obtener_convertidor, convertir_a_pdf, convertidor_por_defecto
+from paralelo import CANCELADO, ejecutar_en_paralelo
+import tiempos
+from salida import ZipSalida, temporal
+from manifiesto import Manifiesto, huella
+from cui import cui_normalizado
+from plantillas import (RUTA_PLANTILLA, obtener_plantilla, copiar_hoja, exportar_modelos, importar_modelos,
+                        write_rows, insertar_logo, mostrar_pagina, recortar_hojas, guardar_libro)
+
+# Mapeo de unidades ejecutoras a su nombre completo
+UNIDAD_MAP = {
+    "DAPA": "Departamento de: Apoyo a la Producción de Alimentos",
+    "DAU": "Departamento de: Agricultura Urbana",
+    "DADA": "Departamento de: Almacenamiento de Alimentos"
+}
+
+# Logo de las planillas (3.51 cm × 3.77 cm ≈ 133×143 px) y de los listados de capacitación
+# (2.08 cm × 2.00 cm ≈ 79×76 px, en A2)
+LOGO_PLANILLA = {"col": "A", "fila": 1, "ancho": 133, "alto": 143}
+LOGO_LISTADO = {"col": "A", "fila": 2, "ancho": 79, "alto": 76}
+
+# Registro de tipos de planilla. Cada tipo indica:
+#   hoja / titulo        hoja de FormatoPlanillas.xlsx y prefijo de las hojas generadas
+#   archivo              nombre del xlsx ({idx}, {dep}, {mun})
+#   encabezados          celda -> campo de datos_comunidad()
+#   fijos                celda -> texto fijo (p. ej. la etiqueta de G24/J24)
+#   beneficiarios        si lleva listado de beneficiarios paginado
+#   alto_pagina          filas de cada página en la plantilla (separación entre páginas)
+#   fila_beneficiarios   primera fila del listado dentro de la página
+#   filas_por_pagina     beneficiarios por página
+#   copiar_primera       si la primera página también es una copia de la hoja de plantilla
+TIPOS_PLANILLA = {
+    "entrega": {
+        "boton": "Generar Planilla",
+        "descarga": "Descargar Planilla PDF",
+        "etiqueta": "Planilla de entrega",
+        "hoja": "PLANILLAS",
+        "titulo": "PLANILLA",
+        "archivo": "{idx} - {dep}, {mun}, PLANILLA.xlsx",
+        "encabezados": {"C4": "unidad_extra", "C7": "dep", "C9": "mun", "E9": "comunidad",
+                        "K1": "codigo_completo", "B23": "tecnom", "B27": "dpi", "G24": "insumo"},
+        "fijos": {},
+        "logo": LOGO_PLANILLA,
+        "beneficiarios": True,
+        "alto_pagina": 34,
+        "fila_beneficiarios": 11,
+        "filas_por_pagina": 10,
+        "copiar_primera": False,
+    },
+    "entrega_adicional": {
+        "boton": "Generar Planilla Adicional",
+        "descarga": "Descargar Planilla Adicional PDF",
+        "etiqueta": "Planilla adicional",
+        "hoja": "ADICIONALPLA",
+        "titulo": "ADICIONALPLA",
+        "archivo": "{idx} - {dep}, PLANILLA ADICIONAL.xlsx",
+        "encabezados": {"C4": "unidad_extra", "C7": "dep", "K1": "codigo_oficio",
+                        "B23": "tecnom", "B27": "dpi", "G24": "insumo"},
+        "fijos": {},
+        "logo": LOGO_PLANILLA,
+        "beneficiarios": False,
+        "alto_pagina": 34,
+    },
+    "asistencia": {
+        "boton": "Generar Planilla de Asistencia",
+        "descarga": "Descargar Planilla de Asistencia PDF",
+        "etiqueta": "Planilla de asistencia",
+        "hoja": "PLANILLASASIST",
+        "titulo": "PLANILLASASIST",
+        "archivo": "{idx} - {dep}, {mun}, PLANILLA DE ASISTENCIA.xlsx",
+        "encabezados": {"C4": "unidad_extra", "C7": "dep", "C9": "mun", "E9": "comunidad",
+                        "K1": "codigo_completo", "B23": "tecnom", "B27": "dpi"},
+        "fijos": {"G24": "Asistencia Técnica"},
+        "logo": LOGO_PLANILLA,
+        "beneficiarios": True,
+        "alto_pagina": 34,
+        "fila_beneficiarios": 11,
+        "filas_por_pagina": 10,
+        "copiar_primera": False,
+    },
+    "asistencia_adicional": {
+        "boton": "Generar Planilla de Asistencia Adicional",
+        "descarga": "Descargar Planilla de Asistencia Adicional PDF",
+        "etiqueta": "Asistencia adicional",
+        "hoja": "ASISTENCIAAD",
+        "titulo": "ASISTENCIAAD",
+        "archivo": "{dep}, ASISTENCIA ADICIONAL.xlsx",
+        "encabezados": {"C4": "unidad_extra", "C7": "dep", "K1": "codigo_oficio", "B23": "tecnom", "B27": "dpi"},
+        "fijos": {"G24": "Asistencia Técnica"},
+        "logo": LOGO_PLANILLA,
+        "beneficiarios": False,
+        "alto_pagina": 34,
+    },
+    "capacitacion": {
+        "boton": "Generar Planilla de Capacitación",
+        "descarga": "Descargar Planilla de Capacitacion PDF",
+        "etiqueta": "Listado de capacitación",
+        "hoja": "LISTADOCAPA",
+        "titulo": "PLANILLA",
+        "archivo": "{idx}-{dep}, {mun}, LISTADO DE CAPACITACIÓN.xlsx",
+        "encabezados": {"A5": "unidad_extra", "C11": "dep", "C12": "mun", "C13": "comunidad",
+                        "A4": "codigo_completo", "A32": "tecnom", "C14": "capa"},
+        "fijos": {},
+        "logo": LOGO_LISTADO,
+        "beneficiarios": True,
+        "alto_pagina": 41,
+        "fila_beneficiarios": 17,
+        "filas_por_pagina": 10,
+        "copiar_primera": True,
+    },
+    "capacitacion_adicional": {
+        "boton": "Generar Planilla de Capacitacion Adicional",
+        "descarga": "Descargar Planilla de Capacitación Adicional PDF",
+        "etiqueta": "Capacitación adicional",
+        "hoja": "LISTADOCAPAAD",
+        "titulo": "LISTADOCAPAAD",
+        "archivo": "{dep}, CAPACITACIÓN ADICIONAL.xlsx",
+        "encabezados": {"A5": "unidad_extra", "C11": "dep", "A4": "codigo_oficio", "A32": "tecnom"},
+        "fijos": {},
+        "logo": LOGO_LISTADO,
+        "beneficiarios": False,
+        "alto_pagina": 41,
+    },
+    "dau": {
+        "boton": "Generar Planilla de DAU",
+        "descarga": "Descargar Planilla DAU PDF",
+        "etiqueta": "Planilla DAU",
+        "hoja": "PLANILLASDAU",
+        "titulo": "PLANILLASDAU",
+        "archivo": "{idx} - {dep}, {mun}, PLANILLA DAU.xlsx",
+        "encabezados": {"C7": "dep", "C9": "mun", "E7": "comunidad", "K1": "codigo_completo",
+                        "B23": "tecnom", "B27": "dpi", "J24": "insumo", "E9": "codigo_escolar"},
+        "fijos": {},
+        "logo": LOGO_PLANILLA,
+        "beneficiarios": True,
+        "alto_pagina": 34,
+        "fila_beneficiarios": 11,
+        "filas_por_pagina": 10,
+        "copiar_primera": False,
+    },
+    "dau_adicional": {
+        "boton": "Generar Planilla Adicional DAU",
+        "descarga": "Descargar Planilla Adicional DAU PDF",
+        "etiqueta": "Planilla adicional DAU",
+        "hoja": "PLANILLASDAUAD",
+        "titulo": "PLANILLASDAUAD",
+        "archivo": "{dep}, PLANILLA ADICIONAL DAU.xlsx",
+        "encabezados": {"C7": "dep", "K1": "codigo_oficio", "B23": "tecnom", "B27": "dpi"},
+        "fijos": {},
+        "logo": LOGO_PLANILLA,
+        "beneficiarios": False,
+        "alto_pagina": 34,
+    },
+    "asistencia_dau": {
+        "boton": "Generar Planilla de Asistencia DAU",
+        "descarga": "Descargar Planilla de Asistencia DAU PDF",
+        "etiqueta": "Asistencia DAU",
+        "hoja": "ASISTENCIADAU",
+        "titulo": "ASISTENCIADAU",
+        "archivo": "{idx} - {dep}, {mun}, PLANILLA DE ASISTENCIA DAU.xlsx",
+        "encabezados": {"C7": "dep", "C9": "mun", "E7": "comunidad", "K1": "codigo_completo",
+                        "B23": "tecnom", "B27": "dpi", "E9": "codigo_escolar"},
+        "fijos": {"J24": "Asistencia Técnica"},
+        "logo": LOGO_PLANILLA,
+        "beneficiarios": True,
+        "alto_pagina": 34,
+        "fila_beneficiarios": 11,
+        "filas_por_pagina": 10,
+        "copiar_primera": False,
+    },
+    "asistencia_dau_adicional": {
+        "boton": "Generar Planilla de Asistencia Adicional DAU",
+        "descarga": "Descargar Planilla de Asistencia Adicional DAU PDF",
+        "etiqueta": "Asistencia adicional DAU",
+        "hoja": "ASISTENCIADAUAD",
+        "titulo": "ASISTENCIADAUAD",
+        "archivo": "{dep}, ASISTENCIA ADICIONAL DAU.xlsx",
+        "encabezados": {"C7": "dep", "K1": "codigo_oficio", "B23": "tecnom", "B27": "dpi"},
+        "fijos": {"J24": "Asistencia Técnica"},
+        "logo": LOGO_PLANILLA,
+        "beneficiarios": False,
+        "alto_pagina": 34,
+    },
+}
+
+# Tipos con listado de beneficiarios: son los que se generan por comunidad en un lote
+TIPOS_LOTE = [tipo for tipo, config in TIPOS_PLANILLA.items() if config["beneficiarios"]]
+
+
+# Carpeta donde se guardan las planillas en el equipo (Escritorio/PLANILLAS 2025)
+def carpeta_planillas_base(carpeta_base=None):
+    if carpeta_base is None:
+        escritorio = os.path.join(os.path.expanduser("~"), "Desktop")
+        carpeta_base = os.path.join(escritorio, "PLANILLAS 2025")
+    return carpeta_base
+
+
+# Subcarpeta de un departamento dentro de la carpeta base (y dentro del ZIP)
+def carpeta_planillas(dep, codigo_oficio):
+    return f"Planillas_{dep.strip().replace(' ', '_')}_{codigo_oficio.strip()}"
+
+
+def obtener_ruta_planillas(dep, codigo_oficio, carpeta_base=None):
+    ruta_final = os.path.join(carpeta_planillas_base(carpeta_base), carpeta_planillas(dep, codigo_oficio))
+    os.makedirs(ruta_final, exist_ok=True)
+    return ruta_final
+
+
+# Código de oficio a partir de la unidad ejecutora, número de oficio y año
+def armar_codigo_oficio(unidad_ejecutora, no_oficio, anio):
+    return f"{unidad_ejecutora.strip().upper()}-{no_oficio.strip().zfill(3)}-{anio.strip()}"
+
+
+# Número de cada comunidad (el _CD del código y del nombre de archivo): su fila en el
+# archivo de comunidades. La tabla editable conserva ese índice aunque esté filtrada,
+# así una comunidad lleva el mismo número generada sola o en un lote, con o sin filtro.
+def numeros_comunidad(df_comunidades):
+    if df_comunidades.index.dtype.kind in "iu":
+        return [int(indice) + 1 for indice in df_comunidades.index]
+    return list(range(1, len(df_comunidades) + 1))
+
+
+# Número de la comunidad indicada (IndexError si no existe)
+def numero_comunidad(df_comunidades, comunidad):
+    claves = df_comunidades['Comunidad/ Establecimiento'].astype(str).str.strip().str.lower()
+    posiciones = (claves == clave_comunidad(comunidad)).to_numpy().nonzero()[0]
+    return numeros_comunidad(df_comunidades)[posiciones[0]]
+
+
+# Fila de df_comunidades de la comunidad indicada (IndexError si no existe)
+def buscar_comunidad(df_comunidades, comunidad):
+    coincidencias = df_comunidades.loc[df_comunidades['Comunidad/ Establecimiento'] == comunidad]
+    return coincidencias.iloc[0].to_dict()
+
+
+# Valores de encabezado de una comunidad, con los nombres de campo que usa TIPOS_PLANILLA
+def datos_comunidad(fila, unidad_ejecutora, codigo_oficio, idx_comunidad, num_beneficiarios):
+    return {
+        "idx": idx_comunidad,
+        "unidad_extra": UNIDAD_MAP.get(unidad_ejecutora, unidad_ejecutora),
+        "dep": fila['Departamento'],
+        "mun": fila.get('Municipio', ''),
+        "comunidad": str(fila.get('Comunidad/ Establecimiento', '')).strip(),
+        "tecnom": fila.get('Nombre del técnico', ''),
+        "dpi": str(fila.get('CUI del técnico', '')),
+        "insumo": fila.get('Insumo', ''),
+        "capa": fila.get('Listado de Registro de capacitacion y asistencia Tecnica', ''),
+        "codigo_escolar": fila.get('CODIGO ESCOLAR', ''),
+        "codigo_oficio": codigo_oficio,
+        "codigo_completo": f"{codigo_oficio}_CD{idx_comunidad}_P{num_beneficiarios}",
+    }
+
+
+# Escribe los beneficiarios de un bloque y oculta las filas sobrantes
+def _llenar_bloque(ws, bloque, fila_inicio, filas_por_pagina):
+    filas = [(b['NOMBRE COMPLETO'], str(b['CUI'])) for b in bloque]
+    write_rows(ws, fila_inicio, filas + [("", "")] * (filas_por_pagina - len(filas)))
+    for i in range(filas_por_pagina):
+        ws.row_dimensions[fila_inicio + i].hidden = i >= len(filas)
+
+
+# Llena el libro de un tipo de planilla con los datos de una comunidad
+def llenar_planilla(tipo, datos, beneficiarios=None, logo_path="logo_maga.png", plantilla=RUTA_PLANTILLA):
+    config = TIPOS_PLANILLA[tipo]
+    with tiempos.etapa("plantilla"):
+        wb = obtener_plantilla(config["hoja"], plantilla)
+    plantilla_hoja = wb[config["hoja"]]
+
+    if config["beneficiarios"]:
+        if not beneficiarios:
+            raise ValueError(f"La planilla '{config['etiqueta']}' necesita al menos un beneficiario.")
+        por_pagina = config["filas_por_pagina"]
+        bloques = [beneficiarios[i:i+por_pagina] for i in range(0, len(beneficiarios), por_pagina)]
+        alto_pagina = config["alto_pagina"]
+        # Todas las copias salen de la hoja de plantilla sin modificar y solo hasta su página
+        copias = range(0 if config["copiar_primera"] else 1, len(bloques))
+        with tiempos.etapa("copiar hojas"):
+            hojas = [copiar_hoja(wb, plantilla_hoja, (i + 1) * alto_pagina) for i in copias]
+        if not config["copiar_primera"]:
+            hojas.insert(0, plantilla_hoja)
+    else:
+        bloques = [None]
+        hojas = [plantilla_hoja]
+
+    hojas_creadas = []
+    with tiempos.etapa("llenar hojas"):
+        for hoja_idx, (ws, bloque) in enumerate(zip(hojas, bloques)):
+            ws.title = f"{config['titulo']}{hoja_idx+1}"
+            insertar_logo(ws, logo_path, **config["logo"])
+            for celda, campo in config["encabezados"].items():
+                ws[celda] = datos[campo]
+            for celda, texto in config["fijos"].items():
+                ws[celda] = texto
+
+            if bloque is not None:
+                fila_inicio = 1 + hoja_idx * alto_pagina
+                mostrar_pagina(ws, fila_inicio, fila_inicio + alto_pagina - 1)
+                _llenar_bloque(ws, bloque, fila_inicio + config["fila_beneficiarios"], por_pagina)
+
+            hojas_creadas.append(ws.title)
+
+    with tiempos.etapa("recortar hojas"):
+        for hoja in wb.sheetnames:
+            if hoja not in hojas_creadas:
+                wb.remove(wb[hoja])
+        recortar_hojas(wb)
+    tiempos.anotar(paginas=len(hojas_creadas))
+    return wb
+
+
+# Nombre del archivo de una planilla (con extensión .xlsx, como en la plantilla)
+def nombre_planilla(tipo, datos):
+    return TIPOS_PLANILLA[tipo]["archivo"].format(idx=datos["idx"], dep=datos["dep"], mun=datos["mun"])
+
+
+# Nombre del archivo que deja generar_planilla_en_memoria: el PDF con convertidor, o el xlsx
+def nombre_salida(tipo, datos, convertidor=None):
+    nombre = nombre_planilla(tipo, datos)
+    return os.path.splitext(nombre)[0] + ".pdf" if convertidor else nombre
+
+
+# Llena una planilla y (si se indica convertidor) la exporta a PDF, sin carpeta de
+# destino: devuelve (nombre, bytes) del PDF, o del xlsx si no hay convertidor. El xlsx y el PDF directo se arman en
+# memoria; Excel y LibreOffice solo convierten archivos, así que con ellos el xlsx
+# pasa por una carpeta temporal que se borra al terminar. Con `cache` (ver cache_pdf)
+# un PDF ya generado con los mismos datos se devuelve sin volver a generarlo.
+def generar_planilla_en_memoria(tipo, datos, beneficiarios, convertidor=None,
+                                logo_path="logo_maga.png", plantilla=RUTA_PLANTILLA, cache=None):
+    if cache is not None and convertidor:
+        from cache_pdf import clave_planilla
+        clave = clave_planilla(tipo, datos, beneficiarios, convertidor, plantilla, logo_path)
+        with tiempos.etapa("cache pdf"):
+            datos_pdf = cache.obtener(clave)
+        tiempos.anotar(cache_pdf="acierto" if datos_pdf is not None else "fallo")
+        if datos_pdf is None:
+            _, datos_pdf = generar_planilla_en_memoria(tipo, datos, beneficiarios, convertidor, logo_path, plantilla)
+            cache.guardar(clave, datos_pdf)
+        return nombre_salida(tipo, datos, convertidor), datos_pdf
+
+    nombre_archivo = nombre_planilla(tipo, datos)
+    nombre_pdf = os.path.splitext(nombre_archivo)[0] + ".pdf"
+    if convertidor == DIRECTO:
+        from pdf_directo import renderizar_planilla
+        with tiempos.etapa("pdf directo"):
+            datos_pdf = renderizar_planilla(tipo, datos, beneficiarios, None, logo_path, plantilla)
+        tiempos.anotar(bytes_pdf=len(datos_pdf))
+        return nombre_pdf, datos_pdf
+
+    wb = llenar_planilla(tipo, datos, beneficiarios, logo_path, plantilla)
+    if not convertidor:
+        buffer = io.BytesIO()
+        guardar_libro(wb, buffer)
+        tiempos.anotar(bytes_xlsx=buffer.tell())
+        return nombre_archivo, buffer.getvalue()
+    with tempfile.TemporaryDirectory(prefix="planilla_") as carpeta:
+        output_excel = os.path.join(carpeta, nombre_archivo)
+        guardar_libro(wb, output_excel)
+        tiempos.anotar(bytes_xlsx=os.path.getsize(output_excel))
+        with open(convertir_a_pdf(output_excel, nombre=convertidor), "rb") as f:
+            datos_pdf = f.read()
+    tiempos.anotar(bytes_pdf=len(datos_pdf))
+    return nombre_pdf, datos_pdf
+
+
+# Prepara un proceso trabajador: recibe la plantilla ya leída y abre su convertidor
+def _iniciar_trabajador(modelos_plantilla, convertidor):
+    if modelos_plantilla:
+        importar_modelos(*modelos_plantilla)
+    if convertidor and convertidor != DIRECTO:
+        obtener_convertidor(convertidor)
+
+
+# Genera todas las planillas de una comunidad; devuelve los archivos como pares
+# (ruta dentro del ZIP, bytes) para que el proceso principal los agregue al ZIP
+def _generar_comunidad(trabajo):
+    inicio = time.perf_counter()
+    archivos = []
+    with tiempos.medicion(trabajo["medir"], comunidad=trabajo["datos"]["comunidad"],
+                          tipo=",".join(trabajo["tipos"]), beneficiarios=len(trabajo["beneficiarios"])) as medida:
+        for tipo in trabajo["tipos"]:
+            nombre, datos = generar_planilla_en_memoria(tipo, trabajo["datos"], trabajo["beneficiarios"],
+                                                        trabajo["convertidor"], trabajo["logo_path"], trabajo["plantilla"])
+            archivos.append((f"{trabajo['carpeta']}/{nombre}", datos))
+    return {"archivos": archivos, "segundos": round(time.perf_counter() - inicio, 3),
+            "tiempos": medida.registro() if medida else None}
+
+
+# Agrupaciones posibles del PDF unido de un lote
+UNIONES_PDF = ("departamento", "oficio")
+
+
+# Une los PDF de un lote mientras se generan: un PDF por departamento (en su carpeta)
+# o uno para todo el oficio (en la raíz del ZIP), con un marcador por comunidad y,
+# dentro, uno por tipo de planilla. Las comunidades terminan en cualquier orden; se
+# van agregando en el orden del archivo apenas están listas todas las anteriores. Un
+# PDF unido se cierra y entra a la salida en cuanto pasa la última comunidad de su
+# grupo (un departamento puede estar listo mucho antes que el lote) y `al_cerrar(ruta,
+# archivo)`, si se indica, lo recibe en ese momento. Cada PDF unido se escribe en un
+# temporal que pasa a disco solo si crece mucho.
+class _UnionLote:
+    def __init__(self, trabajos, tipos, codigo_oficio, agrupar, salida, al_cerrar=None):
+        self.trabajos = trabajos
+        self.tipos = tipos
+        self.codigo_oficio = codigo_oficio.strip()
+        self.agrupar = agrupar
+        self.salida = salida
+        self.al_cerrar = al_cerrar
+        self.terminados = {}
+        self.siguiente = 0
+        self.uniones = {}  # ruta dentro del ZIP -> PDFUnido abierto
+        # ruta dentro del ZIP -> índice de la última comunidad de ese grupo
+        self.ultima = {self._ruta(trabajo): indice for indice, (_, trabajo) in enumerate(trabajos)}
+
+    def _ruta(self, trabajo):
+        if self.agrupar == "departamento":
+            return f"{trabajo['carpeta']}/{trabajo['carpeta']}.pdf"
+        return f"Planillas_{self.codigo_oficio}.pdf"
+
+    def _union(self, trabajo):
+        ruta = self._ruta(trabajo)
+        if ruta not in self.uniones:
+            from pdf_unido import PDFUnido
+            self.uniones[ruta] = PDFUnido(temporal())
+        return self.uniones[ruta]
+
+    # Recibe los archivos de una comunidad terminada (o None si falló)
+    def agregar(self, indice, archivos):
+        self.terminados[indice] = archivos
+        while self.siguiente in self.terminados:
+            archivos = self.terminados.pop(self.siguiente)
+            trabajo = self.trabajos[self.siguiente][1]
+            pdfs = [(tipo, datos) for tipo, (ruta, datos) in zip(self.tipos, archivos or []) if ruta.endswith(".pdf")]
+            if pdfs:
+                union = self._union(trabajo)
+                union.marcador(f"{trabajo['datos']['idx']} - {trabajo['datos']['comunidad']}")
+                for tipo, datos in pdfs:
+                    union.agregar(io.BytesIO(datos), TIPOS_PLANILLA[tipo]["etiqueta"])
+            ruta = self._ruta(trabajo)
+            if self.ultima[ruta] == self.siguiente:
+                self._cerrar(ruta)
+            self.siguiente += 1
+
+    def _cerrar(self, ruta):
+        union = self.uniones.pop(ruta, None)
+        if union is None or not len(union):
+            return
+        with union.cerrar() as archivo:
+            self.salida.agregar_archivo(ruta, archivo)
+            if self.al_cerrar:
+                archivo.seek(0)
+                self.al_cerrar(ruta, archivo)
+
+    # Cierra los PDF unidos que sigan abiertos (p. ej. si se canceló el lote)
+    def cerrar(self):
+        for ruta in list(self.uniones):
+            self._cerrar(ruta)
+
+
+# Genera todas las planillas de todas las comunidades en una sola corrida.
+# Los beneficiarios llegan ya agrupados por referencia (IndiceBeneficiarios) y cada
+# comunidad es un trabajo independiente: con trabajadores > 1 se reparten en un
+# grupo de procesos, el resumen conserva el orden del archivo de comunidades y
+# una comunidad con error no detiene a las demás. `convertidor` es el nombre del
+# convertidor de PDF (ver conversion_pdf.CONVERTIDORES) o None para dejar solo el xlsx.
+# Con `unir_pdf` ("departamento" u "oficio") los PDF se unen además en un solo
+# archivo por grupo (ver _UnionLote), que también va en el ZIP; `al_unir(ruta,
+# archivo)` recibe cada uno apenas está completo, sin esperar al resto del lote.
+# Los archivos se agregan a un ZIP a medida que termina cada comunidad (ver
+# salida.ZipSalida), en `ruta_zip` o en un temporal que pasa a ser de quien llama
+# (cerrarlo al terminar). Con `espejo` se guardan además en `carpeta_base` (por defecto
+# Escritorio/PLANILLAS 2025), junto con una copia del ZIP. Devuelve (resumen, ZIP:
+# `ruta_zip`, el temporal abierto o None si no se generó nada, ruta de la copia en la
+# carpeta o None).
+# Si `cancelado()` devuelve True el lote se detiene al terminar las comunidades en
+# curso: las demás quedan como "cancelado" y el ZIP lleva solo lo ya generado.
+# Con espejo en disco cada carpeta lleva un manifiesto con la huella de lo que produjo
+# cada archivo (ver manifiesto.py), que se actualiza con todo lo que se guarda. Con
+# `incremental` solo se regeneran las planillas cuyos datos cambiaron y las demás se
+# toman de la carpeta ("sin cambios" en el resumen); sin él se regenera todo.
+def generar_lote(df_comunidades, beneficiarios, tipos, codigo_oficio, unidad_ejecutora,
+                 convertidor=None, trabajadores=1, progreso=None, logo_path="logo_maga.png",
+                 plantilla=RUTA_PLANTILLA, carpeta_base=None, unir_pdf=None, espejo=True, cancelado=None,
+                 incremental=True, ruta_zip=None, al_unir=None):
+    if not beneficiarios.completo:
+        raise ValueError("El archivo de beneficiarios no contiene todas las columnas necesarias para generar la planilla.")
+    if unir_pdf and unir_pdf not in UNIONES_PDF:
+        raise ValueError(f"unir_pdf debe ser uno de {UNIONES_PDF}, no {unir_pdf!r}.")
+
+    carpeta = carpeta_planillas_base(carpeta_base) if espejo else None
+    manifiestos = {} if carpeta else None  # carpeta de la comunidad -> Manifiesto
+
+    comunidades = df_comunidades.to_dict(orient='records')
+    resumen = []
+    trabajos = []
+    for idx_comunidad, fila in zip(numeros_comunidad(df_comunidades), comunidades):
+        comunidad = str(fila['Comunidad/ Establecimiento']).strip()
+        registros = beneficiarios.registros(comunidad)
+        fila_resumen = {"comunidad": comunidad, "beneficiarios": len(registros),
+                        "archivos": 0, "segundos": 0.0, "estado": "sin beneficiarios"}
+        resumen.append(fila_resumen)
+        if not registros:
+            continue
+
+        datos = datos_comunidad(fila, unidad_ejecutora, codigo_oficio, idx_comunidad, len(registros))
+        trabajo = {
+            "tipos": tipos,
+            "datos": datos,
+            "beneficiarios": registros,
+            "carpeta": carpeta_planillas(datos["dep"], codigo_oficio),
+            "logo_path": logo_path,
+            "plantilla": plantilla,
+            "convertidor": convertidor,
+            "medir": tiempos.midiendo(),
+            "vigentes": [],
+        }
+        if manifiestos is not None:
+            with tiempos.etapa("comparar manifiesto"):
+                _comparar_manifiesto(trabajo, manifiestos, carpeta, incremental)
+        trabajos.append((fila_resumen, trabajo))
+    pendientes = [indice for indice, (_, trabajo) in enumerate(trabajos) if trabajo["tipos"]]
+
+    # La plantilla se lee una sola vez aquí y se envía ya procesada a cada trabajador
+    hojas = [TIPOS_PLANILLA[tipo]["hoja"] for tipo in tipos]
+    with tiempos.etapa("leer plantilla"):
+        modelos = exportar_modelos(hojas, plantilla) if pendientes else None
+
+    salida = ZipSalida(espejo=carpeta, ruta=ruta_zip)
+    union = _UnionLote(trabajos, tipos, codigo_oficio, unir_pdf, salida, al_unir) if unir_pdf and convertidor else None
+
+    # Cada comunidad entra al ZIP apenas termina; sus bytes no se guardan en el resumen
+    def _al_terminar(indice, resultado_error):
+        resultado, error = resultado_error
+        fila_resumen, trabajo = trabajos[indice]
+        archivos = None
+        if error:
+            fila_resumen["estado"] = f"error: {error.splitlines()[0]}"
+        else:
+            archivos = resultado["archivos"]
+            with tiempos.etapa("agregar al zip"):
+                for ruta, datos in archivos:
+                    salida.agregar(ruta, datos)
+                    if manifiestos is not None:
+                        carpeta_comunidad, nombre = ruta.split("/", 1)
+                        manifiestos[carpeta_comunidad].anotar(nombre, trabajo["huella"],
+                                                              comunidad=trabajo["datos"]["comunidad"])
+            if manifiestos is not None:
+                manifiestos[trabajo["carpeta"]].anotar_cuis(
+                    trabajo["datos"]["comunidad"], [cui_normalizado(b["CUI"]) for b in trabajo["beneficiarios"]])
+            if trabajo["vigentes"]:
+                # Las planillas sin cambios se leen de la carpeta y van al ZIP (y a la
+                # unión) en el orden de los tipos, sin volver a escribirlas en disco
+                with tiempos.etapa("leer sin cambios"):
+                    vigentes = []
+                    for ruta in trabajo["vigentes"]:
+                        with open(salida.ruta_espejo(ruta), "rb") as f:
+                            vigentes.append((ruta, f.read()))
+                with tiempos.etapa("agregar al zip"):
+                    for ruta, datos in vigentes:
+                        salida.agregar(ruta, datos, espejo=False)
+                orden = {ruta: posicion for posicion, ruta in enumerate(trabajo["rutas"])}
+                archivos = sorted(archivos + vigentes, key=lambda archivo: orden[archivo[0]])
+            if resultado["tiempos"]:
+                tiempos.sumar(resultado["tiempos"])
+            fila_resumen.update({"archivos": len(archivos), "segundos": resultado["segundos"],
+                                 "estado": "ok" if trabajo["tipos"] else "sin cambios"})
+        if union:
+            with tiempos.etapa("unir pdf"):
+                union.agregar(indice, archivos)
+        if resultado:
+            resultado["archivos"] = [ruta for ruta, _ in resultado["archivos"]]
+
+    # Las comunidades sin nada que regenerar se completan aquí mismo, sin trabajador
+    for indice, (_, trabajo) in enumerate(trabajos):
+        if not trabajo["tipos"]:
+            _al_terminar(indice, ({"archivos": [], "segundos": 0.0, "tiempos": None}, None))
+
+    def _progreso(completados, total, posicion):
+        if progreso:
+            progreso(completados, total, trabajos[pendientes[posicion]][0]["comunidad"])
+
+    resultados = ejecutar_en_paralelo(
+        _generar_comunidad,
+        [(trabajos[indice][1],) for indice in pendientes],
+        trabajadores=trabajadores,
+        inicializador=_iniciar_trabajador,
+        initargs=(modelos, convertidor),
+        progreso=_progreso,
+        al_terminar=lambda posicion, resultado_error: _al_terminar(pendientes[posicion], resultado_error),
+        cancelado=cancelado,
+    )
+    for posicion, (_, error) in enumerate(resultados):
+        if error == CANCELADO:
+            trabajos[pendientes[posicion]][0]["estado"] = "cancelado"
+            if union:
+                union.agregar(pendientes[posicion], None)
+    if union:
+        with tiempos.etapa("unir pdf"):
+            union.cerrar()
+    for manifiesto in (manifiestos or {}).values():
+        manifiesto.guardar()
+
+    if not len(salida):
+        salida.descartar()
+        return resumen, None, None
+    with tiempos.etapa("cerrar zip"):
+        archivo_zip = salida.cerrar()
+    copia = salida.guardar(os.path.join(carpeta, f"Planillas_{codigo_oficio.strip()}.zip")) if carpeta else None
+    return resumen, archivo_zip, copia
+
+
+# Anota en el manifiesto de `carpeta` una planilla guardada fuera de un lote (el botón
+# de una comunidad), para que un lote incremental no tome por vigente el archivo que
+# acaba de reemplazarse. Con otros datos que los del lote la huella no coincide y el
+# lote la regenera, que es lo seguro. Si la planilla lleva beneficiarios, sus CUI
+# quedan también para la revisión de oficios anteriores (ver cui.historial_cui).
+def anotar_planilla(carpeta, nombre, datos, beneficiarios, convertidor, plantilla=RUTA_PLANTILLA,
+                    logo_path="logo_maga.png"):
+    manifiesto = Manifiesto(carpeta)
+    manifiesto.anotar(nombre, huella(datos, beneficiarios, convertidor, plantilla, logo_path),
+                      comunidad=datos["comunidad"])
+    if beneficiarios:
+        manifiesto.anotar_cuis(datos["comunidad"], [cui_normalizado(b["CUI"]) for b in beneficiarios])
+    manifiesto.guardar()
+
+
+# Calcula la huella de una comunidad y, con `incremental`, deja en su trabajo solo los
+# tipos cuya planilla cambió respecto del manifiesto de su carpeta; las vigentes quedan
+# en trabajo["vigentes"] (rutas en el ZIP)
+def _comparar_manifiesto(trabajo, manifiestos, carpeta_base, incremental=True):
+    carpeta = trabajo["carpeta"]
+    if carpeta not in manifiestos:
+        manifiestos[carpeta] = Manifiesto(os.path.join(carpeta_base, carpeta))
+    manifiesto = manifiestos[carpeta]
+    trabajo["huella"] = huella(trabajo["datos"], trabajo["beneficiarios"], trabajo["convertidor"],
+                               trabajo["plantilla"], trabajo["logo_path"])
+    trabajo["rutas"] = []
+    pendientes = []
+    for tipo in trabajo["tipos"]:
+        nombre = nombre_salida(tipo, trabajo["datos"], trabajo["convertidor"])
+        trabajo["rutas"].append(f"{carpeta}/{nombre}")
+        if incremental and manifiesto.vigente(nombre, trabajo["huella"]):
+            trabajo["vigentes"].append(f"{carpeta}/{nombre}")
+        else:
+            pendientes.append(tipo)
+    trabajo["tipos"] = pendientes
+
+
+# Uso desde consola, sin Streamlit:
+#   python generacion.py comunidades.xlsx beneficiarios.xlsx --tipos entrega asistencia --pdf
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Genera planillas de todas las comunidades sin abrir la app.")
+    parser.add_argument("comunidades", help="Archivo Excel con los datos de comunidades")
+    parser.add_argument("beneficiarios", help="Archivo Excel con los beneficiarios (columna Referencia)")
+    parser.add_argument("--tipos", nargs="+", choices=TIPOS_LOTE, default=["entrega"])
+    parser.add_argument("--comunidad", action="append",
+                        help="Generar solo esta comunidad (se puede repetir)")
+    parser.add_argument("--unidad", default="DAPCA", help="Unidad ejecutora")
+    parser.add_argument("--oficio", default="001", help="Número de oficio")
+    parser.add_argument("--anio", default="2025")
+    parser.add_argument("--pdf", nargs="?", const="", default=None, metavar="CONVERTIDOR",
+                        help="Exportar también a PDF (excel, libreoffice o directo; por defecto el del equipo)")
+    parser.add_argument("--unir", choices=UNIONES_PDF, default=None,
+                        help="Unir los PDF en uno por departamento o uno para todo el oficio (requiere --pdf)")
+    parser.add_argument("--trabajadores", type=int, default=1, help="Procesos en paralelo")
+    parser.add_argument("--salida", default=None, help="Carpeta base (por defecto Escritorio/PLANILLAS 2025)")
+    parser.add_argument("--zip", default=None, metavar="RUTA",
+                        help="Guardar solo el ZIP en esta ruta, sin copiar los archivos a la carpeta base")
+    parser.add_argument("--aproximadas", action="store_true",
+                        help="Asignar también las referencias que coinciden solo aproximadamente con una comunidad")
+    parser.add_argument("--todo", action="store_true",
+                        help="Regenerar todas las planillas, aunque el manifiesto de la carpeta diga que no cambiaron")
+    parser.add_argument("--plantilla", default=RUTA_PLANTILLA)
+    parser.add_argument("--logo", default="logo_maga.png")
+    args = parser.parse_args(argumentos)
+
+    from ingesta import leer_comunidades, leer_beneficiarios
+
+    df_comunidades = leer_comunidades(args.comunidades)
+    beneficiarios = leer_beneficiarios(args.beneficiarios)
+    # Se empareja con todas las comunidades del archivo, también las que --comunidad deja fuera
+    from coincidencias import APROXIMADA, asignar, emparejar, por_revisar
+    coincidencias = emparejar(beneficiarios, df_comunidades['Comunidad/ Establecimiento'])
+    confirmadas = coincidencias.loc[coincidencias["Estado"] == APROXIMADA, "Referencia"] if args.aproximadas else ()
+    beneficiarios = asignar(beneficiarios, coincidencias, confirmadas)
+    if args.comunidad:
+        elegidas = {clave_comunidad(c) for c in args.comunidad}
+        df_comunidades = df_comunidades[df_comunidades['Comunidad/ Establecimiento'].str.lower().isin(elegidas)]
+    for _, fila in por_revisar(coincidencias).iterrows():
+        if isinstance(fila["Comunidad"], str):
+            destino = fila["Comunidad"] if fila["Estado"] != APROXIMADA or args.aproximadas else \
+                f"sin asignar (¿{fila['Comunidad']}? confirmar con --aproximadas)"
+        else:
+            destino = f"sin asignar (¿{fila['Alternativa']}?)" if isinstance(fila["Alternativa"], str) else "sin asignar"
+        print(f"Referencia '{fila['Referencia']}' ({fila['Filas']} filas): {fila['Estado']} -> {destino}")
+
+    convertidor = None
+    if args.pdf is not None:
+        convertidor = args.pdf or convertidor_por_defecto()
+
+    def progreso(completados, total, comunidad):
+        print(f"[{completados}/{total}] {comunidad}", flush=True)
+
+    inicio = time.perf_counter()
+    resumen, archivo_zip, copia = generar_lote(df_comunidades, beneficiarios, args.tipos,
+                                            armar_codigo_oficio(args.unidad, args.oficio, args.anio), args.unidad,
+                                               convertidor=convertidor, trabajadores=args.trabajadores,
+                                               progreso=progreso, logo_path=args.logo, plantilla=args.plantilla,
+                                               carpeta_base=args.salida, unir_pdf=args.unir, espejo=args.zip is None,
+                                               incremental=not args.todo, ruta_zip=args.zip)
+    # Sin --zip el ZIP que vale es la copia en la carpeta base; el temporal sobra
+    ruta_zip = args.zip if archivo_zip else None
+    if archivo_zip and not args.zip:
+        archivo_zip.close()
+        ruta_zip = copia
+    for fila in resumen:
+        print(f"{fila['comunidad']}: {fila['beneficiarios']} beneficiarios, {fila['archivos']} archivos, "
+              f"{fila['segundos']} s, {fila['estado']}")
+    print(f"Tiempo total: {time.perf_counter() - inicio:.1f} s")
+    if ruta_zip:
+        print(f"ZIP: {ruta_zip}")
+    return 0 if all(not fila["estado"].startswith("error") for fila in resumen) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
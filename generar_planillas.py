@@ -3,10 +3,10 @@ import pandas as pd
 import streamlit as st
 from docxtpl import DocxTemplate
 from docx2pdf import convert
-import zipfile
-from io import BytesIO
 import tempfile
 import datetime
+from concurrent.futures import ProcessPoolExecutor
+from salida import ZipSalida
 
 # --- CONFIGURACIÓN ---
 TEMPLATE_PATH = "PLANILLAS DAPCA v3.docx"
@@ -39,11 +39,16 @@ if archivo_1:
 
     df_beneficiarios = pd.DataFrame(datos_beneficiarios)
 
+    guardar_copia = st.checkbox("Guardar copia en PLANILLAS 2025", value=False)
+
     # Botón para generar planillas
     if st.button("📄 Generar planillas PDF por comunidad"):
+        # Word solo convierte archivos: los DOCX y los PDF pasan por una carpeta temporal,
+        # y cada PDF entra al ZIP (un temporal, ver salida.temporal) apenas termina su conversión
+        espejo = os.path.join(os.path.expanduser("~"), "Desktop", "PLANILLAS 2025") if guardar_copia else None
         with tempfile.TemporaryDirectory() as tmpdir:
-            output_zip = os.path.join(tmpdir, "planillas.zip")
-            pdf_paths = []
+            salida = ZipSalida(espejo=espejo)
+            conversiones = []
 
             for comunidad in comunidades:
                 ref = comunidad.strip().lower()
@@ -102,20 +107,34 @@ if archivo_1:
 
                 doc.render(context)
                 doc.save(output_docx)
-
-                convert(output_docx, output_pdf)
-                pdf_paths.append(output_pdf)
-
-            # Crear ZIP con todos los PDFs
-            with zipfile.ZipFile(output_zip, "w") as zf:
-                for pdf in pdf_paths:
-                    zf.write(pdf, arcname=os.path.basename(pdf))
-
-            # Descargar ZIP
-            with open(output_zip, "rb") as f:
-                st.download_button(
-                    label="⬇️ Descargar planillas en ZIP",
-                    data=f,
-                    file_name="planillas_comunidades.zip",
-                    mime="application/zip"
-                )
\ No newline at end of file
+                conversiones.append((output_docx, output_pdf))
+
+            def agregar_pdf(indice):
+                _, output_pdf = conversiones[indice]
+                with open(output_pdf, "rb") as f:
+                    salida.agregar(os.path.basename(output_pdf), f.read())
+                os.remove(output_pdf)
+
+            # Word (docx2pdf) no admite conversiones simultáneas: van de a una, en orden, en
+            # un solo proceso aparte que le da a COM su propio hilo principal. Un DOCX que
+            # falla no detiene a los demás.
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                futuros = [executor.submit(convert, output_docx, output_pdf) for output_docx, output_pdf in conversiones]
+                for indice, futuro in enumerate(futuros):
+                    try:
+                        futuro.result()
+                    except Exception as e:
+                        output_docx, _ = conversiones[indice]
+                        st.warning(f"No se pudo convertir {os.path.basename(output_docx)}: {type(e).__name__}: {e}")
+                    else:
+                        agregar_pdf(indice)
+            with salida.cerrar() as archivo_zip:
+                datos_zip = archivo_zip.read()
+
+        # Descargar ZIP
+        st.download_button(
+            label="⬇️ Descargar planillas en ZIP",
+            data=datos_zip,
+            file_name="planillas_comunidades.zip",
+            mime="application/zip"
+        )
\ No newline at end of file
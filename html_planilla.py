@@ -0,0 +1,310 @@
+import html
+import os
+import threading
+from datetime import date, datetime
+from pathlib import Path
+
+from openpyxl.cell.cell import Cell
+from openpyxl.utils import coordinate_to_tuple
+
+from maqueta import (BORDES, MaquetaHoja, color_rgb, filas_con_contenido, filas_visibles_plantilla,
+                     formatear_valor, referencia_formula)
+from plantillas import compartir_imagenes
+
+RUTA_FUENTE_CODIGO = os.path.join("fonts", "DAPCA.ttf")
+
+# Familias de respaldo para las fuentes de la plantilla que pueden no estar instaladas
+FAMILIAS = {
+    "Calibri": "'Calibri', 'Carlito', sans-serif",
+    "Arial": "'Arial', 'Liberation Sans', sans-serif",
+}
+
+RELLENO = 2.0  # Separación del texto con el borde de la celda, en puntos sin escalar
+
+# Estilo común a todas las planillas. Se compila una sola vez por proceso junto con
+# la configuración de fuentes de WeasyPrint (ver _recursos).
+CSS_BASE = """
+@font-face { font-family: 'PLANILLAS DAP'; src: url(%(fuente_codigo)s); }
+html, body { margin: 0; padding: 0; }
+.pagina { position: relative; overflow: hidden; break-after: page; }
+.pagina:last-child { break-after: auto; }
+table.hoja { border-collapse: collapse; table-layout: fixed; }
+table.hoja td { overflow: visible; white-space: nowrap; vertical-align: bottom; }
+table.hoja td.ajustar { white-space: normal; overflow-wrap: break-word; }
+img.imagen { position: absolute; }
+"""
+
+_recursos_weasyprint = None
+_lock = threading.Lock()
+# La configuración de fuentes compartida no admite dos documentos a la vez
+_lock_render = threading.Lock()
+
+# Esquema de las URLs de imágenes del documento; el lector de URLs las sirve desde memoria
+ESQUEMA_IMAGEN = "planilla-imagen:"
+
+
+# Hoja de estilo base y configuración de fuentes de WeasyPrint, creadas una vez por
+# proceso y reutilizadas en cada documento (compilar el CSS y buscar fuentes es caro)
+def _recursos():
+    global _recursos_weasyprint
+    with _lock:
+        if _recursos_weasyprint is None:
+            from weasyprint import CSS
+            from weasyprint.text.fonts import FontConfiguration
+            fuentes = FontConfiguration()
+            fuente_codigo = Path(RUTA_FUENTE_CODIGO).resolve().as_uri()
+            hoja = CSS(string=CSS_BASE % {"fuente_codigo": fuente_codigo}, font_config=fuentes)
+            _recursos_weasyprint = (hoja, fuentes)
+        return _recursos_weasyprint
+
+
+def _color_css(color, defecto=None):
+    rgb = color_rgb(color)
+    if rgb is None:
+        return defecto
+    return "#%02x%02x%02x" % tuple(round(c * 255) for c in rgb)
+
+
+def _texto_celda(ws, celda):
+    valor = celda.value
+    if valor is None:
+        return ""
+    referencia = referencia_formula(valor)
+    if referencia:
+        # Las páginas copiadas repiten los encabezados con fórmulas como "=K1"
+        apuntada = ws._cells.get(coordinate_to_tuple(referencia))
+        valor = apuntada.value if apuntada is not None else None
+        if valor is None or referencia_formula(valor):
+            return ""
+    elif isinstance(valor, str) and valor.startswith("="):
+        return ""
+    if isinstance(valor, (datetime, date)):
+        return valor.strftime("%d/%m/%Y")
+    return formatear_valor(valor)
+
+
+def _borde_css(lado, escala):
+    if lado is None or not lado.style:
+        return None
+    grosor, guiones = BORDES.get(lado.style, (0.5, None))
+    if lado.style == "double":
+        tipo = "double"
+    elif lado.style in ("dotted", "hair") and guiones:
+        tipo = "dotted"
+    else:
+        tipo = "dashed" if guiones else "solid"
+    return f"{grosor * escala:.2f}pt {tipo} {_color_css(lado.color, '#000')}"
+
+
+# Declaraciones CSS de una celda: fuente, alineación, relleno y los bordes del
+# contorno de su rango (la esquina superior izquierda aporta arriba e izquierda)
+def _estilo_celda(celda, derecha, abajo, escala, numero):
+    fuente = celda.font
+    alineacion = celda.alignment
+    nombre = fuente.name or "Calibri"
+    declaraciones = [
+        f"font-family: {FAMILIAS.get(nombre, repr(nombre) + ', sans-serif')}",
+        f"font-size: {float(fuente.sz or 11) * escala:.2f}pt",
+        f"padding: 0 {RELLENO * escala:.2f}pt",
+    ]
+    if fuente.b:
+        declaraciones.append("font-weight: bold")
+    if fuente.i:
+        declaraciones.append("font-style: italic")
+    if fuente.u:
+        declaraciones.append("text-decoration: underline")
+    color = _color_css(fuente.color)
+    if color:
+        declaraciones.append(f"color: {color}")
+
+    horizontal = alineacion.horizontal or "general"
+    if horizontal == "general":
+        horizontal = "right" if numero else "left"
+    elif horizontal in ("centerContinuous", "distributed"):
+        horizontal = "center"
+    elif horizontal == "fill":
+        horizontal = "left"
+    declaraciones.append(f"text-align: {horizontal}")
+    vertical = {"center": "middle", "distributed": "middle", "justify": "middle"}.get(
+        alineacion.vertical, alineacion.vertical or "bottom")
+    declaraciones.append(f"vertical-align: {vertical}")
+
+    relleno = celda.fill
+    if relleno is not None and relleno.fill_type == "solid":
+        fondo = _color_css(relleno.fgColor)
+        if fondo:
+            declaraciones.append(f"background-color: {fondo}")
+
+    borde = celda.border
+    for propiedad, lado in (("top", borde.top), ("left", borde.left),
+                            ("right", derecha.border.right), ("bottom", abajo.border.bottom)):
+        css = _borde_css(lado, escala)
+        if css:
+            declaraciones.append(f"border-{propiedad}: {css}")
+    return "; ".join(declaraciones)
+
+
+# Índices de fuente, borde, relleno, alineación, etc. de una celda en las tablas del libro
+def _indices_estilo(celda):
+    return tuple(celda._style) if celda.has_style else ()
+
+
+# Filas que imprime una hoja del libro generado: las visibles hasta la última con algo impreso
+def _filas_impresas(ws):
+    visibles = filas_visibles_plantilla(ws, 1, ws.max_row)
+    con_contenido = filas_con_contenido(ws, set(visibles))
+    if not con_contenido:
+        return visibles[:1]
+    ultima = max(con_contenido)
+    return [fila for fila in visibles if fila <= ultima]
+
+
+# Lo que comparten las páginas de un documento: clases de estilo, tamaños de papel e imágenes
+class _Documento:
+    def __init__(self):
+        self.estilos = {}   # estilos de celda (índices de openpyxl) -> clase
+        self.clases = {}    # declaraciones CSS -> clase
+        self.paginas = {}   # regla @page -> nombre
+        self.imagenes = {}  # huella -> ImagenCompartida
+
+
+# Tabla HTML de una hoja, con la geometría de la plantilla ya escalada a su página
+class _PaginaHTML:
+    def __init__(self, ws, documento):
+        filas = _filas_impresas(ws)
+        self.ws = ws
+        self.maqueta = MaquetaHoja(ws, filas[0], filas[-1], filas) if filas else None
+        self.documento = documento
+
+    def _celda(self, fila, col):
+        return self.ws._cells.get((fila, col)) or Cell(self.ws, row=fila, column=col)
+
+    # Clase CSS de una celda; las celdas con el mismo estilo (en cualquier hoja del
+    # documento) comparten la clase y sus declaraciones se arman una sola vez
+    def _clase(self, celda, derecha, abajo, escala, numero):
+        clave = (_indices_estilo(celda), _indices_estilo(derecha), _indices_estilo(abajo), escala, numero)
+        clase = self.documento.estilos.get(clave)
+        if clase is None:
+            declaraciones = _estilo_celda(celda, derecha, abajo, escala, numero)
+            clase = self.documento.clases.setdefault(declaraciones, f"e{len(self.documento.clases)}")
+            self.documento.estilos[clave] = clase
+        return clase
+
+    # Regla @page de la hoja y la escala con la que su ventana cabe en el papel
+    def pagina(self):
+        maqueta = self.maqueta
+        (ancho_papel, alto_papel), (izq, der, sup, inf), escala = maqueta.pagina()
+        if maqueta.ancho_total and maqueta.alto_total:
+            escala = min(escala, (ancho_papel - izq - der) / maqueta.ancho_total,
+                         (alto_papel - sup - inf) / maqueta.alto_total)
+        regla = (f"size: {ancho_papel:.1f}pt {alto_papel:.1f}pt; "
+                 f"margin: {sup:.1f}pt {der:.1f}pt {inf:.1f}pt {izq:.1f}pt")
+        return regla, escala
+
+    def html(self, regla, escala):
+        maqueta = self.maqueta
+        paginas = self.documento.paginas
+        nombre_pagina = paginas.setdefault(regla, f"papel{len(paginas)}")
+
+        anchos = {col: maqueta.x[col] - maqueta.x[col - 1] for col in maqueta.columnas}
+        columnas = [col for col in maqueta.columnas if anchos[col] > 0]
+        visibles_col = set(columnas)
+
+        # Rangos combinados reducidos a sus filas y columnas visibles
+        anclas = {}
+        cubiertas = set()
+        for rango in maqueta.combinadas.values():
+            filas_r = [f for f in range(rango.min_row, rango.max_row + 1) if f in maqueta.y]
+            cols_r = [c for c in range(rango.min_col, rango.max_col + 1) if c in visibles_col]
+            if not filas_r or not cols_r:
+                continue
+            anclas[(filas_r[0], cols_r[0])] = (rango, len(filas_r), len(cols_r))
+            cubiertas.update((f, c) for f in filas_r for c in cols_r)
+
+        partes = [f'<section class="pagina" style="page: {nombre_pagina}; '
+                  f'width: {maqueta.ancho_total * escala:.2f}pt; height: {maqueta.alto_total * escala:.2f}pt">',
+                  f'<table class="hoja" style="width: {sum(anchos[c] for c in columnas) * escala:.2f}pt"><colgroup>']
+        partes.extend(f'<col style="width: {anchos[col] * escala:.2f}pt">' for col in columnas)
+        partes.append("</colgroup>")
+
+        celdas = self.ws._cells
+        for fila in maqueta.filas:
+            partes.append(f'<tr style="height: {maqueta.alto_fila(fila) * escala:.2f}pt">')
+            for col in columnas:
+                atributos = ""
+                ancla = anclas.get((fila, col))
+                if ancla is not None:
+                    rango, filas_span, cols_span = ancla
+                    celda = self._celda(rango.min_row, rango.min_col)
+                    derecha = self._celda(rango.min_row, rango.max_col)
+                    abajo = self._celda(rango.max_row, rango.min_col)
+                    if filas_span > 1:
+                        atributos += f' rowspan="{filas_span}"'
+                    if cols_span > 1:
+                        atributos += f' colspan="{cols_span}"'
+                elif (fila, col) in cubiertas:
+                    continue
+                else:
+                    celda = celdas.get((fila, col))
+                    if celda is None:
+                        partes.append("<td></td>")
+                        continue
+                    derecha = abajo = celda
+
+                texto = _texto_celda(self.ws, celda)
+                clase = self._clase(celda, derecha, abajo, escala, isinstance(celda.value, (int, float)))
+                if celda.alignment.wrap_text:
+                    clase += " ajustar"
+                partes.append(f'<td class="{clase}"{atributos}>{html.escape(texto)}</td>')
+            partes.append("</tr>")
+        partes.append("</table>")
+
+        for img, x, y, ancho, alto in maqueta.imagenes():
+            self.documento.imagenes[img.huella] = img
+            partes.append(f'<img class="imagen" src="{ESQUEMA_IMAGEN}{img.huella}.{img.format}" '
+                          f'style="left: {x * escala:.2f}pt; top: {y * escala:.2f}pt; '
+                          f'width: {ancho * escala:.2f}pt; height: {alto * escala:.2f}pt">')
+        partes.append("</section>")
+        return "".join(partes)
+
+
+# Documento HTML con todas las hojas del libro, una por página, fiel a la plantilla:
+# anchos de columna, alto de filas, celdas combinadas, bordes, fuentes y el logo.
+# Devuelve (html, imágenes por huella) para pasarlo a pdf_libro o mostrarlo.
+def html_libro(wb):
+    compartir_imagenes(wb)
+    documento = _Documento()
+    hojas = [_PaginaHTML(ws, documento) for ws in wb.worksheets]
+    hojas = [hoja for hoja in hojas if hoja.maqueta is not None]
+    # Todas las páginas con el mismo papel usan la misma escala (la menor que cabe),
+    # como la escala fija de la plantilla en Excel
+    paginas = [hoja.pagina() for hoja in hojas]
+    escalas = {}
+    for regla, escala in paginas:
+        escalas[regla] = min(escala, escalas.get(regla, escala))
+    cuerpo = [hoja.html(regla, escalas[regla]) for hoja, (regla, _) in zip(hojas, paginas)]
+    estilos = [f"@page {nombre} {{ {regla} }}" for regla, nombre in documento.paginas.items()]
+    estilos.extend(f"td.{clase} {{ {declaraciones} }}" for declaraciones, clase in documento.clases.items())
+    texto = ('<!DOCTYPE html><html><head><meta charset="utf-8"><style>'
+             + "\n".join(estilos) + "</style></head><body>" + "".join(cuerpo) + "</body></html>")
+    return texto, documento.imagenes
+
+
+# PDF en memoria de todas las hojas del libro, en una sola pasada de WeasyPrint y
+# sin archivos temporales. Cada imagen se entrega una sola vez desde memoria.
+def pdf_libro(wb):
+    from weasyprint import HTML, default_url_fetcher
+
+    documento, imagenes = html_libro(wb)
+    hoja, fuentes = _recursos()
+
+    def leer_url(url, *args, **kwargs):
+        if url.startswith(ESQUEMA_IMAGEN):
+            huella = url[len(ESQUEMA_IMAGEN):].rsplit(".", 1)[0]
+            img = imagenes[huella]
+            return {"string": img.datos, "mime_type": f"image/{img.format}"}
+        return default_url_fetcher(url, *args, **kwargs)
+
+    with _lock_render:
+        return HTML(string=documento, base_url=os.getcwd(), url_fetcher=leer_url).write_pdf(
+            stylesheets=[hoja], font_config=fuentes)
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import pickle
+import tempfile
+from io import BytesIO
+
+import pandas as pd
+import streamlit as st
+
+from beneficiarios import IndiceBeneficiarios, COLUMNAS_BENEFICIARIOS, canonizar_columna
+
+# Archivos distintos que se conservan ya procesados y cuánto tiempo (segundos)
+MAX_ARCHIVOS_CACHE = 8
+TTL_CACHE = 60 * 60
+
+# Índices de beneficiarios ya normalizados guardados en disco entre sesiones.
+# Cambiar VERSION_CACHE si cambia lo que guarda IndiceBeneficiarios.
+CARPETA_CACHE = os.environ.get("PLANILLAS_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "planillas"))
+VERSION_CACHE = 3
+MAX_ARCHIVOS_DISCO = 20
+
+
+# Huella del contenido de un archivo: el mismo Excel subido dos veces da la misma clave
+def huella_contenido(datos):
+    return hashlib.sha256(datos).hexdigest()
+
+
+# Lee el archivo de comunidades con los ajustes de columnas de la app.
+# `origen` puede ser una ruta, un archivo abierto o los bytes del archivo.
+def leer_comunidades(origen):
+    if isinstance(origen, bytes):
+        origen = BytesIO(origen)
+    df_comunidades = pd.read_excel(origen)
+    df_comunidades.columns = df_comunidades.columns.str.strip().str.replace('\xa0', '', regex=False)
+    if 'Comunidad/ Establecimiento' not in df_comunidades.columns:
+        raise ValueError("El archivo de comunidades debe tener la columna 'Comunidad/ Establecimiento'")
+    df_comunidades['Comunidad/ Establecimiento'] = df_comunidades['Comunidad/ Establecimiento'].astype(str).str.strip()
+    return df_comunidades
+
+
+# Lector más rápido disponible: calamine (Rust) si está instalado, si no openpyxl
+def motor_excel():
+    try:
+        import python_calamine  # noqa: F401
+        return "calamine"
+    except ImportError:
+        return None
+
+
+# Lee del Excel solo Referencia, las columnas de nombre y CUI, reconociendo los
+# encabezados aunque traigan \xa0, espacios o minúsculas
+def _leer_columnas_beneficiarios(datos):
+    return pd.read_excel(BytesIO(datos), engine=motor_excel(),
+                         usecols=lambda nombre: canonizar_columna(nombre) in COLUMNAS_BENEFICIARIOS)
+
+
+def _ruta_cache(huella):
+    return os.path.join(CARPETA_CACHE, f"beneficiarios-{huella}-v{VERSION_CACHE}.pkl")
+
+
+def _leer_cache_disco(huella):
+    try:
+        with open(_ruta_cache(huella), "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+
+
+# Guarda el índice de forma atómica y deja solo los MAX_ARCHIVOS_DISCO más recientes
+def _guardar_cache_disco(huella, indice):
+    try:
+        os.makedirs(CARPETA_CACHE, exist_ok=True)
+        with tempfile.NamedTemporaryFile("wb", dir=CARPETA_CACHE, suffix=".tmp", delete=False) as f:
+            pickle.dump(indice, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f.name, _ruta_cache(huella))
+        archivos = sorted((os.path.join(CARPETA_CACHE, nombre) for nombre in os.listdir(CARPETA_CACHE)
+                           if nombre.startswith("beneficiarios-") and nombre.endswith(".pkl")),
+                          key=os.path.getmtime, reverse=True)
+        for viejo in archivos[MAX_ARCHIVOS_DISCO:]:
+            os.remove(viejo)
+    except OSError:
+        pass  # Sin cache en disco se sigue funcionando, solo más lento
+
+
+# Lee y normaliza el archivo de beneficiarios (ver beneficiarios.IndiceBeneficiarios).
+# `origen` puede ser una ruta, un archivo abierto o los bytes del archivo. Un archivo
+# con el mismo contenido que uno ya leído se toma de la cache en disco.
+def leer_beneficiarios(origen, huella=None):
+    if isinstance(origen, (str, os.PathLike)):
+        with open(origen, "rb") as f:
+            datos = f.read()
+    elif isinstance(origen, bytes):
+        datos = origen
+    else:
+        datos = origen.read()
+    huella = huella or huella_contenido(datos)
+
+    indice = _leer_cache_disco(huella)
+    if indice is None:
+        indice = IndiceBeneficiarios(_leer_columnas_beneficiarios(datos))
+        _guardar_cache_disco(huella, indice)
+    else:
+        # Al abrirlo de nuevo se marca como reciente para la limpieza
+        try:
+            os.utime(_ruta_cache(huella))
+        except OSError:
+            pass
+    return indice
+
+
+# La clave de cache es solo la huella; los bytes (con "_") no se vuelven a hashear
+@st.cache_data(max_entries=MAX_ARCHIVOS_CACHE, ttl=TTL_CACHE, show_spinner="Leyendo archivo de comunidades...")
+def _comunidades_por_huella(huella, _datos):
+    return leer_comunidades(_datos)
+
+
+# El índice es de solo lectura (emparejar y asignar trabajan sobre copias), así que
+# se comparte tal cual entre reruns y sesiones, sin copiarlo en cada acceso
+@st.cache_resource(max_entries=MAX_ARCHIVOS_CACHE, ttl=TTL_CACHE, show_spinner="Leyendo archivo de beneficiarios...")
+def _beneficiarios_por_huella(huella, _datos):
+    return leer_beneficiarios(_datos, huella)
+
+
+# Comunidades de un archivo subido; se procesa una sola vez por contenido distinto
+# y los reruns de Streamlit (cualquier widget) reutilizan el resultado
+def cargar_comunidades(archivo_subido):
+    datos = archivo_subido.getvalue()
+    return _comunidades_por_huella(huella_contenido(datos), datos)
+
+
+# Índice de beneficiarios de un archivo subido, cacheado igual que las comunidades
+def cargar_beneficiarios(archivo_subido):
+    datos = archivo_subido.getvalue()
+    return _beneficiarios_por_huella(huella_contenido(datos), datos)
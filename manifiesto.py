@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+# Manifiesto de una carpeta de planillas (Planillas_<dep>_<codigo>): por cada archivo
+# generado guarda la huella de todo lo que lo produjo (filas de beneficiarios, valores
+# de encabezado, versión de la plantilla y del logo, convertidor). Un lote que guarda
+# en disco lo consulta para regenerar solo las planillas cuya huella cambió; las demás
+# se toman tal como quedaron en la carpeta.
+#
+#   manifiesto = Manifiesto(carpeta)
+#   if not manifiesto.vigente(nombre, huella):
+#       ...generar y guardar...
+#       manifiesto.anotar(nombre, huella, comunidad="Aldea Uno")
+#   manifiesto.guardar()
+#
+# Todo lo que se guarda en la carpeta se anota, también en una corrida completa o desde
+# el botón de una comunidad: si no, el manifiesto conservaría la huella de un archivo
+# que ya tiene otros datos y un lote incremental lo daría por vigente.
+
+NOMBRE_MANIFIESTO = "manifiesto.json"
+# Subirla al cambiar cómo se llenan o dibujan las planillas, para regenerar todo
+VERSION_GENERACION = 1
+
+_versiones = {}
+# Un solo guardado a la vez en este proceso (ver Manifiesto.guardar)
+_lock_guardar = threading.Lock()
+
+
+# Huella del contenido de un archivo (plantilla, logo) o None si no existe; se
+# recalcula solo cuando cambia su fecha o su tamaño
+def version_archivo(ruta):
+    try:
+        estado = os.stat(ruta)
+    except OSError:
+        return None
+    clave = (os.path.abspath(ruta), estado.st_mtime_ns, estado.st_size)
+    if clave not in _versiones:
+        sha = hashlib.sha256()
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(bloque)
+        _versiones[clave] = sha.hexdigest()
+    return _versiones[clave]
+
+
+# Huella de las planillas de una comunidad: cambia si cambia cualquier fila de sus
+# beneficiarios, cualquier valor de encabezado (dep, mun, técnico, DPI, insumo, códigos),
+# la plantilla, el logo o el convertidor
+def huella(datos, beneficiarios, convertidor, plantilla, logo_path):
+    contenido = json.dumps({
+        "version": VERSION_GENERACION,
+        "datos": datos,
+        "beneficiarios": beneficiarios,
+        "convertidor": convertidor,
+        "plantilla": version_archivo(plantilla),
+        "logo": version_archivo(logo_path),
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+class Manifiesto:
+    def __init__(self, carpeta):
+        self.carpeta = carpeta
+        self.ruta = os.path.join(carpeta, NOMBRE_MANIFIESTO)
+        self.archivos = {}  # nombre del archivo -> {"huella", "fecha", ...}
+        self.cuis = {}      # comunidad -> CUI de sus beneficiarios (ver cui.historial_cui)
+        self.cambios = False
+        self._anotados = set()   # archivos anotados desde que se leyó
+        self._comunidades = set()  # comunidades con CUI anotados desde que se leyó
+        try:
+            with open(self.ruta, encoding="utf-8") as f:
+                contenido = json.load(f)
+            self.archivos = contenido.get("archivos", {})
+            self.cuis = contenido.get("cuis", {})
+        except (OSError, ValueError, AttributeError):
+            pass  # Sin manifiesto (o dañado) se regenera todo
+
+    # True si el archivo sigue en la carpeta y se generó con la misma huella
+    def vigente(self, nombre, huella):
+        entrada = self.archivos.get(nombre)
+        return (entrada is not None and entrada.get("huella") == huella
+                and os.path.exists(os.path.join(self.carpeta, nombre)))
+
+    def anotar(self, nombre, huella, **datos):
+        self.archivos[nombre] = {"huella": huella, "fecha": datetime.now().isoformat(timespec="seconds"), **datos}
+        self._anotados.add(nombre)
+        self.cambios = True
+
+    def anotar_cuis(self, comunidad, cuis):
+        cuis = sorted(cui for cui in cuis if cui)
+        if self.cuis.get(comunidad) != cuis:
+            self.cuis[comunidad] = cuis
+            self._comunidades.add(comunidad)
+            self.cambios = True
+
+    # Escribe el manifiesto si cambió, reemplazando el anterior de una sola vez. Se
+    # parte de lo que haya en disco en ese momento y se le aplican solo las entradas
+    # anotadas aquí, así un lote largo no borra lo que guardó mientras tanto el botón
+    # de una comunidad (u otro lote) en la misma carpeta.
+    def guardar(self):
+        if not self.cambios:
+            return
+        with _lock_guardar:
+            en_disco = Manifiesto(self.carpeta)
+            en_disco.archivos.update({nombre: self.archivos[nombre] for nombre in self._anotados})
+            en_disco.cuis.update({comunidad: self.cuis[comunidad] for comunidad in self._comunidades})
+            self.archivos, self.cuis = en_disco.archivos, en_disco.cuis
+            temporal = self.ruta + ".tmp"
+            try:
+                os.makedirs(self.carpeta, exist_ok=True)
+                with open(temporal, "w", encoding="utf-8") as f:
+                    json.dump({"version": VERSION_GENERACION, "archivos": self.archivos, "cuis": self.cuis}, f,
+                              ensure_ascii=False, indent=1, sort_keys=True)
+                os.replace(temporal, self.ruta)
+                self.cambios = False
+                self._anotados.clear()
+                self._comunidades.clear()
+            except OSError:
+                pass  # Sin manifiesto la próxima corrida regenera todo, como antes
@@ -0,0 +1,235 @@
+import re
+from bisect import bisect_right
+
+from openpyxl.utils import coordinate_to_tuple
+
+# Conversión de unidades de Excel a puntos (1 pt = 1/72")
+PX_A_PT = 0.75
+EMU_POR_PT = 12700
+ALTO_FILA_DEFECTO = 15.0
+
+# Tamaños de papel de Excel (page_setup.paperSize) en puntos, en vertical
+PAPELES = {
+    1: (612, 792),      # Carta
+    5: (612, 1008),     # Oficio (Legal)
+    9: (595.3, 841.9),  # A4
+    14: (612, 936),     # Folio 8.5" × 13"
+}
+
+# Grosor en puntos (sin escalar) y patrón de guiones de cada estilo de borde de Excel
+BORDES = {
+    "hair": (0.25, None), "thin": (0.5, None), "medium": (1.0, None), "thick": (1.5, None),
+    "double": (1.5, None), "dotted": (0.5, (1, 1)), "dashed": (0.5, (3, 2)),
+    "mediumDashed": (1.0, (3, 2)), "dashDot": (0.5, (3, 1, 1, 1)), "mediumDashDot": (1.0, (3, 1, 1, 1)),
+    "dashDotDot": (0.5, (3, 1, 1, 1, 1, 1)), "mediumDashDotDot": (1.0, (3, 1, 1, 1, 1, 1)),
+    "slantDashDot": (1.0, (3, 1, 1, 1)),
+}
+
+# Referencia simple a otra celda, como las fórmulas "=K1" o "=+C14" de las páginas 2 en adelante
+_REFERENCIA = re.compile(r"^=\+?\$?([A-Z]{1,3})\$?(\d+)$")
+
+
+# Ancho de columna de Excel (en caracteres) a puntos, con la fuente por defecto Calibri 11
+def ancho_a_pt(ancho):
+    return int(ancho * 7 + 5) * PX_A_PT
+
+
+# Color ARGB de openpyxl como (r, g, b) entre 0 y 1; los colores de tema o indexados dan `defecto`
+def color_rgb(color, defecto=None):
+    if color is not None and getattr(color, "type", None) == "rgb" and isinstance(color.rgb, str) and len(color.rgb) == 8:
+        rgb = color.rgb[2:]
+        return tuple(int(rgb[i:i + 2], 16) / 255 for i in (0, 2, 4))
+    return defecto
+
+
+# Texto a mostrar para el valor de una celda (los números enteros leídos como float sin ".0")
+def formatear_valor(valor):
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+# Celda a la que apunta una fórmula de referencia simple, o None
+def referencia_formula(valor):
+    if isinstance(valor, str):
+        coincidencia = _REFERENCIA.match(valor.replace(" ", ""))
+        if coincidencia:
+            return f"{coincidencia.group(1)}{coincidencia.group(2)}"
+    return None
+
+
+# Geometría de una ventana de filas de una hoja (una página impresa): posición y tamaño
+# en puntos de cada fila, columna y celda, rangos combinados, imágenes y configuración
+# de página. Las coordenadas son de la hoja sin escalar, con y creciendo hacia abajo
+# desde el borde superior de la ventana; `pagina()` da el papel, márgenes y escala.
+class MaquetaHoja:
+    def __init__(self, ws, fila_inicio, fila_fin, filas_visibles=None, ultima_columna=None):
+        self.ws = ws
+        self.fila_inicio = fila_inicio
+        self.fila_fin = fila_fin
+
+        if filas_visibles is None:
+            filas_visibles = range(fila_inicio, fila_fin + 1)
+        self.filas = [fila for fila in sorted(filas_visibles) if fila_inicio <= fila <= fila_fin]
+        self.ultima_columna = ultima_columna or self._ultima_columna()
+        self.columnas = list(range(1, self.ultima_columna + 1))
+
+        # Bordes de columnas y filas: x[i] es el borde izquierdo de la columna i+1
+        anchos = self._anchos_columnas()
+        self.x = [0.0]
+        for col in self.columnas:
+            self.x.append(self.x[-1] + anchos.get(col, ancho_a_pt(self._ancho_defecto())))
+        self.y = {}
+        self._tops = []
+        alto = 0.0
+        for fila in self.filas:
+            self.y[fila] = alto
+            self._tops.append(alto)
+            alto += self.alto_fila(fila)
+        self.ancho_total = self.x[-1]
+        self.alto_total = alto
+
+        # Rangos combinados que empiezan dentro de la ventana
+        self.combinadas = {}
+        self.cubiertas = {}
+        for rango in ws.merged_cells.ranges:
+            if fila_inicio <= rango.min_row <= fila_fin:
+                self.combinadas[(rango.min_row, rango.min_col)] = rango
+                for fila in range(rango.min_row, min(rango.max_row, fila_fin) + 1):
+                    for col in range(rango.min_col, rango.max_col + 1):
+                        self.cubiertas[(fila, col)] = rango
+
+    def _ancho_defecto(self):
+        formato = self.ws.sheet_format
+        return formato.defaultColWidth or (formato.baseColWidth or 8) + 0.43
+
+    def _anchos_columnas(self):
+        anchos = {}
+        for dim in self.ws.column_dimensions.values():
+            if dim.min is None:
+                continue
+            ancho = 0.0 if dim.hidden else ancho_a_pt(dim.width or self._ancho_defecto())
+            for col in range(dim.min, (dim.max or dim.min) + 1):
+                anchos[col] = ancho
+        return anchos
+
+    def alto_fila(self, fila):
+        dim = self.ws.row_dimensions.get(fila)
+        if dim is not None and dim.height is not None:
+            return float(dim.height)
+        return float(self.ws.sheet_format.defaultRowHeight or ALTO_FILA_DEFECTO)
+
+    def _ultima_columna(self):
+        ultima = 1
+        for (fila, col), celda in self.ws._cells.items():
+            if self.fila_inicio <= fila <= self.fila_fin and (celda.value is not None or celda.has_style):
+                ultima = max(ultima, col)
+        for rango in self.ws.merged_cells.ranges:
+            if self.fila_inicio <= rango.min_row <= self.fila_fin:
+                ultima = max(ultima, rango.max_col)
+        return ultima
+
+    def visible(self, fila, col=1):
+        return fila in self.y and col <= self.ultima_columna
+
+    # Rectángulo (x, y, ancho, alto) de una celda; si es la inicial de un rango combinado
+    # abarca todo el rango (solo las filas visibles)
+    def rect(self, fila, col):
+        rango = self.combinadas.get((fila, col))
+        fila_fin, col_fin = (rango.max_row, rango.max_col) if rango else (fila, col)
+        col_fin = min(col_fin, self.ultima_columna)
+        x0, x1 = self.x[col - 1], self.x[col_fin]
+        filas = [f for f in range(fila, min(fila_fin, self.fila_fin) + 1) if f in self.y]
+        if not filas:
+            return x0, self._top_siguiente(fila), x1 - x0, 0.0
+        y0 = self.y[filas[0]]
+        y1 = self.y[filas[-1]] + self.alto_fila(filas[-1])
+        return x0, y0, x1 - x0, y1 - y0
+
+    def rect_coordenada(self, coordenada):
+        fila, col = coordinate_to_tuple(coordenada)
+        return self.rect(fila, col)
+
+    def _top_siguiente(self, fila):
+        i = bisect_right(self.filas, fila)
+        return self._tops[i] if i < len(self._tops) else self.alto_total
+
+    # Rectángulo de una sola celda (sin expandir combinadas), para dibujar sus bordes
+    def rect_simple(self, fila, col):
+        return self.x[col - 1], self.y[fila], self.x[col] - self.x[col - 1], self.alto_fila(fila)
+
+    # Celdas de la ventana en filas y columnas visibles (incluye las cubiertas por una
+    # combinada, que aportan sus bordes)
+    def celdas(self):
+        for (fila, col), celda in self.ws._cells.items():
+            if fila in self.y and col <= self.ultima_columna:
+                yield fila, col, celda
+
+    # Posición de un punto de anclaje (fila/columna base 0 y desplazamientos en EMU)
+    def punto_anclaje(self, fila0, col0, desp_fila=0, desp_col=0):
+        fila, col = fila0 + 1, col0 + 1
+        if col > self.ultima_columna:
+            x = self.x[-1]
+        else:
+            x = self.x[col - 1] + desp_col / EMU_POR_PT
+        y = (self.y[fila] if fila in self.y else self._top_siguiente(fila)) + desp_fila / EMU_POR_PT
+        return x, y
+
+    # Imágenes de la hoja ancladas dentro de la ventana: (imagen, x, y, ancho, alto)
+    def imagenes(self):
+        for img in self.ws._images:
+            ancla = img.anchor
+            if isinstance(ancla, str):
+                fila, col = coordinate_to_tuple(ancla)
+                fila0, col0, desp_fila, desp_col = fila - 1, col - 1, 0, 0
+            else:
+                desde = ancla._from
+                fila0, col0, desp_fila, desp_col = desde.row, desde.col, desde.rowOff, desde.colOff
+            if not self.fila_inicio <= fila0 + 1 <= self.fila_fin:
+                continue
+            x, y = self.punto_anclaje(fila0, col0, desp_fila, desp_col)
+            yield img, x, y, img.width * PX_A_PT, img.height * PX_A_PT
+
+    # Papel (ancho, alto), márgenes (izq, der, sup, inf) en puntos y escala de impresión
+    def pagina(self):
+        configuracion = self.ws.page_setup
+        ancho, alto = PAPELES.get(int(configuracion.paperSize or 1), PAPELES[1])
+        if configuracion.orientation == "landscape":
+            ancho, alto = alto, ancho
+        margenes = self.ws.page_margins
+        izq, der, sup, inf = (72 * (m or 0) for m in (margenes.left, margenes.right, margenes.top, margenes.bottom))
+
+        propiedades = self.ws.sheet_properties.pageSetUpPr
+        if propiedades is not None and propiedades.fitToPage:
+            escalas = [1.0]
+            if configuracion.fitToWidth != 0 and self.ancho_total:
+                escalas.append((ancho - izq - der) / self.ancho_total)
+            if configuracion.fitToHeight not in (0, None) and self.alto_total:
+                escalas.append((alto - sup - inf) / self.alto_total)
+            escala = min(escalas)
+        else:
+            escala = (configuracion.scale or 100) / 100
+        return (ancho, alto), (izq, der, sup, inf), escala
+
+
+# Filas que Excel muestra en una hoja con zeroHeight: solo las que tienen dimensión no oculta
+def filas_visibles_plantilla(ws, fila_inicio, fila_fin):
+    if not ws.sheet_format.zeroHeight:
+        return [fila for fila in range(fila_inicio, fila_fin + 1)
+                if fila not in ws.row_dimensions or not ws.row_dimensions[fila].hidden]
+    return sorted(fila for fila, dim in ws.row_dimensions.items()
+                  if fila_inicio <= fila <= fila_fin and not dim.hidden)
+
+
+# Filas que tienen algo que imprimir (un valor o un borde); Excel no
+# imprime las filas visibles que están vacías
+def filas_con_contenido(ws, filas):
+    con_contenido = set()
+    for (fila, _), celda in ws._cells.items():
+        if fila not in filas or fila in con_contenido:
+            continue
+        borde = celda.border
+        if celda.value is not None or (celda.has_style and any(
+                getattr(borde, lado).style for lado in ("left", "right", "top", "bottom"))):
+            con_contenido.add(fila)
+    return con_contenido
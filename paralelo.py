@@ -0,0 +1,76 @@
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+# Núcleos a usar por defecto: todos menos uno para no congelar la interfaz
+def trabajadores_por_defecto():
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+# Ejecuta un trabajo atrapando cualquier error para que no detenga la corrida
+def _ejecutar_seguro(funcion, argumentos):
+    try:
+        return funcion(*argumentos), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}\n{traceback.format_exc()}"
+
+
+# Ejecuta funcion(*trabajo) para cada trabajo en un grupo de procesos.
+# Devuelve una lista de (resultado, error) en el mismo orden que `trabajos`;
+# un trabajo que falla deja su error en la lista y los demás continúan.
+# `progreso(completados, total, indice)` se llama al terminar cada trabajo y
+# `al_terminar(indice, (resultado, error))` recibe cada resultado apenas llega,
+# en el orden en que terminan, para procesarlo sin esperar a toda la corrida.
+# Si `cancelado()` devuelve True no se empiezan más trabajos: se espera a los que ya
+# estaban corriendo, cuyos resultados se conservan (y pasan por al_terminar), y los
+# demás quedan con el error CANCELADO.
+CANCELADO = "Cancelado"
+
+
+def ejecutar_en_paralelo(funcion, trabajos, trabajadores=None, inicializador=None, initargs=(), progreso=None,
+                         al_terminar=None, cancelado=None):
+    trabajos = list(trabajos)
+    trabajadores = trabajadores or trabajadores_por_defecto()
+    resultados = [None] * len(trabajos)
+
+    if trabajadores <= 1 or len(trabajos) <= 1:
+        if inicializador:
+            inicializador(*initargs)
+        for i, argumentos in enumerate(trabajos):
+            if cancelado and cancelado():
+                resultados[i:] = [(None, CANCELADO)] * (len(trabajos) - i)
+                break
+            resultados[i] = _ejecutar_seguro(funcion, argumentos)
+            if al_terminar:
+                al_terminar(i, resultados[i])
+            if progreso:
+                progreso(i + 1, len(trabajos), i)
+        return resultados
+
+    with ProcessPoolExecutor(max_workers=min(trabajadores, len(trabajos)),
+                             initializer=inicializador, initargs=initargs) as executor:
+        futuros = {executor.submit(_ejecutar_seguro, funcion, argumentos): i
+                   for i, argumentos in enumerate(trabajos)}
+        completados = 0
+        detenido = False
+        for futuro in as_completed(futuros):
+            if futuro.cancelled():
+                continue
+            i = futuros[futuro]
+            try:
+                resultados[i] = futuro.result()
+            except Exception as e:
+                # El proceso trabajador murió (por ejemplo, falló el convertidor de PDF)
+                resultados[i] = (None, f"{type(e).__name__}: {e}")
+            completados += 1
+            if al_terminar:
+                al_terminar(i, resultados[i])
+            if progreso:
+                progreso(completados, len(trabajos), i)
+            if not detenido and cancelado and cancelado():
+                # Solo se cancelan los que no empezaron; el resto del ciclo espera a los demás
+                for pendiente in futuros:
+                    pendiente.cancel()
+                detenido = True
+    return [resultado or (None, CANCELADO) for resultado in resultados]
@@ -0,0 +1,410 @@
+import io
+import os
+import threading
+
+from openpyxl.cell.cell import Cell
+from openpyxl.utils import coordinate_to_tuple, column_index_from_string
+
+from generacion import TIPOS_PLANILLA
+from maqueta import (BORDES, MaquetaHoja, color_rgb, filas_con_contenido, filas_visibles_plantilla, formatear_valor,
+                     referencia_formula)
+from plantillas import RUTA_PLANTILLA, obtener_plantilla, leer_imagen
+
+RUTA_FUENTE_CODIGO = os.path.join("fonts", "DAPCA.ttf")
+
+# Fuentes de la plantilla -> archivos TTF candidatos (normal, negrita). Si no se
+# encuentra ninguno se usa Helvetica, que no necesita incrustarse.
+FUENTES = {
+    "PLANILLAS DAP": ([RUTA_FUENTE_CODIGO], [RUTA_FUENTE_CODIGO]),
+    "Calibri": (
+        [r"C:\Windows\Fonts\calibri.ttf", "/usr/share/fonts/truetype/crosextra/Carlito-Regular.ttf",
+         "/Library/Fonts/Calibri.ttf"],
+        [r"C:\Windows\Fonts\calibrib.ttf", "/usr/share/fonts/truetype/crosextra/Carlito-Bold.ttf",
+         "/Library/Fonts/Calibri Bold.ttf"],
+    ),
+    "Arial": (
+        [r"C:\Windows\Fonts\arial.ttf", "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"],
+        [r"C:\Windows\Fonts\arialbd.ttf", "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf"],
+    ),
+}
+
+# Columnas del listado de beneficiarios (las mismas que escribe plantillas.write_rows)
+COLUMNAS_LISTADO = ("B", "D")
+
+RELLENO = 2.0  # Separación del texto con el borde de la celda, en puntos sin escalar
+
+# Fondos ya calculados por proceso: (ruta, mtime, hoja, ventana, filas ocultas) -> Fondo
+_fondos = {}
+_hojas = {}
+_fuentes_registradas = {}
+_imagenes = {}
+_ventanas_adicionales = {}
+_lock = threading.Lock()
+
+
+def _reportlab():
+    try:
+        from reportlab.pdfgen import canvas
+        from reportlab.lib.utils import ImageReader
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+    except ImportError as e:
+        raise RuntimeError("El PDF directo necesita reportlab (pip install reportlab).") from e
+    return canvas, ImageReader, pdfmetrics, TTFont
+
+
+# Nombre de fuente de reportlab para una fuente de la plantilla; registra el TTF una vez
+def _fuente(nombre, negrita):
+    clave = (nombre, bool(negrita))
+    with _lock:
+        if clave in _fuentes_registradas:
+            return _fuentes_registradas[clave]
+        _, _, pdfmetrics, TTFont = _reportlab()
+        registrada = "Helvetica-Bold" if negrita else "Helvetica"
+        for ruta in FUENTES.get(nombre, ([], []))[1 if negrita else 0]:
+            if os.path.exists(ruta):
+                nombre_pdf = os.path.splitext(os.path.basename(ruta))[0]
+                if nombre_pdf not in pdfmetrics.getRegisteredFontNames():
+                    pdfmetrics.registerFont(TTFont(nombre_pdf, ruta))
+                registrada = nombre_pdf
+                break
+        _fuentes_registradas[clave] = registrada
+        return registrada
+
+
+# Imagen lista para reportlab, preparada una sola vez por proceso para cada contenido
+# distinto: el logo y sus copias en la plantilla comparten el mismo lector
+def _imagen(img):
+    with _lock:
+        if img.huella not in _imagenes:
+            _, ImageReader, _, _ = _reportlab()
+            _imagenes[img.huella] = ImageReader(io.BytesIO(img.datos))
+        return _imagenes[img.huella]
+
+
+# Estilo de texto de una celda de la plantilla
+def _estilo(celda):
+    fuente = celda.font
+    alineacion = celda.alignment
+    return {
+        "fuente": _fuente(fuente.name or "Calibri", fuente.b),
+        "tamano": float(fuente.sz or 11),
+        "color": color_rgb(fuente.color, (0, 0, 0)),
+        "horizontal": alineacion.horizontal or "general",
+        "vertical": alineacion.vertical or "bottom",
+        "ajustar": bool(alineacion.wrap_text),
+    }
+
+
+# Hoja de plantilla compartida (solo lectura) para calcular las maquetas
+def _hoja(hoja, plantilla):
+    ruta = os.path.abspath(plantilla)
+    clave = (ruta, os.path.getmtime(ruta), hoja)
+    with _lock:
+        ws = _hojas.get(clave)
+    if ws is None:
+        ws = obtener_plantilla(hoja, plantilla)[hoja]
+        with _lock:
+            _hojas[clave] = ws
+    return clave, ws
+
+
+# Lo que no cambia de una página: bordes, rellenos, textos fijos, logo e imágenes de la
+# plantilla, más la posición y estilo de las celdas que se llenan por planilla.
+# Se calcula una vez por proceso y se reproduce en cada documento como un solo
+# objeto de formulario PDF que todas sus páginas referencian.
+class Fondo:
+    def __init__(self, ws, maqueta, dinamicas, logo):
+        self.maqueta = maqueta
+        self.operaciones = []
+        self.campos = {}
+
+        for fila, col, celda in maqueta.celdas():
+            coordenada = celda.coordinate
+            self._bordes(fila, col, celda)
+            if (fila, col) in maqueta.cubiertas:
+                rango = maqueta.cubiertas[(fila, col)]
+                if (fila, col) != (rango.min_row, rango.min_col):
+                    continue
+            relleno = celda.fill
+            if relleno is not None and relleno.fill_type == "solid":
+                color = color_rgb(relleno.fgColor)
+                if color:
+                    self.operaciones.insert(0, ("rect", maqueta.rect(fila, col), color))
+            if coordenada in dinamicas or referencia_formula(celda.value):
+                self.campos[coordenada] = (maqueta.rect(fila, col), _estilo(celda), referencia_formula(celda.value))
+                continue
+            if celda.value is None or (isinstance(celda.value, str) and celda.value.startswith("=")):
+                continue
+            self.operaciones.append(("texto", maqueta.rect(fila, col), _estilo(celda), formatear_valor(celda.value), False))
+
+        # Celdas a llenar que no existen en la plantilla (p. ej. el listado)
+        for coordenada in dinamicas:
+            if coordenada not in self.campos:
+                fila, col = coordinate_to_tuple(coordenada)
+                if maqueta.visible(fila, col):
+                    celda = ws._cells.get((fila, col)) or Cell(ws, row=fila, column=col)
+                    self.campos[coordenada] = (maqueta.rect(fila, col), _estilo(celda), None)
+
+        for img, x, y, ancho, alto in maqueta.imagenes():
+            self.operaciones.append(("imagen", (x, y, ancho, alto), img))
+        if logo:
+            self.operaciones.append(("imagen", logo[1], logo[0]))
+
+    def _bordes(self, fila, col, celda):
+        borde = celda.border
+        if borde is None:
+            return
+        x, y, ancho, alto = self.maqueta.rect_simple(fila, col)
+        rango = self.maqueta.cubiertas.get((fila, col))
+        lados = (
+            ("top", borde.top, (x, y, x + ancho, y), rango is None or fila == rango.min_row),
+            ("bottom", borde.bottom, (x, y + alto, x + ancho, y + alto), rango is None or fila == rango.max_row),
+            ("left", borde.left, (x, y, x, y + alto), rango is None or col == rango.min_col),
+            ("right", borde.right, (x + ancho, y, x + ancho, y + alto), rango is None or col == rango.max_col),
+        )
+        for _, lado, linea, en_contorno in lados:
+            if lado is None or not lado.style or not en_contorno:
+                continue
+            grosor, guiones = BORDES.get(lado.style, (0.5, None))
+            self.operaciones.append(("linea", linea, grosor, guiones, color_rgb(lado.color, (0, 0, 0))))
+
+    # Dibuja el fondo en el lienzo (coordenadas de hoja ya transformadas)
+    def dibujar(self, lienzo):
+        for operacion in self.operaciones:
+            tipo = operacion[0]
+            if tipo == "rect":
+                _, (x, y, ancho, alto), color = operacion
+                lienzo.setFillColorRGB(*color)
+                lienzo.rect(x, -y - alto, ancho, alto, stroke=0, fill=1)
+            elif tipo == "linea":
+                _, (x0, y0, x1, y1), grosor, guiones, color = operacion
+                lienzo.setLineWidth(grosor)
+                lienzo.setStrokeColorRGB(*color)
+                lienzo.setDash(list(guiones or []))
+                lienzo.line(x0, -y0, x1, -y1)
+            elif tipo == "texto":
+                _, rect, estilo, texto, ajustar_tamano = operacion
+                _texto(lienzo, rect, estilo, texto, ajustar_tamano)
+            elif tipo == "imagen":
+                _, (x, y, ancho, alto), img = operacion
+                lienzo.drawImage(_imagen(img), x, -y - alto, ancho, alto, mask="auto")
+
+
+# Parte un texto en líneas que caben en el ancho dado
+def _partir(texto, fuente, tamano, ancho, pdfmetrics):
+    lineas = []
+    for parrafo in str(texto).split("\n"):
+        actual = ""
+        for palabra in parrafo.split(" "):
+            prueba = f"{actual} {palabra}" if actual else palabra
+            if actual and pdfmetrics.stringWidth(prueba, fuente, tamano) > ancho:
+                lineas.append(actual)
+                actual = palabra
+            else:
+                actual = prueba
+        lineas.append(actual)
+    return lineas
+
+
+# Escribe un texto dentro del rectángulo de su celda con la alineación de Excel.
+# Con ajustar_tamano el texto que no cabe se reduce en lugar de desbordar la celda.
+def _texto(lienzo, rect, estilo, texto, ajustar_tamano):
+    if texto == "":
+        return
+    _, _, pdfmetrics, _ = _reportlab()
+    x, y, ancho, alto = rect
+    fuente, tamano = estilo["fuente"], estilo["tamano"]
+    disponible = max(ancho - 2 * RELLENO, 1)
+
+    if estilo["ajustar"]:
+        lineas = _partir(texto, fuente, tamano, disponible, pdfmetrics)
+    else:
+        lineas = str(texto).split("\n")
+        if ajustar_tamano:
+            mas_ancha = max(pdfmetrics.stringWidth(linea, fuente, tamano) for linea in lineas)
+            if mas_ancha > disponible:
+                tamano = max(tamano * disponible / mas_ancha, 4)
+
+    interlineado = tamano * 1.2
+    alto_texto = interlineado * len(lineas)
+    if estilo["vertical"] == "top":
+        inicio = y + RELLENO
+    elif estilo["vertical"] in ("center", "justify", "distributed"):
+        inicio = y + (alto - alto_texto) / 2
+    else:
+        inicio = y + alto - alto_texto - RELLENO
+    ascendente = pdfmetrics.getAscentDescent(fuente, tamano)[0]
+
+    horizontal = estilo["horizontal"]
+    if horizontal == "general":
+        horizontal = "right" if isinstance(texto, (int, float)) else "left"
+    lienzo.setFillColorRGB(*estilo["color"])
+    lienzo.setFont(fuente, tamano)
+    for i, linea in enumerate(lineas):
+        base = -(inicio + i * interlineado + ascendente + (interlineado - tamano) / 2)
+        if horizontal in ("center", "centerContinuous", "distributed", "justify"):
+            lienzo.drawCentredString(x + ancho / 2, base, linea)
+        elif horizontal == "right":
+            lienzo.drawRightString(x + ancho - RELLENO, base, linea)
+        else:
+            lienzo.drawString(x + RELLENO, base, linea)
+
+
+# Ventanas (fila inicial, fila final, filas visibles) de cada página impresa de un tipo
+def _ventanas(clave_hoja, ws, config, num_paginas):
+    alto = config["alto_pagina"]
+    if config["beneficiarios"]:
+        return [(1 + i * alto, (i + 1) * alto, None) for i in range(num_paginas)]
+    clave = (clave_hoja, alto)
+    with _lock:
+        ventanas = _ventanas_adicionales.get(clave)
+    if ventanas is not None:
+        return ventanas
+    # Las planillas adicionales imprimen las páginas de la plantilla con algo visible;
+    # como en Excel, las filas visibles pero vacías no generan páginas en blanco
+    ventanas = []
+    for inicio in range(1, ws.max_row + 1, alto):
+        visibles = filas_visibles_plantilla(ws, inicio, inicio + alto - 1)
+        if visibles and filas_con_contenido(ws, set(visibles)):
+            ventanas.append((inicio, inicio + alto - 1, tuple(visibles)))
+    with _lock:
+        _ventanas_adicionales[clave] = ventanas
+    return ventanas
+
+
+def _fondo(tipo, ventana, ocultas, logo_path, plantilla):
+    config = TIPOS_PLANILLA[tipo]
+    clave_hoja, ws = _hoja(config["hoja"], plantilla)
+    inicio, fin, visibles = ventana
+    clave = (clave_hoja, tipo, inicio, ocultas, logo_path)
+    with _lock:
+        fondo = _fondos.get(clave)
+    if fondo is not None:
+        return fondo
+
+    if visibles is None:
+        visibles = range(inicio, fin + 1)
+    visibles = [fila for fila in visibles if fila not in ocultas]
+    maqueta = MaquetaHoja(ws, inicio, fin, visibles)
+
+    dinamicas = set()
+    if inicio == 1:
+        dinamicas.update(config["encabezados"])
+        dinamicas.update(config["fijos"])
+    if config["beneficiarios"]:
+        primera = inicio + config["fila_beneficiarios"]
+        for fila in range(primera, primera + config["filas_por_pagina"]):
+            dinamicas.update(f"{col}{fila}" for col in COLUMNAS_LISTADO)
+
+    logo = None
+    if inicio == 1 or not any(True for _ in maqueta.imagenes()):
+        espec = config["logo"]
+        fila_logo = inicio + espec["fila"] - 1
+        x, y = maqueta.punto_anclaje(fila_logo - 1, column_index_from_string(espec["col"]) - 1)
+        logo = (leer_imagen(logo_path), (x, y, espec["ancho"] * 0.75, espec["alto"] * 0.75))
+    fondo = Fondo(ws, maqueta, dinamicas, logo)
+    with _lock:
+        _fondos[clave] = fondo
+    return fondo
+
+
+# Calcula por adelantado el fondo de la primera página de cada tipo (las demás
+# páginas de un listado completo usan la misma ventana de la plantilla desplazada)
+def precalentar_fondos(tipos=None, logo_path="logo_maga.png", plantilla=RUTA_PLANTILLA):
+    for tipo in tipos or TIPOS_PLANILLA:
+        clave_hoja, ws = _hoja(TIPOS_PLANILLA[tipo]["hoja"], plantilla)
+        for ventana in _ventanas(clave_hoja, ws, TIPOS_PLANILLA[tipo], 1)[:1]:
+            _fondo(tipo, ventana, (), logo_path, plantilla)
+
+
+# Valores a escribir en cada celda de la primera página (encabezados y textos fijos)
+def _valores_encabezado(config, datos):
+    valores = {celda: datos[campo] for celda, campo in config["encabezados"].items()}
+    valores.update(config["fijos"])
+    return valores
+
+
+# Genera el PDF de una planilla sin pasar por el xlsx ni por Excel/LibreOffice.
+# Cada página es el fondo vectorial de su ventana de la plantilla (calculado una vez
+# por proceso e incluido una sola vez por documento) más los datos de la comunidad.
+# Devuelve los bytes del PDF, o escribe en `destino` (ruta o archivo) si se indica.
+def renderizar_planilla(tipo, datos, beneficiarios=None, destino=None, logo_path="logo_maga.png",
+                        plantilla=RUTA_PLANTILLA):
+    canvas, _, _, _ = _reportlab()
+    config = TIPOS_PLANILLA[tipo]
+    clave_hoja, ws = _hoja(config["hoja"], plantilla)
+
+    if config["beneficiarios"]:
+        if not beneficiarios:
+            raise ValueError(f"La planilla '{config['etiqueta']}' necesita al menos un beneficiario.")
+        por_pagina = config["filas_por_pagina"]
+        bloques = [beneficiarios[i:i+por_pagina] for i in range(0, len(beneficiarios), por_pagina)]
+    else:
+        bloques = None
+    ventanas = _ventanas(clave_hoja, ws, config, len(bloques) if bloques else 0)
+    valores = _valores_encabezado(config, datos)
+    # Valores estáticos de la primera página a los que apuntan las fórmulas de las demás
+    estaticos = {}
+
+    salida = io.BytesIO() if destino is None else destino
+    lienzo = canvas.Canvas(salida, pageCompression=1, invariant=1)  # sin fecha ni ID variables
+    lienzo.setTitle(os.path.splitext(config["archivo"].format(idx=datos["idx"], dep=datos["dep"], mun=datos["mun"]))[0])
+    formularios = {}
+    for pagina, ventana in enumerate(ventanas):
+        inicio = ventana[0]
+        bloque = bloques[pagina] if bloques else None
+        ocultas = ()
+        if bloque is not None and len(bloque) < config["filas_por_pagina"]:
+            primera = inicio + config["fila_beneficiarios"]
+            ocultas = tuple(range(primera + len(bloque), primera + config["filas_por_pagina"]))
+        fondo = _fondo(tipo, ventana, ocultas, logo_path, plantilla)
+
+        (ancho_papel, alto_papel), (izq, der, sup, inf), escala = fondo.maqueta.pagina()
+        # Una ventana siempre cabe en una hoja de papel
+        if fondo.maqueta.ancho_total and fondo.maqueta.alto_total:
+            escala = min(escala, (ancho_papel - izq - der) / fondo.maqueta.ancho_total,
+                         (alto_papel - sup - inf) / fondo.maqueta.alto_total)
+        lienzo.setPageSize((ancho_papel, alto_papel))
+        lienzo.saveState()
+        lienzo.translate(izq, alto_papel - sup)
+        lienzo.scale(escala, escala)
+
+        nombre_formulario = formularios.get(id(fondo))
+        if nombre_formulario is None:
+            nombre_formulario = f"fondo{len(formularios)}"
+            # El formulario usa las coordenadas de la hoja (y negativa hacia abajo)
+            lienzo.beginForm(nombre_formulario, lowerx=0, lowery=-fondo.maqueta.alto_total,
+                             upperx=fondo.maqueta.ancho_total, uppery=0)
+            fondo.dibujar(lienzo)
+            lienzo.endForm()
+            formularios[id(fondo)] = nombre_formulario
+        lienzo.doForm(nombre_formulario)
+
+        if pagina == 0:
+            estaticos = {celda.coordinate: celda.value for _, _, celda in fondo.maqueta.celdas()
+                         if celda.value is not None and not str(celda.value).startswith("=")}
+
+        for coordenada, (rect, estilo, referencia) in fondo.campos.items():
+            if referencia:
+                texto = valores.get(referencia, estaticos.get(referencia))
+            else:
+                texto = valores.get(coordenada)
+            if texto is not None:
+                _texto(lienzo, rect, estilo, formatear_valor(texto), True)
+
+        if bloque is not None:
+            primera = inicio + config["fila_beneficiarios"]
+            for i, beneficiario in enumerate(bloque):
+                for col, valor in zip(COLUMNAS_LISTADO, (beneficiario['NOMBRE COMPLETO'], str(beneficiario['CUI']))):
+                    campo = fondo.campos.get(f"{col}{primera + i}")
+                    if campo:
+                        _texto(lienzo, campo[0], campo[1], valor, True)
+
+        lienzo.restoreState()
+        lienzo.showPage()
+    lienzo.save()
+
+    if destino is None:
+        return salida.getvalue()
+    return destino
@@ -0,0 +1,186 @@
+import io
+
+# Une PDFs en un solo archivo escribiendo cada página en cuanto se agrega: de cada PDF
+# de origen se copian sus páginas y los objetos que usan (fuentes, imágenes, formularios)
+# con números nuevos, y en memoria solo quedan la posición de cada objeto, la lista
+# de páginas y los marcadores. El tamaño del resultado no cambia el uso de memoria.
+#
+#   with PDFUnido("Zacapa.pdf") as union:
+#       union.marcador("1 - Aldea Uno")
+#       union.agregar("1 - Zacapa, Gualán, PLANILLA.pdf", "Planilla de entrega")
+#
+# Cada marcador abierto con marcador() agrupa los que agregar() crea después.
+
+
+def _pypdf():
+    try:
+        from pypdf import PdfReader, generic
+    except ImportError as e:
+        raise RuntimeError("Unir PDFs necesita pypdf (pip install pypdf).") from e
+    return PdfReader, generic
+
+
+class PDFUnido:
+    def __init__(self, destino):
+        self.destino = destino
+        self._propio = not hasattr(destino, "write")
+        self._archivo = open(destino, "wb") if self._propio else destino
+        self._posiciones = [None]  # número de objeto -> posición en el archivo
+        self._catalogo = self._reservar()
+        self._raiz_paginas = self._reservar()
+        self._paginas = []
+        self._marcadores = []  # [titulo, página, [(titulo, página), ...]]
+        self._archivo.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, *exc):
+        if tipo is None:
+            self.cerrar()
+        elif self._propio:
+            self._archivo.close()
+
+    def __len__(self):
+        return len(self._paginas)
+
+    def _reservar(self):
+        self._posiciones.append(None)
+        return len(self._posiciones) - 1
+
+    def _escribir(self, numero, objeto):
+        self._posiciones[numero] = self._archivo.tell()
+        salida = io.BytesIO()
+        salida.write(f"{numero} 0 obj\n".encode())
+        objeto.write_to_stream(salida)
+        salida.write(b"\nendobj\n")
+        self._archivo.write(salida.getvalue())
+
+    # Abre un marcador de primer nivel; apunta a la próxima página que se agregue
+    def marcador(self, titulo):
+        self._marcadores.append([titulo, len(self._paginas), []])
+
+    # Agrega todas las páginas de un PDF; con `titulo` crea un marcador hacia su primera
+    # página (dentro del último marcador abierto, si hay uno). Devuelve las páginas agregadas.
+    def agregar(self, origen, titulo=None):
+        PdfReader, generic = _pypdf()
+        lector = PdfReader(origen)
+        primera = len(self._paginas)
+        numeros = {}  # número de objeto en el origen -> número en el resultado
+        pendientes = []
+
+        def referencia(indirecto):
+            numero = numeros.get(indirecto.idnum)
+            if numero is None:
+                numero = self._reservar()
+                numeros[indirecto.idnum] = numero
+                pendientes.append(indirecto)
+            return generic.IndirectObject(numero, 0, None)
+
+        def copiar(objeto):
+            if isinstance(objeto, generic.IndirectObject):
+                return referencia(objeto)
+            if isinstance(objeto, generic.StreamObject):
+                copia = objeto.__class__()
+                copia._data = objeto._data
+                for clave, valor in objeto.items():
+                    copia[generic.NameObject(clave)] = copiar(valor)
+                return copia
+            if isinstance(objeto, generic.DictionaryObject):
+                return generic.DictionaryObject({generic.NameObject(clave): copiar(valor)
+                                                 for clave, valor in objeto.items()})
+            if isinstance(objeto, generic.ArrayObject):
+                return generic.ArrayObject(copiar(valor) for valor in objeto)
+            return objeto
+
+        for pagina in lector.pages:
+            # pypdf ya copió a la página lo que heredaba de su árbol (recursos, tamaño)
+            referencia_pagina = pagina.indirect_reference
+            if referencia_pagina is not None and referencia_pagina.idnum in numeros:
+                numero = numeros[referencia_pagina.idnum]
+            else:
+                numero = self._reservar()
+                if referencia_pagina is not None:
+                    numeros[referencia_pagina.idnum] = numero
+            copia = copiar(generic.DictionaryObject(
+                {clave: valor for clave, valor in pagina.items() if clave != "/Parent"}))
+            copia[generic.NameObject("/Parent")] = generic.IndirectObject(self._raiz_paginas, 0, None)
+            self._escribir(numero, copia)
+            self._paginas.append(numero)
+            # Los objetos que usa la página se escriben enseguida; no se acumulan
+            while pendientes:
+                indirecto = pendientes.pop()
+                self._escribir(numeros[indirecto.idnum], copiar(indirecto.get_object()))
+
+        if titulo is not None and len(self._paginas) > primera:
+            if self._marcadores:
+                self._marcadores[-1][2].append((titulo, primera))
+            else:
+                self._marcadores.append([titulo, primera, []])
+        return len(self._paginas) - primera
+
+    # Escribe los marcadores como árbol de /Outlines; devuelve la referencia a su raíz
+    def _escribir_marcadores(self, generic):
+        raiz = self._reservar()
+        marcadores = [m for m in self._marcadores if m[1] < len(self._paginas)]
+
+        def destino(pagina):
+            return generic.ArrayObject([generic.IndirectObject(self._paginas[pagina], 0, None),
+                                        generic.NameObject("/Fit")])
+
+        def nivel(items, padre):
+            numeros = [self._reservar() for _ in items]
+            for i, (numero, (titulo, pagina, hijos)) in enumerate(zip(numeros, items)):
+                nodo = generic.DictionaryObject({
+                    generic.NameObject("/Title"): generic.create_string_object(titulo),
+                    generic.NameObject("/Parent"): generic.IndirectObject(padre, 0, None),
+                    generic.NameObject("/Dest"): destino(pagina),
+                })
+                if i > 0:
+                    nodo[generic.NameObject("/Prev")] = generic.IndirectObject(numeros[i - 1], 0, None)
+                if i < len(items) - 1:
+                    nodo[generic.NameObject("/Next")] = generic.IndirectObject(numeros[i + 1], 0, None)
+                if hijos:
+                    primero, ultimo = nivel([(t, p, []) for t, p in hijos], numero)
+                    nodo[generic.NameObject("/First")] = primero
+                    nodo[generic.NameObject("/Last")] = ultimo
+                    nodo[generic.NameObject("/Count")] = generic.NumberObject(len(hijos))
+                self._escribir(numero, nodo)
+            return (generic.IndirectObject(numeros[0], 0, None), generic.IndirectObject(numeros[-1], 0, None))
+
+        nodo_raiz = generic.DictionaryObject({generic.NameObject("/Type"): generic.NameObject("/Outlines")})
+        if marcadores:
+            primero, ultimo = nivel(marcadores, raiz)
+            nodo_raiz[generic.NameObject("/First")] = primero
+            nodo_raiz[generic.NameObject("/Last")] = ultimo
+            nodo_raiz[generic.NameObject("/Count")] = generic.NumberObject(len(marcadores))
+        self._escribir(raiz, nodo_raiz)
+        return generic.IndirectObject(raiz, 0, None)
+
+    # Escribe el árbol de páginas, los marcadores, el catálogo y la tabla de referencias
+    def cerrar(self):
+        _, generic = _pypdf()
+        self._escribir(self._raiz_paginas, generic.DictionaryObject({
+            generic.NameObject("/Type"): generic.NameObject("/Pages"),
+            generic.NameObject("/Kids"): generic.ArrayObject(
+                generic.IndirectObject(numero, 0, None) for numero in self._paginas),
+            generic.NameObject("/Count"): generic.NumberObject(len(self._paginas)),
+        }))
+        catalogo = generic.DictionaryObject({
+            generic.NameObject("/Type"): generic.NameObject("/Catalog"),
+            generic.NameObject("/Pages"): generic.IndirectObject(self._raiz_paginas, 0, None),
+        })
+        if self._marcadores:
+            catalogo[generic.NameObject("/Outlines")] = self._escribir_marcadores(generic)
+            catalogo[generic.NameObject("/PageMode")] = generic.NameObject("/UseOutlines")
+        self._escribir(self._catalogo, catalogo)
+
+        inicio_xref = self._archivo.tell()
+        lineas = [f"xref\n0 {len(self._posiciones)}\n", "0000000000 65535 f \n"]
+        lineas.extend(f"{posicion:010d} 00000 n \n" for posicion in self._posiciones[1:])
+        lineas.append(f"trailer\n<< /Size {len(self._posiciones)} /Root {self._catalogo} 0 R >>\n"
+                      f"startxref\n{inicio_xref}\n%%EOF\n")
+        self._archivo.write("".join(lineas).encode())
+        if self._propio:
+            self._archivo.close()
+        return self.destino
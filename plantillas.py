@@ -0,0 +1,356 @@
+import hashlib
+import os
+import pickle
+import threading
+import weakref
+from bisect import bisect_left
+from copy import copy
+from zipfile import ZIP_DEFLATED
+
+import openpyxl
+from openpyxl.drawing.image import Image as XLImage
+from openpyxl.utils import column_index_from_string, coordinate_to_tuple
+from openpyxl.worksheet.cell_range import MultiCellRange
+from openpyxl.worksheet.copier import WorksheetCopy
+from openpyxl.writer.excel import ExcelWriter
+
+import tiempos
+from salida import ZipReproducible
+
+RUTA_PLANTILLA = "FormatoPlanillas.xlsx"
+
+# Hojas de FormatoPlanillas.xlsx que usan los botones de generación
+HOJAS_PLANTILLA = (
+    "PLANILLAS", "ADICIONALPLA",
+    "PLANILLASASIST", "ASISTENCIAAD",
+    "LISTADOCAPA", "LISTADOCAPAAD",
+    "PLANILLASDAU", "PLANILLASDAUAD",
+    "ASISTENCIADAU", "ASISTENCIADAUAD",
+)
+
+# Cache de proceso: ruta absoluta -> (mtime, {hoja: (libro de una sola hoja serializado,
+# índice de combinadas, filas registradas)})
+_cache_plantillas = {}
+_lock_plantillas = threading.Lock()
+
+# Índice de celdas combinadas de cada hoja en uso (las copias comparten el de su plantilla)
+_indices_combinadas = weakref.WeakKeyDictionary()
+# Filas con celdas o dimensiones en la plantilla de cada hoja en uso
+_filas_registradas = weakref.WeakKeyDictionary()
+# Última fila visible de cada hoja (la ventana de su página); lo de abajo se recorta al guardar
+_ventanas = weakref.WeakKeyDictionary()
+# Imágenes ya leídas de disco en este proceso: (ruta absoluta, mtime) -> ImagenCompartida
+_imagenes = {}
+_lock_imagenes = threading.Lock()
+
+
+# Imagen cuyo contenido se lee una sola vez y se comparte entre todas las hojas. Su
+# parte en el xlsx se nombra por el contenido, así que todas las copias del mismo
+# logo en un libro se guardan como un único archivo de xl/media.
+class ImagenCompartida(XLImage):
+    def __init__(self, datos, formato, ancho, alto, huella=None):
+        self.ref = None
+        self.datos = datos
+        self.format = formato
+        self.width = ancho
+        self.height = alto
+        self.huella = huella or hashlib.sha1(datos).hexdigest()[:16]
+
+    def _data(self):
+        return self.datos
+
+    @property
+    def path(self):
+        return f"/xl/media/imagen_{self.huella}.{self.format}"
+
+    # Otra referencia a los mismos datos, con su propio tamaño y ancla
+    def copia(self, ancho=None, alto=None, anchor=None):
+        img = ImagenCompartida(self.datos, self.format, ancho or self.width, alto or self.height, self.huella)
+        img.anchor = anchor or self.anchor
+        return img
+
+
+# Imagen de disco leída una vez por proceso (se vuelve a leer si el archivo cambia)
+def leer_imagen(ruta):
+    ruta_abs = os.path.abspath(ruta)
+    clave = (ruta_abs, os.path.getmtime(ruta_abs))
+    with _lock_imagenes:
+        img = _imagenes.get(clave)
+        if img is None:
+            img = _a_compartida(XLImage(ruta_abs), {})
+            _imagenes[clave] = img
+        return img
+
+
+def _a_compartida(img, por_contenido):
+    datos = img._data()
+    huella = hashlib.sha1(datos).hexdigest()[:16]
+    base = por_contenido.setdefault(huella, ImagenCompartida(datos, img.format or "png", img.width, img.height, huella))
+    return base.copia(img.width, img.height, img.anchor)
+
+
+# Cambia las imágenes de las hojas por ImagenCompartida; las que tienen el mismo
+# contenido (el logo repetido en cada página de la plantilla) comparten sus datos
+def compartir_imagenes(wb):
+    por_contenido = {}
+    for ws in wb.worksheets:
+        ws._images = [img if isinstance(img, ImagenCompartida) else _a_compartida(img, por_contenido)
+                      for img in ws._images]
+
+
+# Serializa un libro que contiene solo la hoja indicada, sin volver a leer el archivo
+def _serializar_hoja(wb, nombre_hoja):
+    hojas_originales = wb._sheets
+    activa_original = wb.active
+    try:
+        wb._sheets = [wb[nombre_hoja]]
+        wb.active = 0
+        return pickle.dumps(wb, protocol=pickle.HIGHEST_PROTOCOL)
+    finally:
+        wb._sheets = hojas_originales
+        wb.active = activa_original
+
+
+# Celdas cubiertas por un rango combinado que no son su celda inicial, como (fila, columna).
+# Escribir en ellas no tiene efecto, así que set_cell_value_safe las salta.
+def _construir_indice_combinadas(ws):
+    return frozenset(
+        (fila, col)
+        for rango in ws.merged_cells.ranges
+        for fila, col in rango.cells
+        if (fila, col) != (rango.min_row, rango.min_col)
+    )
+
+
+# Filas que la hoja escribe como <row> en el xlsx (las que tienen celdas o dimensiones).
+# Las hojas de la plantilla tienen zeroHeight activo: cualquier otra fila ya queda oculta
+# sin escribir nada, así que solo estas necesitan marcarse como ocultas.
+def _construir_filas_registradas(ws):
+    return tuple(sorted({fila for fila, _ in ws._cells} | set(ws.row_dimensions)))
+
+
+# Lee la plantilla completa una sola vez y guarda un modelo limpio por hoja
+def _cargar_modelos(ruta):
+    wb = openpyxl.load_workbook(ruta)
+    compartir_imagenes(wb)
+    return {
+        nombre: (_serializar_hoja(wb, nombre),
+                 _construir_indice_combinadas(wb[nombre]),
+                 _construir_filas_registradas(wb[nombre]))
+        for nombre in HOJAS_PLANTILLA
+        if nombre in wb.sheetnames
+    }
+
+
+# Devuelve los modelos de la plantilla, recargándolos si el archivo cambió en disco
+def _modelos_plantilla(ruta):
+    ruta_abs = os.path.abspath(ruta)
+    mtime = os.path.getmtime(ruta_abs)
+    with _lock_plantillas:
+        entrada = _cache_plantillas.get(ruta_abs)
+        if entrada is None or entrada[0] != mtime:
+            entrada = (mtime, _cargar_modelos(ruta_abs))
+            _cache_plantillas[ruta_abs] = entrada
+        return entrada[1]
+
+
+# Modelos serializados de las hojas pedidas, para enviarlos a procesos trabajadores
+def exportar_modelos(hojas, ruta=RUTA_PLANTILLA):
+    ruta_abs = os.path.abspath(ruta)
+    modelos = _modelos_plantilla(ruta_abs)
+    with _lock_plantillas:
+        mtime = _cache_plantillas[ruta_abs][0]
+    return ruta_abs, mtime, {hoja: modelos[hoja] for hoja in hojas if hoja in modelos}
+
+
+# Registra en este proceso los modelos recibidos de exportar_modelos (sin releer el archivo)
+def importar_modelos(ruta_abs, mtime, modelos):
+    with _lock_plantillas:
+        _cache_plantillas[ruta_abs] = (mtime, modelos)
+
+
+# Nombres de las hojas de plantilla disponibles en el archivo
+def hojas_plantilla(ruta=RUTA_PLANTILLA):
+    return list(_modelos_plantilla(ruta))
+
+
+# Copia independiente de un libro que contiene solo la hoja de plantilla pedida
+def obtener_plantilla(nombre_hoja, ruta=RUTA_PLANTILLA):
+    modelos = _modelos_plantilla(ruta)
+    if nombre_hoja not in modelos:
+        raise KeyError(f"La hoja '{nombre_hoja}' no se encuentra en el archivo Excel.")
+    libro, indice, filas = modelos[nombre_hoja]
+    wb = pickle.loads(libro)
+    # pickle no conserva la fábrica de las dimensiones de filas/columnas de openpyxl
+    for ws in wb.worksheets:
+        ws.row_dimensions.default_factory = ws._add_row
+        ws.column_dimensions.default_factory = ws._add_column
+    _indices_combinadas[wb[nombre_hoja]] = indice
+    _filas_registradas[wb[nombre_hoja]] = filas
+    return wb
+
+
+# Copia de hoja que solo trae celdas, filas y rangos combinados hasta una fila (la
+# ventana de su página); copiar los ~5000 rangos combinados completos es lo más lento
+class _CopiaHastaFila(WorksheetCopy):
+    def __init__(self, source_worksheet, target_worksheet, hasta_fila):
+        super().__init__(source_worksheet, target_worksheet)
+        self.hasta_fila = hasta_fila
+
+    def copy_worksheet(self):
+        self._copy_cells()
+        self._copy_dimensions()
+
+        self.target.sheet_format = copy(self.source.sheet_format)
+        self.target.sheet_properties = copy(self.source.sheet_properties)
+        self.target.merged_cells = MultiCellRange(
+            {copy(rango) for rango in self.source.merged_cells.ranges if rango.min_row <= self.hasta_fila})
+        self.target.page_margins = copy(self.source.page_margins)
+        self.target.page_setup = copy(self.source.page_setup)
+        self.target.print_options = copy(self.source.print_options)
+
+    def _copy_cells(self):
+        for (row, col), source_cell in self.source._cells.items():
+            if row > self.hasta_fila:
+                continue
+            target_cell = self.target.cell(column=col, row=row)
+            target_cell._value = source_cell._value
+            target_cell.data_type = source_cell.data_type
+            if source_cell.has_style:
+                target_cell._style = copy(source_cell._style)
+            if source_cell.hyperlink:
+                target_cell._hyperlink = copy(source_cell.hyperlink)
+            if source_cell.comment:
+                target_cell.comment = copy(source_cell.comment)
+
+    def _copy_dimensions(self):
+        for key, dim in self.source.row_dimensions.items():
+            if key <= self.hasta_fila:
+                self.target.row_dimensions[key] = copy(dim)
+                self.target.row_dimensions[key].worksheet = self.target
+        for key, dim in self.source.column_dimensions.items():
+            self.target.column_dimensions[key] = copy(dim)
+            self.target.column_dimensions[key].worksheet = self.target
+
+
+# Copia una hoja dentro de su libro; la copia reutiliza los índices del original.
+# Con hasta_fila no se copian las celdas que quedarían debajo de la ventana visible.
+def copiar_hoja(wb, ws, hasta_fila=None):
+    if hasta_fila is None:
+        copia = wb.copy_worksheet(ws)
+    else:
+        copia = wb.create_sheet(title=f"{ws.title} Copy")
+        _CopiaHastaFila(ws, copia, hasta_fila).copy_worksheet()
+        _ventanas[copia] = hasta_fila
+    _indices_combinadas[copia] = indice_combinadas(ws)
+    _filas_registradas[copia] = filas_registradas(ws)
+    return copia
+
+
+# Índice de combinadas de la hoja; si la hoja no viene de obtener_plantilla se construye una vez
+def indice_combinadas(ws):
+    indice = _indices_combinadas.get(ws)
+    if indice is None:
+        indice = _construir_indice_combinadas(ws)
+        _indices_combinadas[ws] = indice
+    return indice
+
+
+# Descarta los modelos cargados (por ejemplo, para forzar la relectura de la plantilla)
+def limpiar_cache_plantillas():
+    with _lock_plantillas:
+        _cache_plantillas.clear()
+
+
+def filas_registradas(ws):
+    filas = _filas_registradas.get(ws)
+    if filas is None:
+        filas = _construir_filas_registradas(ws)
+        _filas_registradas[ws] = filas
+    return filas
+
+
+# Deja visible solo la ventana de filas de una página. Oculta únicamente las filas
+# anteriores que se escriben en el xlsx (en lugar de recorrer miles de filas una por
+# una) y anota la ventana para que recortar_hojas elimine todo lo que queda debajo.
+def mostrar_pagina(ws, fila_inicio, fila_fin):
+    filas = filas_registradas(ws)
+    anteriores = set(filas[:bisect_left(filas, fila_inicio)])
+    # Dimensiones creadas después de copiar la hoja (p. ej. la ventana de otra página)
+    anteriores.update(fila for fila in ws.row_dimensions if fila < fila_inicio)
+    dimensiones = ws.row_dimensions
+    for fila in anteriores:
+        dimensiones[fila].hidden = True
+    for fila in range(fila_inicio, fila_fin + 1):
+        dimensiones[fila].hidden = False
+    _ventanas[ws] = fila_fin
+
+
+# Elimina las celdas, dimensiones y rangos combinados debajo de la ventana visible de
+# cada hoja. Se llama una vez terminadas todas las copias, justo antes de guardar.
+def recortar_hojas(wb):
+    for ws in wb.worksheets:
+        fila_fin = _ventanas.get(ws)
+        if fila_fin is None:
+            continue
+        for clave in [clave for clave in ws._cells if clave[0] > fila_fin]:
+            del ws._cells[clave]
+        for fila in [fila for fila in ws.row_dimensions if fila > fila_fin]:
+            del ws.row_dimensions[fila]
+        for rango in [rango for rango in ws.merged_cells.ranges if rango.min_row > fila_fin]:
+            ws.merged_cells.remove(rango)
+        ws._images = [img for img in ws._images if _fila_ancla(img) <= fila_fin]
+
+
+# Fila (base 1) donde está anclada la esquina superior izquierda de una imagen
+def _fila_ancla(img):
+    if isinstance(img.anchor, str):
+        return coordinate_to_tuple(img.anchor)[0]
+    return img.anchor._from.row + 1
+
+
+# Escritor de xlsx que guarda una sola vez cada imagen compartida (todas las
+# referencias a la misma ImagenCompartida apuntan al mismo archivo de xl/media)
+class _EscritorLibro(ExcelWriter):
+    def _write_images(self):
+        escritas = set()
+        for img in self._images:
+            if img.path not in escritas:
+                escritas.add(img.path)
+                self._archive.writestr(img.path[1:], img._data())
+
+
+# Guarda el libro como wb.save, pero con las imágenes repetidas en un solo archivo y
+# reproducible: el mismo libro da siempre los mismos bytes (fechas fijas en el ZIP y
+# en las propiedades del documento, que quedan con la fecha de creación de la plantilla)
+def guardar_libro(wb, destino):
+    with tiempos.etapa("guardar xlsx"):
+        compartir_imagenes(wb)
+        wb.properties.modified = wb.properties.created
+        with ZipReproducible(destino, "w", ZIP_DEFLATED, allowZip64=True) as archivo:
+            _EscritorLibro(wb, archivo).save()
+
+
+# Función segura para asignar valores en celdas (evita error en celdas combinadas)
+def set_cell_value_safe(ws, row, col_letter, value):
+    col = column_index_from_string(col_letter)
+    if (row, col) in indice_combinadas(ws):
+        return
+    ws.cell(row=row, column=col).value = value
+
+
+# Escribe un bloque de filas consecutivas desde fila_inicio; cada fila trae un valor
+# por columna de `columnas` (p. ej. nombre completo y CUI en B y D)
+def write_rows(ws, fila_inicio, filas, columnas=('B', 'D')):
+    indice = indice_combinadas(ws)
+    cols = [column_index_from_string(col_letter) for col_letter in columnas]
+    for fila, valores in enumerate(filas, start=fila_inicio):
+        for col, valor in zip(cols, valores):
+            if (fila, col) not in indice:
+                ws.cell(row=fila, column=col).value = valor
+
+
+# Función para insertar el logo con dimensiones 3.51 cm × 3.77 cm (≈133×143 px).
+# El archivo se lee una vez por proceso y todas las hojas comparten sus datos.
+def insertar_logo(ws, imagen_path, col='A', fila=1, ancho=133, alto=143):
+    ws.add_image(leer_imagen(imagen_path).copia(ancho, alto, f"{col}{fila}"))
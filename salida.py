@@ -0,0 +1,128 @@
+import os
+import shutil
+import tempfile
+import zipfile
+
+# ZIP armado a medida que llegan los archivos generados: cada uno se comprime y se
+# agrega en cuanto está listo, y al terminar el último solo falta cerrar el índice
+# del ZIP. Con `ruta` el ZIP se escribe en ese archivo; sin ella, en un temporal
+# (ver temporal) que pasa a ser de quien lo pide. Con `espejo` (una carpeta, p. ej.
+# Escritorio/PLANILLAS 2025) cada archivo se guarda además con la misma ruta
+# relativa que tiene dentro del ZIP.
+#
+#   salida = ZipSalida(espejo=None)
+#   salida.agregar("Planillas_Zacapa_DAPA-001-2025/1 - Zacapa, Gualán, PLANILLA.pdf", datos)
+#   with salida.cerrar() as archivo_zip:
+#       ...
+
+# Tamaño hasta el que un temporal se queda en memoria; pasado ese tamaño se vuelca a
+# disco. En la nube (sin copia en disco) un lote o una planilla común no toca el
+# disco, y uno muy grande no se queda entero en la memoria del servidor
+MAX_EN_MEMORIA = int(os.environ.get("PLANILLAS_EN_MEMORIA_MB", "32")) * 1024 * 1024
+
+# Fecha que llevan todos los archivos dentro de los ZIP (y xlsx) generados: con la hora
+# real dos corridas iguales darían bytes distintos
+FECHA_ZIP = (1980, 1, 1, 0, 0, 0)
+
+
+# ZipFile cuyos archivos agregados con writestr o write llevan siempre FECHA_ZIP, para
+# que el mismo contenido produzca los mismos bytes (open(nombre, "w") ya usa esa fecha)
+class ZipReproducible(zipfile.ZipFile):
+    def _info(self, nombre):
+        zinfo = zipfile.ZipInfo(nombre, date_time=FECHA_ZIP)
+        zinfo.compress_type = self.compression
+        zinfo._compresslevel = self.compresslevel
+        zinfo.external_attr = 0o600 << 16
+        return zinfo
+
+    def writestr(self, zinfo_or_arcname, data, compress_type=None, compresslevel=None):
+        if not isinstance(zinfo_or_arcname, zipfile.ZipInfo):
+            zinfo_or_arcname = self._info(zinfo_or_arcname)
+        super().writestr(zinfo_or_arcname, data, compress_type, compresslevel)
+
+    # openpyxl escribe las hojas desde temporales: sin la fecha del archivo en disco
+    def write(self, filename, arcname=None, compress_type=None, compresslevel=None):
+        zinfo = self._info(arcname or os.path.basename(filename))
+        if compress_type is not None:
+            zinfo.compress_type = compress_type
+        if compresslevel is not None:
+            zinfo._compresslevel = compresslevel
+        with open(filename, "rb") as origen, self.open(zinfo, "w") as destino:
+            shutil.copyfileobj(origen, destino, 1024 * 1024)
+
+
+# Archivo temporal anónimo: en memoria hasta MAX_EN_MEMORIA, luego en disco. Se borra
+# al cerrarlo
+def temporal():
+    return tempfile.SpooledTemporaryFile(max_size=MAX_EN_MEMORIA)
+
+
+class ZipSalida:
+    def __init__(self, espejo=None, ruta=None):
+        self.espejo = espejo
+        self.archivos = []  # rutas relativas agregadas, en orden
+        self.ruta = ruta
+        self.archivo = temporal() if ruta is None else None
+        self._zip = ZipReproducible(self.archivo if ruta is None else ruta, "w", zipfile.ZIP_DEFLATED)
+
+    def __len__(self):
+        return len(self.archivos)
+
+    # Ruta del archivo en la carpeta espejo (creando su subcarpeta), o None sin espejo
+    def ruta_espejo(self, ruta_relativa):
+        if not self.espejo:
+            return None
+        ruta = os.path.join(self.espejo, *ruta_relativa.split("/"))
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        return ruta
+
+    # Agrega un archivo a partir de sus bytes; con espejo=False no lo copia a disco
+    # (p. ej. porque ya está en la carpeta espejo)
+    def agregar(self, ruta_relativa, datos, espejo=True):
+        self._zip.writestr(ruta_relativa, datos)
+        ruta = self.ruta_espejo(ruta_relativa) if espejo else None
+        if ruta:
+            with open(ruta, "wb") as f:
+                f.write(datos)
+        self.archivos.append(ruta_relativa)
+
+    # Agrega un archivo abierto (p. ej. un temporal) copiándolo por partes
+    def agregar_archivo(self, ruta_relativa, archivo):
+        archivo.seek(0)
+        with self._zip.open(ruta_relativa, "w", force_zip64=True) as destino:
+            shutil.copyfileobj(archivo, destino, 1024 * 1024)
+        ruta = self.ruta_espejo(ruta_relativa)
+        if ruta:
+            archivo.seek(0)
+            with open(ruta, "wb") as f:
+                shutil.copyfileobj(archivo, f, 1024 * 1024)
+        self.archivos.append(ruta_relativa)
+
+    # Cierra el ZIP y devuelve su ruta o, sin ella, el temporal abierto al principio
+    # (quien lo recibe lo cierra)
+    def cerrar(self):
+        if self._zip.fp is not None:
+            self._zip.close()
+        if self.ruta is not None:
+            return self.ruta
+        self.archivo.seek(0)
+        return self.archivo
+
+    # Copia el ZIP ya cerrado a `ruta`; devuelve esa ruta
+    def guardar(self, ruta):
+        zip_cerrado = self.cerrar()
+        if self.ruta is not None:
+            shutil.copyfile(zip_cerrado, ruta)
+            return ruta
+        with open(ruta, "wb") as f:
+            shutil.copyfileobj(zip_cerrado, f, 1024 * 1024)
+        zip_cerrado.seek(0)
+        return ruta
+
+    # Cierra y borra el ZIP (p. ej. si quedó vacío)
+    def descartar(self):
+        self.cerrar()
+        if self.archivo is not None:
+            self.archivo.close()
+        elif os.path.exists(self.ruta):
+            os.remove(self.ruta)
@@ -0,0 +1,129 @@
+import argparse
+import os
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+# Archivos de comunidades y beneficiarios sintéticos, con la forma de los reales:
+# tamaños de comunidad muy desiguales (unas pocas con cientos de beneficiarios y
+# muchas con una decena), referencias con mayúsculas y espacios de más, encabezados
+# con \xa0, nombres incompletos y CUI leídos como número. Con la misma semilla se
+# obtienen siempre los mismos archivos, así las mediciones son comparables.
+
+NOMBRES = ["María", "José", "Juan", "Ana", "Luis", "Rosa", "Carlos", "Marta", "Pedro", "Sandra", "Miguel",
+           "Lucía", "Francisco", "Elena", "Jorge", "Gloria", "Manuel", "Carmen", "Mario", "Olga", "Byron",
+           "Dora", "Edgar", "Sonia", "Erick", "Vilma", "Otto", "Blanca", "Hugo", "Irma", "Selvin", "Yesenia"]
+APELLIDOS = ["López", "García", "Pérez", "Hernández", "González", "Morales", "Rodríguez", "Martínez", "Ramírez",
+             "Cruz", "Reyes", "Méndez", "Castillo", "Ajú", "Xitumul", "Coc", "Caal", "Tzul", "Chávez", "Ixcoy",
+             "Pop", "Choc", "Sic", "Batz", "Juárez", "Orellana", "Monterroso", "Barrios", "De León", "Quiej"]
+DEPARTAMENTOS = {
+    "Alta Verapaz": ["Cobán", "San Pedro Carchá", "Chisec", "Senahú"],
+    "Huehuetenango": ["Chiantla", "Cuilco", "Nentón", "Todos Santos Cuchumatán"],
+    "Quiché": ["Chichicastenango", "Nebaj", "Uspantán", "Zacualpa"],
+    "San Marcos": ["Comitancillo", "Tacaná", "Tajumulco", "Sibinal"],
+    "Zacapa": ["Gualán", "La Unión", "Camotán", "Jocotán"],
+    "Petén": ["Flores", "San Andrés", "La Libertad", "Sayaxché"],
+}
+TIPOS_LUGAR = ["Aldea", "Caserío", "Cantón", "Paraje", "Escuela Oficial Rural Mixta"]
+TECNICOS = ["Ana Lucía Coc", "Byron Ixcoy", "Edgar Pop Caal", "Sonia Batz", "Mario Orellana"]
+
+
+# Beneficiarios por comunidad: reparto tipo Zipf (la comunidad k recibe ~1/k^sesgo)
+# con al menos uno por comunidad; suma exactamente `beneficiarios`
+def tamanos_comunidades(beneficiarios, comunidades, sesgo=1.1, semilla=0):
+    rng = np.random.default_rng(semilla)
+    comunidades = max(1, min(comunidades, beneficiarios))
+    pesos = 1.0 / np.arange(1, comunidades + 1) ** sesgo
+    rng.shuffle(pesos)
+    tamanos = np.ones(comunidades, dtype=int)
+    tamanos += rng.multinomial(beneficiarios - comunidades, pesos / pesos.sum())
+    return tamanos.tolist()
+
+
+# (df_comunidades, df_beneficiarios) sintéticos. Sin `comunidades` se usa una cada
+# 40 beneficiarios, como en una ronda típica.
+def generar_datos(beneficiarios=1000, comunidades=None, sesgo=1.1, semilla=0):
+    rng = np.random.default_rng(semilla)
+    comunidades = comunidades or max(1, beneficiarios // 40)
+    tamanos = tamanos_comunidades(beneficiarios, comunidades, sesgo, semilla)
+
+    deps = list(DEPARTAMENTOS)
+    filas_comunidades = []
+    for i, tamano in enumerate(tamanos):
+        dep = deps[rng.integers(len(deps))]
+        filas_comunidades.append({
+            "Comunidad/ Establecimiento": f"{TIPOS_LUGAR[i % len(TIPOS_LUGAR)]} {APELLIDOS[i % len(APELLIDOS)]} {i + 1}",
+            "Departamento": dep,
+            "Municipio": DEPARTAMENTOS[dep][rng.integers(4)],
+            "Nombre del técnico": TECNICOS[i % len(TECNICOS)],
+            "CUI del técnico": int(2_000_000_000_000 + rng.integers(10**12)),
+            "Insumo": "Semilla de maíz" if i % 2 else "Kit de huerto familiar",
+            "Listado de Registro de capacitacion y asistencia Tecnica": "Capacitación en buenas prácticas agrícolas",
+            "CODIGO ESCOLAR": f"16-{i + 1:02d}-{rng.integers(1000, 9999)}-43" if i % 5 == 4 else "",
+        })
+    df_comunidades = pd.DataFrame(filas_comunidades)
+
+    total = sum(tamanos)
+    nombres = np.array(NOMBRES, dtype=object)
+    apellidos = np.array(APELLIDOS, dtype=object)
+    referencias = np.repeat(df_comunidades["Comunidad/ Establecimiento"].to_numpy(dtype=object), tamanos)
+    # Como en los archivos reales, la referencia no siempre coincide en mayúsculas y espacios
+    variantes = rng.integers(3, size=total)
+    referencias = np.where(variantes == 1, np.char.lower(referencias.astype(str)).astype(object), referencias)
+    referencias = np.where(variantes == 2, referencias + " ", referencias)
+    cui = (1_000_000_000_000 + rng.choice(9 * 10**12, size=total, replace=False)).astype(float)
+    cui[rng.random(total) < 0.01] = np.nan  # algunos sin CUI: la columna se lee como float
+
+    def opcional(valores, probabilidad):
+        return np.where(rng.random(total) < probabilidad, valores, None)
+
+    df_beneficiarios = pd.DataFrame({
+        "No.": np.arange(1, total + 1),
+        "Referencia": referencias,
+        "PRIMER NOMBRE": nombres[rng.integers(len(nombres), size=total)],
+        "SEGUNDO NOMBRE": opcional(nombres[rng.integers(len(nombres), size=total)], 0.7),
+        "TERCER NOMBRE": opcional(nombres[rng.integers(len(nombres), size=total)], 0.05),
+        "PRIMER APELLIDO": apellidos[rng.integers(len(apellidos), size=total)],
+        "SEGUNDO APELLIDO": opcional(apellidos[rng.integers(len(apellidos), size=total)], 0.9),
+        "APELLIDO CASADA": opcional(apellidos[rng.integers(len(apellidos), size=total)], 0.1),
+        "CUI": cui,
+        "Teléfono": rng.integers(30_000_000, 59_999_999, size=total),
+        "Observaciones": "",
+    })
+    # Encabezados como los exportan otros sistemas: con \xa0 y espacios de más
+    df_beneficiarios.columns = [f"{nombre}\xa0" if i % 3 == 1 else nombre
+                                for i, nombre in enumerate(df_beneficiarios.columns)]
+    return df_comunidades, df_beneficiarios
+
+
+# Bytes de un .xlsx con el DataFrame, como los que sube el usuario
+def a_excel(df):
+    salida = BytesIO()
+    df.to_excel(salida, index=False)
+    return salida.getvalue()
+
+
+# Uso desde consola:
+#   python sinteticos.py --beneficiarios 5000 --salida datos_prueba
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Genera archivos de comunidades y beneficiarios sintéticos.")
+    parser.add_argument("--beneficiarios", type=int, default=1000)
+    parser.add_argument("--comunidades", type=int, default=None)
+    parser.add_argument("--sesgo", type=float, default=1.1, help="Desigualdad de tamaños (0 = todas iguales)")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", default=".", help="Carpeta donde guardar los dos archivos")
+    args = parser.parse_args(argumentos)
+
+    df_comunidades, df_beneficiarios = generar_datos(args.beneficiarios, args.comunidades, args.sesgo, args.semilla)
+    os.makedirs(args.salida, exist_ok=True)
+    for nombre, df in (("comunidades.xlsx", df_comunidades), ("beneficiarios.xlsx", df_beneficiarios)):
+        ruta = os.path.join(args.salida, nombre)
+        with open(ruta, "wb") as f:
+            f.write(a_excel(df))
+        print(f"{ruta}: {len(df)} filas")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
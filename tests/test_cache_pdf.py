@@ -0,0 +1,60 @@
+import os
+
+from cache_pdf import CachePDF, clave_planilla
+
+
+def _envejecer(cache, clave, segundos):
+    os.utime(cache.ruta(clave), (segundos, segundos))
+
+
+def test_obtener_devuelve_lo_guardado(tmp_path):
+    cache = CachePDF(str(tmp_path), max_bytes=1000)
+    assert cache.obtener("a") is None
+    cache.guardar("a", b"%PDF-a")
+    assert cache.obtener("a") == b"%PDF-a"
+
+
+def test_recorte_borra_el_menos_usado(tmp_path):
+    cache = CachePDF(str(tmp_path), max_bytes=250)
+    cache.guardar("a", b"a" * 100)
+    _envejecer(cache, "a", 1000)
+    cache.guardar("b", b"b" * 100)
+    _envejecer(cache, "b", 2000)
+
+    # Leer "a" la renueva: al pasarse del máximo sale "b", aunque se guardó después
+    assert cache.obtener("a") is not None
+    cache.guardar("c", b"c" * 100)
+
+    assert cache.obtener("b") is None
+    assert cache.obtener("a") == b"a" * 100
+    assert cache.obtener("c") == b"c" * 100
+
+
+def test_recorte_deja_la_carpeta_bajo_el_maximo(tmp_path):
+    cache = CachePDF(str(tmp_path), max_bytes=1000)
+    for i in range(30):
+        cache.guardar(f"clave{i}", bytes(100))
+        _envejecer(cache, f"clave{i}", 1000 + i)
+    total = sum(entrada.stat().st_size for entrada in os.scandir(tmp_path))
+    assert total <= 1000
+    # Quedan los más recientes
+    assert cache.obtener("clave29") is not None
+    assert cache.obtener("clave0") is None
+
+
+def test_limpiar(tmp_path):
+    cache = CachePDF(str(tmp_path), max_bytes=1000)
+    cache.guardar("a", b"x")
+    cache.limpiar()
+    assert cache.obtener("a") is None
+
+
+def test_clave_cambia_con_los_beneficiarios(tmp_path):
+    datos = {"comunidad": "Aldea Uno", "dep": "Zacapa"}
+    beneficiarios = [{"NOMBRE COMPLETO": "Ana López", "CUI": "1234567890101"}]
+    clave = clave_planilla("entrega", datos, beneficiarios, "directo", "no-existe.xlsx", "no-existe.png")
+    assert clave == clave_planilla("entrega", dict(datos), list(beneficiarios), "directo",
+                                   "no-existe.xlsx", "no-existe.png")
+    otros = beneficiarios + [{"NOMBRE COMPLETO": "Luis Pérez", "CUI": "1234567890102"}]
+    assert clave != clave_planilla("entrega", datos, otros, "directo", "no-existe.xlsx", "no-existe.png")
+    assert clave != clave_planilla("asistencia", datos, beneficiarios, "directo", "no-existe.xlsx", "no-existe.png")
@@ -0,0 +1,88 @@
+import pandas as pd
+
+from beneficiarios import IndiceBeneficiarios
+from coincidencias import (AMBIGUA, APROXIMADA, EXACTA, SIN_COINCIDENCIA, IndiceComunidades, asignar, emparejar,
+                           normalizar, por_revisar, resumen)
+
+COMUNIDADES = [
+    "Caserío Pérez",
+    "Aldea López 11",
+    "Aldea López 12",
+    "Escuela Oficial Rural Mixta Aldea El Naranjo",
+    "Escuela Oficial Rural Mixta Caserío Las Flores",
+    "Cantón San José",
+    "Canton San Jose",
+]
+
+
+def test_normalizar():
+    assert normalizar("  Caserío   PÉREZ ") == "caserio perez"
+    assert normalizar("Aldea-López/11") == "aldea lopez 11"
+
+
+def test_exacta_sin_tildes_ni_espacios():
+    comunidad, confianza, estado, _ = IndiceComunidades(COMUNIDADES).resolver("caserio  perez")
+    assert (comunidad, confianza, estado) == ("Caserío Pérez", 1.0, EXACTA)
+
+
+def test_aproximada_con_error_de_tipeo():
+    comunidad, confianza, estado, _ = IndiceComunidades(COMUNIDADES).resolver("escuela oficial rural mixta aldea el naranjos")
+    assert comunidad == "Escuela Oficial Rural Mixta Aldea El Naranjo"
+    assert estado == APROXIMADA
+    assert confianza >= 0.75
+
+
+def test_el_prefijo_comun_no_basta():
+    # Comparte "escuela oficial rural mixta" con dos comunidades, pero el resto no se parece
+    comunidad, _, estado, _ = IndiceComunidades(COMUNIDADES).resolver("escuela oficial rural mixta aldea santa rosa")
+    assert comunidad is None
+    assert estado == SIN_COINCIDENCIA
+
+
+def test_numeros_distintos_nunca_coinciden():
+    comunidad, confianza, estado, _ = IndiceComunidades(COMUNIDADES).resolver("aldea lopez 13")
+    assert comunidad is None
+    assert confianza == 0.0
+    assert estado == SIN_COINCIDENCIA
+
+
+def test_dos_comunidades_con_la_misma_clave_son_ambiguas():
+    comunidad, _, estado, alternativa = IndiceComunidades(COMUNIDADES).resolver("canton san jose")
+    assert comunidad is None
+    assert estado == AMBIGUA
+    assert alternativa == "Cantón San José, Canton San Jose"
+
+
+def test_sin_coincidencia():
+    indice = IndiceComunidades(COMUNIDADES)
+    assert indice.resolver("zzz")[2] == SIN_COINCIDENCIA
+    assert indice.resolver("")[2] == SIN_COINCIDENCIA
+    assert IndiceComunidades([]).resolver("caserio perez")[2] == SIN_COINCIDENCIA
+
+
+def _beneficiarios(referencias):
+    return IndiceBeneficiarios(pd.DataFrame({"Referencia": referencias}))
+
+
+def test_aproximadas_solo_se_asignan_confirmadas():
+    beneficiarios = _beneficiarios(["Caserío Pérez", "caserio peres", "caserio peres", "aldea lopez 13"])
+    resultado = emparejar(beneficiarios, pd.Series(COMUNIDADES))
+
+    assert list(resultado["Estado"]) == [EXACTA, APROXIMADA, SIN_COINCIDENCIA]
+    assert resumen(resultado) == {EXACTA: 1, APROXIMADA: 2, SIN_COINCIDENCIA: 1}
+    assert list(por_revisar(resultado)["Referencia"]) == ["caserio peres", "aldea lopez 13"]
+
+    assert asignar(beneficiarios, resultado).cantidad("Caserío Pérez") == 1
+    confirmado = asignar(beneficiarios, resultado, {"caserio peres", "aldea lopez 13"})
+    assert confirmado.cantidad("Caserío Pérez") == 3
+    assert confirmado.cantidad("Aldea López 13") == 0
+    assert beneficiarios.asignadas == {}
+    assert beneficiarios.cantidad("Caserío Pérez") == 1
+
+
+def test_emparejar_reutiliza_el_resultado_sin_compartirlo():
+    beneficiarios = _beneficiarios(["Caserío Pérez"])
+    primero = emparejar(beneficiarios, COMUNIDADES)
+    primero.loc[0, "Estado"] = "modificado"
+    segundo = emparejar(beneficiarios, COMUNIDADES)
+    assert segundo.loc[0, "Estado"] == EXACTA
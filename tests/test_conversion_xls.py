@@ -0,0 +1,76 @@
+import datetime
+import io
+import os
+import zipfile
+
+import pytest
+from openpyxl import load_workbook
+
+from conversion_xls import convertir_lote, convertir_xls, preparar_entradas
+
+xlwt = pytest.importorskip("xlwt")  # solo para armar los .xls de prueba
+
+
+# .xls con dos hojas: valores de cada tipo, una celda combinada en negrita y un ancho de columna
+def _xls(ruta, titulo="Beneficiarios"):
+    libro = xlwt.Workbook()
+    hoja = libro.add_sheet(titulo)
+    hoja.write_merge(0, 0, 0, 2, "LISTADO", xlwt.easyxf("font: bold on"))
+    hoja.write(1, 0, "Ana López")
+    hoja.write(1, 1, 1234567890101)
+    hoja.write(1, 2, 2.5)
+    hoja.write(2, 0, datetime.datetime(2025, 3, 14), xlwt.easyxf(num_format_str="dd/mm/yyyy"))
+    hoja.write(2, 1, True)
+    hoja.col(0).width = 256 * 30
+    libro.add_sheet("Resumen").write(0, 0, "Total")
+    libro.save(str(ruta))
+    return str(ruta)
+
+
+def test_convierte_todas_las_hojas_con_valores_y_formato(tmp_path):
+    resumen = convertir_xls(_xls(tmp_path / "a.xls"), str(tmp_path / "a.xlsx"))
+    assert (resumen["hojas"], resumen["filas"]) == (2, 4)
+
+    wb = load_workbook(tmp_path / "a.xlsx")
+    assert wb.sheetnames == ["Beneficiarios", "Resumen"]
+    ws = wb["Beneficiarios"]
+    assert [ws["A2"].value, ws["B2"].value, ws["C2"].value] == ["Ana López", 1234567890101, 2.5]
+    assert ws["A3"].value == datetime.datetime(2025, 3, 14)
+    assert ws["A3"].number_format == "dd/mm/yyyy"
+    assert ws["B3"].value is True
+    assert ws["A1"].font.b
+    assert [str(rango) for rango in ws.merged_cells.ranges] == ["A1:C1"]
+    assert ws.column_dimensions["A"].width == 30
+    assert wb["Resumen"]["A1"].value == "Total"
+
+
+def test_entradas_sueltas_y_dentro_de_zip_sin_pisarse(tmp_path):
+    origen = _xls(tmp_path / "ronda.xls")
+    zip_entradas = io.BytesIO()
+    with zipfile.ZipFile(zip_entradas, "w") as zf:
+        zf.write(origen, "municipio/ronda.xls")
+        zf.writestr("leeme.txt", "no es xls")
+    zip_entradas.seek(0)
+    (tmp_path / "notas.txt").write_text("tampoco")
+    carpeta = tmp_path / "entradas"
+    carpeta.mkdir()
+
+    with open(origen, "rb") as suelto:
+        rutas = preparar_entradas([("ronda.xls", suelto), ("ronda.zip", zip_entradas), str(tmp_path / "notas.txt")],
+                                  str(carpeta))
+    assert [os.path.basename(ruta) for ruta in rutas] == ["ronda.xls", "ronda (2).xls"]
+
+
+def test_lote_sigue_aunque_un_archivo_falle(tmp_path):
+    valido = _xls(tmp_path / "valido.xls")
+    danado = tmp_path / "danado.xls"
+    danado.write_bytes(b"no es un xls")
+    avance = []
+    ruta_zip, resumen = convertir_lote([valido, str(danado)], str(tmp_path / "convertidos.zip"), trabajadores=1,
+                                       progreso=lambda completados, total, archivo: avance.append(archivo))
+
+    assert resumen[0]["estado"] == "ok"
+    assert resumen[1]["estado"].startswith("error")
+    assert avance == ["valido.xls", "danado.xls"]
+    with zipfile.ZipFile(ruta_zip) as zf:
+        assert zf.namelist() == ["valido.xlsx"]
@@ -0,0 +1,107 @@
+import json
+import os
+
+import pandas as pd
+
+from beneficiarios import IndiceBeneficiarios
+from cui import (INVALIDO, OFICIO_ANTERIOR, REPETIDO, SIN_CUI, VARIAS_COMUNIDADES, cui_normalizado,
+                 historial_cui, reporte, reporte_csv)
+from manifiesto import NOMBRE_MANIFIESTO
+
+
+def _indice(filas):
+    df = pd.DataFrame(filas, columns=["Referencia", "CUI"])
+    for columna in ["Primer Nombre", "Segundo Nombre", "Tercer Nombre", "Primer Apellido", "Segundo Apellido",
+                    "Apellido Casada"]:
+        df[columna] = ""
+    df["Primer Nombre"] = [f"Persona{i}" for i in range(len(df))]
+    return IndiceBeneficiarios(df)
+
+
+def _problemas(df):
+    return {(fila["Fila"], fila["Problema"]) for fila in df.to_dict(orient="records")}
+
+
+def test_cui_normalizado():
+    assert cui_normalizado("2 345 67890 0101") == "2345678900101"
+    assert cui_normalizado(None) == ""
+
+
+def test_sin_problemas():
+    indice = _indice([["Aldea Uno", "1234567890101"], ["Aldea Uno", "1234567890102"]])
+    assert reporte(indice).empty
+
+
+def test_repetidos_varias_comunidades_invalidos_y_vacios():
+    indice = _indice([
+        ["Aldea Uno", "1234567890101"],    # fila 2
+        ["Aldea Uno", "1234 56789 0101"],  # fila 3: el mismo CUI con espacios
+        ["Aldea Uno", "1234567890102"],    # fila 4
+        ["Aldea Dos", "1234567890102"],    # fila 5: el mismo CUI en otra comunidad
+        ["Aldea Dos", "123"],              # fila 6
+        ["Aldea Dos", None],               # fila 7
+    ])
+    df = reporte(indice)
+    assert _problemas(df) == {
+        (2, REPETIDO), (3, REPETIDO),
+        (4, VARIAS_COMUNIDADES), (5, VARIAS_COMUNIDADES),
+        (6, INVALIDO),
+        (7, SIN_CUI),
+    }
+    detalle = df.loc[df["Problema"] == VARIAS_COMUNIDADES, "Detalle"].unique()
+    assert list(detalle) == ["aldea dos, aldea uno"]
+
+
+def test_reporte_csv_con_bom_y_cui_como_texto():
+    df = reporte(_indice([["Aldea Uno", "123"]]))
+    csv = reporte_csv(df)
+    assert csv.startswith(b"\xef\xbb\xbf")
+    assert '"=""123"""' in csv.decode("utf-8-sig")
+
+
+def _manifiesto(carpeta, nombre, cuis):
+    (carpeta / nombre).mkdir()
+    (carpeta / nombre / NOMBRE_MANIFIESTO).write_text(json.dumps({"cuis": cuis}), encoding="utf-8")
+
+
+def test_historial_de_oficios_anteriores(tmp_path):
+    _manifiesto(tmp_path, "Planillas_Zacapa_DAPCA-001-2025", {"Aldea Uno": ["1234567890101"]})
+    _manifiesto(tmp_path, "Planillas_Zacapa_DAPCA-002-2025", {"Aldea Dos": ["1234567890101", "1234567890109"]})
+
+    historial = historial_cui(str(tmp_path))
+    assert historial["1234567890101"] == "DAPCA-001-2025 (Aldea Uno); DAPCA-002-2025 (Aldea Dos)"
+
+    # El oficio que se está por generar no cuenta contra sí mismo
+    historial = historial_cui(str(tmp_path), excluir_oficio="DAPCA-002-2025")
+    assert historial == {"1234567890101": "DAPCA-001-2025 (Aldea Uno)"}
+
+    indice = _indice([["Aldea Tres", "1234567890101"], ["Aldea Tres", "1234567890103"]])
+    df = reporte(indice, historial)
+    assert _problemas(df) == {(2, OFICIO_ANTERIOR)}
+
+
+def test_historial_se_relee_si_cambia_un_manifiesto(tmp_path):
+    _manifiesto(tmp_path, "Planillas_Zacapa_DAPCA-001-2025", {"Aldea Uno": ["1"]})
+    assert historial_cui(str(tmp_path)) == {"1": "DAPCA-001-2025 (Aldea Uno)"}
+
+    ruta = tmp_path / "Planillas_Zacapa_DAPCA-001-2025" / NOMBRE_MANIFIESTO
+    ruta.write_text(json.dumps({"cuis": {"Aldea Uno": ["1", "2"]}}), encoding="utf-8")
+    estado = ruta.stat()
+    os.utime(ruta, ns=(estado.st_atime_ns, estado.st_mtime_ns + 1_000_000_000))
+    assert set(historial_cui(str(tmp_path))) == {"1", "2"}
+
+
+def test_historial_sin_carpeta(tmp_path):
+    assert historial_cui(str(tmp_path / "no-existe")) == {}
+
+
+def test_planilla_suelta_anota_sus_cui(tmp_path):
+    from generacion import anotar_planilla
+
+    carpeta = tmp_path / "Planillas_Zacapa_DAPCA-001-2025"
+    carpeta.mkdir()
+    datos = {"comunidad": "Aldea Uno"}
+    anotar_planilla(str(carpeta), "1 - Zacapa, Gualán, PLANILLA.pdf", datos,
+                    [{"NOMBRE COMPLETO": "Ana López", "CUI": "1234 56789 0101"}], "directo",
+                    plantilla="no-existe.xlsx", logo_path="no-existe.png")
+    assert historial_cui(str(tmp_path)) == {"1234567890101": "DAPCA-001-2025 (Aldea Uno)"}
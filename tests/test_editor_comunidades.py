@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from editor_comunidades import COLUMNA_FILA, aplicar, diferencias
+
+
+def _pagina(df, filas):
+    return df.iloc[filas].assign(**{COLUMNA_FILA: filas})
+
+
+def test_diferencias_solo_las_celdas_cambiadas():
+    df = pd.DataFrame({"Comunidad/ Establecimiento": ["Aldea Uno", "Aldea Dos", "Aldea Tres"],
+                       "DPI": [1234, 5678, 9012],
+                       "Insumo": ["maíz", np.nan, "frijol"]})
+    enviada = _pagina(df, [1, 2])
+    # Lo que devuelve la grilla: JSON, con None por NaN y 5678.0 por 5678
+    editada = pd.DataFrame({"Comunidad/ Establecimiento": ["Aldea Dos", "Aldea 3"],
+                            "DPI": [5678.0, 9012],
+                            "Insumo": [None, "frijol"],
+                            COLUMNA_FILA: [1, 2]})
+    assert diferencias(enviada, editada) == [(2, "Comunidad/ Establecimiento", "Aldea 3")]
+
+
+def test_diferencias_ignora_filas_que_no_se_enviaron():
+    df = pd.DataFrame({"Comunidad/ Establecimiento": ["Aldea Uno", "Aldea Dos"]})
+    enviada = _pagina(df, [0])
+    editada = pd.DataFrame({"Comunidad/ Establecimiento": ["Otra"], COLUMNA_FILA: [1]})
+    assert diferencias(enviada, editada) == []
+
+
+def test_aplicar_por_posicion():
+    df = pd.DataFrame({"Comunidad/ Establecimiento": ["Aldea Uno", "Aldea Dos"], "DPI": [1234, 5678]})
+    aplicar(df, [(1, "Comunidad/ Establecimiento", "Aldea 2"), (0, "DPI", 4321)])
+    assert list(df["Comunidad/ Establecimiento"]) == ["Aldea Uno", "Aldea 2"]
+    assert list(df["DPI"]) == [4321, 5678]
+
+
+def test_aplicar_texto_en_columna_numerica():
+    df = pd.DataFrame({"DPI": [1234, 5678]})
+    aplicar(df, [(0, "DPI", "sin DPI")])
+    assert df["DPI"].dtype == object
+    assert list(df["DPI"]) == ["sin DPI", 5678]
@@ -0,0 +1,160 @@
+import io
+
+import pandas as pd
+import pytest
+from pypdf import PdfReader, PdfWriter
+
+import generacion
+from beneficiarios import IndiceBeneficiarios
+from generacion import generar_lote, numero_comunidad, numeros_comunidad
+
+COLUMNAS_NOMBRE = ["Primer Nombre", "Segundo Nombre", "Tercer Nombre", "Primer Apellido", "Segundo Apellido",
+                   "Apellido Casada"]
+
+
+def _comunidades():
+    return pd.DataFrame({"Comunidad/ Establecimiento": ["Aldea Uno", "Aldea Dos", "Aldea Tres", "Aldea Cuatro"],
+                         "Departamento": ["Zacapa", "Zacapa", "Petén", "Zacapa"],
+                         "Municipio": ["Gualán", "Teculután", "La Libertad", "Usumatlán"]})
+
+
+def test_numero_es_la_fila_en_el_archivo():
+    df = _comunidades()
+    assert numeros_comunidad(df) == [1, 2, 3, 4]
+    assert numero_comunidad(df, " aldea tres ") == 3
+
+
+def test_filtrar_no_cambia_el_numero():
+    filtrado = _comunidades().iloc[[1, 3]]
+    assert numeros_comunidad(filtrado) == [2, 4]
+    assert numero_comunidad(filtrado, "Aldea Cuatro") == 4
+
+
+def _beneficiarios(nombre="Ana"):
+    filas = []
+    for i, comunidad in enumerate(["aldea uno", "aldea dos", "aldea tres", "aldea cuatro"]):
+        filas.append([comunidad, f"{nombre}{i}", "", "", "López", "", "", f"123456789010{i}"])
+    return IndiceBeneficiarios(pd.DataFrame(filas, columns=["Referencia"] + COLUMNAS_NOMBRE + ["CUI"]))
+
+
+# Planillas de mentira: el contenido son los nombres de los beneficiarios, así se ve
+# qué datos quedaron en cada archivo sin cargar la plantilla real
+def _planilla_falsa(tipo, datos, beneficiarios, convertidor=None, logo_path=None, plantilla=None, cache=None):
+    contenido = ";".join(b["NOMBRE COMPLETO"] for b in beneficiarios).encode("utf-8")
+    return generacion.nombre_salida(tipo, datos, convertidor), contenido
+
+
+@pytest.fixture
+def lote(tmp_path, monkeypatch):
+    monkeypatch.setattr(generacion, "generar_planilla_en_memoria", _planilla_falsa)
+    monkeypatch.setattr(generacion, "exportar_modelos", lambda hojas, plantilla: None)
+    monkeypatch.setattr(generacion, "_iniciar_trabajador", lambda modelos, convertidor: None)
+    plantilla = tmp_path / "plantilla.xlsx"
+    plantilla.write_bytes(b"plantilla")
+    base = tmp_path / "PLANILLAS 2025"
+
+    def correr(beneficiarios, incremental=True, **opciones):
+        resumen, archivo_zip, copia = generar_lote(_comunidades(), beneficiarios, ["entrega"], "DAPCA-001-2025", "DAPCA",
+                                                   plantilla=str(plantilla), logo_path="no-existe.png",
+                                                   carpeta_base=str(base), incremental=incremental, **opciones)
+        if archivo_zip:
+            archivo_zip.close()
+        return resumen
+
+    correr.base = base
+    return correr
+
+
+def _contenidos(base):
+    return {ruta.name: ruta.read_text(encoding="utf-8") for ruta in base.rglob("*.xlsx")}
+
+
+def test_incremental_solo_regenera_lo_que_cambio(lote):
+    assert [fila["estado"] for fila in lote(_beneficiarios())] == ["ok"] * 4
+    assert [fila["estado"] for fila in lote(_beneficiarios())] == ["sin cambios"] * 4
+
+
+def test_corrida_completa_actualiza_el_manifiesto(lote):
+    lote(_beneficiarios("Ana"))
+    # Una corrida completa (--todo) con otros datos reemplaza los archivos...
+    assert [fila["estado"] for fila in lote(_beneficiarios("Zoe"), incremental=False)] == ["ok"] * 4
+    assert all(contenido.startswith("Zoe") for contenido in _contenidos(lote.base).values())
+
+    # ...y una incremental con los datos de la primera no los da por vigentes
+    assert [fila["estado"] for fila in lote(_beneficiarios("Ana"))] == ["ok"] * 4
+    assert all(contenido.startswith("Ana") for contenido in _contenidos(lote.base).values())
+
+
+def test_planilla_suelta_invalida_la_del_lote(lote, tmp_path):
+    lote(_beneficiarios("Ana"))
+    carpeta = lote.base / "Planillas_Zacapa_DAPCA-001-2025"
+    nombre = next(ruta.name for ruta in carpeta.glob("1 - *.xlsx"))
+    (carpeta / nombre).write_text("Zoe0", encoding="utf-8")
+    datos = generacion.datos_comunidad(_comunidades().iloc[0].to_dict(), "DAPCA", "DAPCA-001-2025", 1, 1)
+    generacion.anotar_planilla(str(carpeta), nombre, datos, [{"NOMBRE COMPLETO": "Zoe0", "CUI": "1234567890100"}], None,
+                               plantilla=str(tmp_path / "plantilla.xlsx"), logo_path="no-existe.png")
+
+    estados = [fila["estado"] for fila in lote(_beneficiarios("Ana"))]
+    assert estados == ["ok", "sin cambios", "sin cambios", "sin cambios"]
+    assert (carpeta / nombre).read_text(encoding="utf-8").startswith("Ana")
+
+
+def test_corrida_completa_anota_los_cui(lote):
+    from cui import historial_cui
+
+    lote(_beneficiarios(), incremental=False)
+    historial = historial_cui(str(lote.base))
+    assert historial["1234567890100"] == "DAPCA-001-2025 (Aldea Uno)"
+    assert len(historial) == 4
+
+
+# Comunidades de un lote para _UnionLote: las dos primeras de Zacapa y la última de Petén
+def _trabajos_union():
+    comunidades = [("Planillas_Zacapa", 1, "Aldea Uno"), ("Planillas_Zacapa", 2, "Aldea Dos"),
+                   ("Planillas_Petén", 3, "Aldea Tres")]
+    return [({"comunidad": comunidad}, {"carpeta": carpeta, "datos": {"idx": idx, "comunidad": comunidad}})
+            for carpeta, idx, comunidad in comunidades]
+
+
+def _union(unir="departamento"):
+    from salida import ZipSalida
+
+    cerrados = []
+
+    def al_cerrar(ruta, archivo):
+        cerrados.append((ruta, [float(pagina.mediabox.width) for pagina in PdfReader(archivo).pages]))
+
+    union = generacion._UnionLote(_trabajos_union(), ["entrega"], "DAPCA-001-2025", unir, ZipSalida(), al_cerrar)
+    return union, cerrados
+
+
+# Archivos de una comunidad: un PDF de una página cuyo ancho dice de cuál es
+def _pdfs(ancho):
+    escritor = PdfWriter()
+    escritor.add_blank_page(width=ancho, height=100)
+    salida = io.BytesIO()
+    escritor.write(salida)
+    return [(f"x/{ancho}.pdf", salida.getvalue())]
+
+
+def test_union_en_el_orden_del_archivo_y_apenas_termina_cada_departamento():
+    union, cerrados = _union()
+    union.agregar(2, _pdfs(300))
+    union.agregar(1, _pdfs(200))
+    assert cerrados == []  # falta la primera comunidad
+
+    union.agregar(0, _pdfs(100))
+    assert cerrados == [("Planillas_Zacapa/Planillas_Zacapa.pdf", [100, 200]),
+                        ("Planillas_Petén/Planillas_Petén.pdf", [300])]
+    assert union.salida.archivos == [ruta for ruta, _ in cerrados]
+
+
+def test_union_del_oficio_con_comunidades_canceladas():
+    union, cerrados = _union("oficio")
+    union.agregar(0, _pdfs(100))
+    union.agregar(1, None)  # cancelada o con error: no suma páginas
+    assert cerrados == []
+
+    # Lote cancelado: lo que quedó abierto se cierra con lo ya agregado
+    union.cerrar()
+    assert cerrados == [("Planillas_DAPCA-001-2025.pdf", [100])]
@@ -0,0 +1,91 @@
+import os
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+import ingesta
+
+
+def _excel_beneficiarios(filas):
+    df = pd.DataFrame(filas, columns=["Referencia", "Primer Nombre", "Segundo Nombre", "Tercer Nombre",
+                                      "Primer Apellido", "Segundo Apellido", "Apellido Casada", "CUI", "Otra"])
+    salida = BytesIO()
+    df.to_excel(salida, index=False)
+    return salida.getvalue()
+
+
+@pytest.fixture
+def carpeta_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingesta, "CARPETA_CACHE", str(tmp_path))
+    return tmp_path
+
+
+def _archivos_cache(carpeta):
+    return sorted(nombre for nombre in os.listdir(carpeta) if nombre.endswith(".pkl"))
+
+
+def test_lee_y_normaliza(carpeta_cache):
+    datos = _excel_beneficiarios([
+        [" Aldea Uno ", "Ana", "", "", "López", "", "", "1234567890101", "x"],
+        ["aldea uno", "Luis", "", "", "Pérez", "", "", "1234567890102", "y"],
+    ])
+    indice = ingesta.leer_beneficiarios(datos)
+    assert len(indice) == 2
+    assert indice.completo
+    assert indice.cantidad("Aldea Uno") == 2
+    assert list(indice.listado("aldea uno")["NOMBRE COMPLETO"]) == ["Ana López", "Luis Pérez"]
+    # Solo se leen Referencia, los nombres y el CUI
+    assert "OTRA" not in indice.df.columns
+
+
+def test_el_mismo_archivo_sale_de_la_cache_en_disco(carpeta_cache, monkeypatch):
+    datos = _excel_beneficiarios([["Aldea Uno", "Ana", "", "", "López", "", "", "1234567890101", ""]])
+    primero = ingesta.leer_beneficiarios(datos)
+    assert len(_archivos_cache(carpeta_cache)) == 1
+
+    def sin_excel(_datos):
+        raise AssertionError("no debería volver a leer el Excel")
+
+    monkeypatch.setattr(ingesta, "_leer_columnas_beneficiarios", sin_excel)
+    segundo = ingesta.leer_beneficiarios(BytesIO(datos))
+    assert segundo.df.equals(primero.df)
+
+
+def test_cache_danada_se_vuelve_a_leer(carpeta_cache):
+    datos = _excel_beneficiarios([["Aldea Uno", "Ana", "", "", "López", "", "", "1234567890101", ""]])
+    ingesta.leer_beneficiarios(datos)
+    ruta = carpeta_cache / _archivos_cache(carpeta_cache)[0]
+    ruta.write_bytes(b"no es un pickle")
+    assert len(ingesta.leer_beneficiarios(datos)) == 1
+
+
+def test_cache_en_disco_conserva_los_mas_recientes(carpeta_cache, monkeypatch):
+    monkeypatch.setattr(ingesta, "MAX_ARCHIVOS_DISCO", 2)
+    for i in range(4):
+        ingesta.leer_beneficiarios(_excel_beneficiarios([[f"Aldea {i}", "Ana", "", "", "López", "", "", "1", ""]]))
+        for nombre in _archivos_cache(carpeta_cache):
+            ruta = carpeta_cache / nombre
+            os.utime(ruta, (os.path.getmtime(ruta) - 10, os.path.getmtime(ruta) - 10))
+    assert len(_archivos_cache(carpeta_cache)) == 2
+
+
+def test_falta_referencia(carpeta_cache):
+    df = pd.DataFrame({"Primer Nombre": ["Ana"], "CUI": ["1"]})
+    salida = BytesIO()
+    df.to_excel(salida, index=False)
+    with pytest.raises(ValueError):
+        ingesta.leer_beneficiarios(salida.getvalue())
+
+
+class _Subido:
+    def __init__(self, datos):
+        self.datos = datos
+
+    def getvalue(self):
+        return self.datos
+
+
+def test_cargar_beneficiarios_comparte_el_indice(carpeta_cache):
+    subido = _Subido(_excel_beneficiarios([["Aldea Uno", "Ana", "", "", "López", "", "", "1234567890101", ""]]))
+    assert ingesta.cargar_beneficiarios(subido) is ingesta.cargar_beneficiarios(subido)
@@ -0,0 +1,79 @@
+import os
+
+from manifiesto import NOMBRE_MANIFIESTO, Manifiesto, huella, version_archivo
+
+
+def test_vigente_con_la_misma_huella_y_el_archivo_en_la_carpeta(tmp_path):
+    (tmp_path / "1 - Zacapa, Gualán, PLANILLA.pdf").write_bytes(b"%PDF")
+    manifiesto = Manifiesto(str(tmp_path))
+    assert not manifiesto.vigente("1 - Zacapa, Gualán, PLANILLA.pdf", "h1")
+
+    manifiesto.anotar("1 - Zacapa, Gualán, PLANILLA.pdf", "h1", comunidad="Aldea Uno")
+    assert manifiesto.vigente("1 - Zacapa, Gualán, PLANILLA.pdf", "h1")
+    assert not manifiesto.vigente("1 - Zacapa, Gualán, PLANILLA.pdf", "h2")
+
+
+def test_no_vigente_si_el_archivo_ya_no_esta(tmp_path):
+    manifiesto = Manifiesto(str(tmp_path))
+    manifiesto.anotar("borrado.pdf", "h1")
+    assert not manifiesto.vigente("borrado.pdf", "h1")
+
+
+def test_guardar_y_volver_a_leer(tmp_path):
+    (tmp_path / "a.pdf").write_bytes(b"%PDF")
+    manifiesto = Manifiesto(str(tmp_path))
+    manifiesto.anotar("a.pdf", "h1")
+    manifiesto.anotar_cuis("Aldea Uno", ["3", "", "1"])
+    manifiesto.guardar()
+
+    leido = Manifiesto(str(tmp_path))
+    assert leido.vigente("a.pdf", "h1")
+    assert leido.cuis == {"Aldea Uno": ["1", "3"]}
+    assert not leido.cambios
+
+
+def test_sin_cambios_no_escribe(tmp_path):
+    Manifiesto(str(tmp_path)).guardar()
+    assert not os.path.exists(tmp_path / NOMBRE_MANIFIESTO)
+
+
+def test_manifiesto_danado_se_ignora(tmp_path):
+    (tmp_path / NOMBRE_MANIFIESTO).write_text("{no es json", encoding="utf-8")
+    manifiesto = Manifiesto(str(tmp_path))
+    assert manifiesto.archivos == {}
+    assert manifiesto.cuis == {}
+
+
+def test_huella_cambia_con_datos_beneficiarios_y_plantilla(tmp_path):
+    plantilla = tmp_path / "plantilla.xlsx"
+    plantilla.write_bytes(b"uno")
+    datos = {"comunidad": "Aldea Uno"}
+    beneficiarios = [{"CUI": "1"}]
+    base = huella(datos, beneficiarios, "directo", str(plantilla), "no-existe.png")
+
+    assert base == huella(dict(datos), [{"CUI": "1"}], "directo", str(plantilla), "no-existe.png")
+    assert base != huella({"comunidad": "Aldea Dos"}, beneficiarios, "directo", str(plantilla), "no-existe.png")
+    assert base != huella(datos, [{"CUI": "2"}], "directo", str(plantilla), "no-existe.png")
+    assert base != huella(datos, beneficiarios, "libreoffice", str(plantilla), "no-existe.png")
+
+    plantilla.write_bytes(b"dos, con otro largo")
+    assert version_archivo(str(plantilla)) is not None
+    assert base != huella(datos, beneficiarios, "directo", str(plantilla), "no-existe.png")
+
+
+def test_guardar_no_pisa_lo_que_otro_guardo_mientras_tanto(tmp_path):
+    (tmp_path / "a.pdf").write_bytes(b"%PDF")
+    (tmp_path / "b.pdf").write_bytes(b"%PDF")
+    lote = Manifiesto(str(tmp_path))
+    boton = Manifiesto(str(tmp_path))
+
+    boton.anotar("b.pdf", "hb")
+    boton.guardar()
+    lote.anotar("a.pdf", "ha")
+    lote.anotar_cuis("Aldea Uno", ["1"])
+    lote.guardar()
+
+    leido = Manifiesto(str(tmp_path))
+    assert leido.vigente("a.pdf", "ha")
+    assert leido.vigente("b.pdf", "hb")
+    assert leido.cuis == {"Aldea Uno": ["1"]}
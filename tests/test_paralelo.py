@@ -0,0 +1,39 @@
+import time
+
+from paralelo import CANCELADO, ejecutar_en_paralelo
+
+
+def _fallar():
+    raise ValueError("sin plantilla")
+
+
+def test_un_error_no_detiene_a_los_demas():
+    resultados = ejecutar_en_paralelo(abs, [(-1,), (-2,)], trabajadores=1)
+    assert resultados == [(1, None), (2, None)]
+
+    resultado, error = ejecutar_en_paralelo(_fallar, [()], trabajadores=1)[0]
+    assert resultado is None
+    assert error.startswith("ValueError: sin plantilla")
+
+
+def test_cancelar_conserva_lo_que_estaba_corriendo():
+    # El trabajo 1 sigue corriendo cuando termina el 0 y se pide cancelar
+    trabajos = [(0.05,), (1.0,)] + [(0.05,)] * 8
+    terminados = []
+    resultados = ejecutar_en_paralelo(time.sleep, trabajos, trabajadores=2,
+                                      al_terminar=lambda i, resultado: terminados.append(i),
+                                      cancelado=lambda: bool(terminados))
+
+    assert resultados[0] == (None, None)
+    assert resultados[1] == (None, None)  # no se descarta lo que ya estaba en curso
+    assert 1 in terminados
+    assert resultados[-1] == (None, CANCELADO)
+    assert sorted(terminados) == [i for i, (_, error) in enumerate(resultados) if error != CANCELADO]
+
+
+def test_cancelar_sin_procesos():
+    terminados = []
+    resultados = ejecutar_en_paralelo(abs, [(-1,), (-2,), (-3,)], trabajadores=1,
+                                      al_terminar=lambda i, resultado: terminados.append(i),
+                                      cancelado=lambda: bool(terminados))
+    assert resultados == [(1, None), (None, CANCELADO), (None, CANCELADO)]
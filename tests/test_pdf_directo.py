@@ -0,0 +1,83 @@
+import io
+import os
+
+import pytest
+from openpyxl import Workbook
+from openpyxl.styles import Border, Side
+from pypdf import PdfReader
+
+from generacion import datos_comunidad
+from pdf_directo import renderizar_planilla
+
+LOGO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logo_maga.png")
+
+
+# Plantilla mínima con la hoja de la planilla de entrega: un título fijo en cada página
+# de 34 filas, bordes en la tabla de beneficiarios (filas 12 a 21) y hasta la columna K,
+# donde va el código
+def _plantilla(ruta, titulo="PLANILLA DE ENTREGA"):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "PLANILLAS"
+    linea = Side(style="thin")
+    for inicio in (1, 35):
+        ws.cell(inicio + 1, 3, titulo)
+        ws.cell(inicio, 11).border = Border(bottom=linea)
+        for fila in range(inicio + 11, inicio + 21):
+            ws.cell(fila, 1, fila - inicio - 10)
+            for columna in range(1, 6):
+                ws.cell(fila, columna).border = Border(top=linea, bottom=linea, left=linea, right=linea)
+    wb.save(ruta)
+    return str(ruta)
+
+
+def _beneficiarios(cantidad):
+    return [{"NOMBRE COMPLETO": f"Persona {i}", "CUI": f"12345678901{i:02d}"} for i in range(cantidad)]
+
+
+def _datos():
+    fila = {"Departamento": "Zacapa", "Municipio": "Gualán", "Comunidad/ Establecimiento": "Aldea Uno"}
+    return datos_comunidad(fila, "DAPCA", "DAPCA-001-2025", 1, 12)
+
+
+def _textos(pdf):
+    return [pagina.extract_text() for pagina in PdfReader(io.BytesIO(pdf)).pages]
+
+
+def test_una_pagina_por_cada_diez_beneficiarios(tmp_path):
+    plantilla = _plantilla(tmp_path / "plantilla.xlsx")
+    pdf = renderizar_planilla("entrega", _datos(), _beneficiarios(12), logo_path=LOGO, plantilla=plantilla)
+    primera, segunda = _textos(pdf)
+
+    assert "PLANILLA DE ENTREGA" in primera
+    assert "Aldea Uno" in primera and "DAPCA-001-2025_CD1_P12" in primera
+    assert "Persona 0" in primera and "Persona 9" in primera and "Persona 10" not in primera
+    assert "Persona 10" in segunda and "1234567890111" in segunda
+
+
+def test_mismos_datos_mismos_bytes_y_a_un_archivo(tmp_path):
+    plantilla = _plantilla(tmp_path / "plantilla.xlsx")
+    pdf = renderizar_planilla("entrega", _datos(), _beneficiarios(3), logo_path=LOGO, plantilla=plantilla)
+    assert pdf == renderizar_planilla("entrega", _datos(), _beneficiarios(3), logo_path=LOGO, plantilla=plantilla)
+
+    with open(tmp_path / "planilla.pdf", "wb") as f:
+        renderizar_planilla("entrega", _datos(), _beneficiarios(3), f, logo_path=LOGO, plantilla=plantilla)
+    assert (tmp_path / "planilla.pdf").read_bytes() == pdf
+
+
+def test_plantilla_modificada_cambia_el_fondo(tmp_path):
+    ruta = tmp_path / "plantilla.xlsx"
+    plantilla = _plantilla(ruta)
+    assert "PLANILLA DE ENTREGA" in _textos(renderizar_planilla("entrega", _datos(), _beneficiarios(1),
+                                                                 logo_path=LOGO, plantilla=plantilla))[0]
+    _plantilla(ruta, titulo="PLANILLA CORREGIDA")
+    estado = os.stat(ruta)
+    os.utime(ruta, ns=(estado.st_atime_ns, estado.st_mtime_ns + 1_000_000_000))
+    assert "PLANILLA CORREGIDA" in _textos(renderizar_planilla("entrega", _datos(), _beneficiarios(1),
+                                                                logo_path=LOGO, plantilla=plantilla))[0]
+
+
+def test_sin_beneficiarios(tmp_path):
+    plantilla = _plantilla(tmp_path / "plantilla.xlsx")
+    with pytest.raises(ValueError):
+        renderizar_planilla("entrega", _datos(), [], logo_path=LOGO, plantilla=plantilla)
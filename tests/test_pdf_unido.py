@@ -0,0 +1,47 @@
+import io
+
+from pypdf import PdfReader, PdfWriter
+
+from pdf_unido import PDFUnido
+
+
+# PDF de `paginas` hojas en blanco; el ancho identifica de qué PDF salió cada página
+def pdf_de_prueba(paginas, ancho=200):
+    escritor = PdfWriter()
+    for _ in range(paginas):
+        escritor.add_blank_page(width=ancho, height=100)
+    salida = io.BytesIO()
+    escritor.write(salida)
+    return salida.getvalue()
+
+
+def _marcadores(lector):
+    def titulos(items):
+        return [titulos(item) if isinstance(item, list) else item.title for item in items]
+    return titulos(lector.outline)
+
+
+def test_une_las_paginas_en_orden_con_marcadores():
+    with PDFUnido(io.BytesIO()) as union:
+        union.marcador("1 - Aldea Uno")
+        assert union.agregar(io.BytesIO(pdf_de_prueba(1, ancho=200)), "Planilla de entrega") == 1
+        assert union.agregar(io.BytesIO(pdf_de_prueba(2, ancho=300)), "Planilla de asistencia") == 2
+        union.marcador("2 - Aldea Dos")
+        union.agregar(io.BytesIO(pdf_de_prueba(1, ancho=400)), "Planilla de entrega")
+        assert len(union) == 4
+    union.destino.seek(0)
+    lector = PdfReader(union.destino)
+
+    assert [float(pagina.mediabox.width) for pagina in lector.pages] == [200, 300, 300, 400]
+    assert _marcadores(lector) == ["1 - Aldea Uno", ["Planilla de entrega", "Planilla de asistencia"],
+                                   "2 - Aldea Dos", ["Planilla de entrega"]]
+    assert lector.get_destination_page_number(lector.outline[2]) == 3
+
+
+def test_a_un_archivo_en_disco(tmp_path):
+    ruta = tmp_path / "Zacapa.pdf"
+    with PDFUnido(str(ruta)) as union:
+        union.agregar(io.BytesIO(pdf_de_prueba(2)))
+    lector = PdfReader(str(ruta))
+    assert len(lector.pages) == 2
+    assert lector.outline == []
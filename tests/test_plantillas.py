@@ -0,0 +1,88 @@
+import os
+
+import pytest
+from openpyxl import Workbook
+
+import plantillas
+from plantillas import (exportar_modelos, importar_modelos, limpiar_cache_plantillas, obtener_plantilla,
+                        set_cell_value_safe)
+
+
+def _plantilla(ruta, titulo="PLANILLA DE ENTREGA"):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "PLANILLAS"
+    ws["C2"] = titulo
+    ws.merge_cells("E9:H9")
+    wb.create_sheet("OTRA")["A1"] = "no es plantilla"
+    wb.save(ruta)
+    return str(ruta)
+
+
+# Cuenta cuántas veces se lee el archivo completo
+@pytest.fixture
+def lecturas(monkeypatch):
+    limpiar_cache_plantillas()
+    contador = []
+    cargar = plantillas.openpyxl.load_workbook
+
+    def contar(*args, **kwargs):
+        contador.append(args[0])
+        return cargar(*args, **kwargs)
+
+    monkeypatch.setattr(plantillas.openpyxl, "load_workbook", contar)
+    yield contador
+    limpiar_cache_plantillas()
+
+
+def test_se_lee_una_vez_y_cada_copia_es_independiente(tmp_path, lecturas):
+    ruta = _plantilla(tmp_path / "plantilla.xlsx")
+    primera = obtener_plantilla("PLANILLAS", ruta)
+    primera["PLANILLAS"]["C2"] = "modificada"
+    segunda = obtener_plantilla("PLANILLAS", ruta)
+
+    assert len(lecturas) == 1
+    assert segunda["PLANILLAS"]["C2"].value == "PLANILLA DE ENTREGA"
+    assert segunda.sheetnames == ["PLANILLAS"]
+    # Las copias conservan la fábrica de dimensiones (ocultar una fila nueva no falla)
+    segunda["PLANILLAS"].row_dimensions[50].hidden = True
+
+
+def test_se_relee_si_la_plantilla_cambia(tmp_path, lecturas):
+    ruta = _plantilla(tmp_path / "plantilla.xlsx")
+    obtener_plantilla("PLANILLAS", ruta)
+    _plantilla(ruta, titulo="PLANILLA CORREGIDA")
+    estado = os.stat(ruta)
+    os.utime(ruta, ns=(estado.st_atime_ns, estado.st_mtime_ns + 1_000_000_000))
+
+    assert obtener_plantilla("PLANILLAS", ruta)["PLANILLAS"]["C2"].value == "PLANILLA CORREGIDA"
+    assert len(lecturas) == 2
+
+    limpiar_cache_plantillas()
+    obtener_plantilla("PLANILLAS", ruta)
+    assert len(lecturas) == 3
+
+
+def test_modelos_exportados_no_releen_el_archivo(tmp_path, lecturas):
+    ruta = _plantilla(tmp_path / "plantilla.xlsx")
+    modelos = exportar_modelos(["PLANILLAS", "NO-EXISTE"], ruta)
+    assert list(modelos[2]) == ["PLANILLAS"]
+
+    # Como un proceso trabajador nuevo: sin cache propia, recibe los modelos ya leídos
+    limpiar_cache_plantillas()
+    importar_modelos(*modelos)
+    assert obtener_plantilla("PLANILLAS", ruta)["PLANILLAS"]["C2"].value == "PLANILLA DE ENTREGA"
+    assert len(lecturas) == 1
+
+
+def test_hoja_que_no_es_plantilla(tmp_path, lecturas):
+    ruta = _plantilla(tmp_path / "plantilla.xlsx")
+    with pytest.raises(KeyError):
+        obtener_plantilla("OTRA", ruta)
+
+
+def test_escribir_en_celda_combinada(tmp_path, lecturas):
+    ws = obtener_plantilla("PLANILLAS", _plantilla(tmp_path / "plantilla.xlsx"))["PLANILLAS"]
+    set_cell_value_safe(ws, 9, "E", "Aldea Uno")
+    set_cell_value_safe(ws, 9, "F", "ignorado")
+    assert ws["E9"].value == "Aldea Uno"
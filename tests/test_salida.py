@@ -0,0 +1,83 @@
+import os
+import zipfile
+
+import salida
+from salida import FECHA_ZIP, ZipReproducible, ZipSalida
+
+
+def _armar(ruta, temporal):
+    with ZipReproducible(ruta, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("a.txt", "uno")
+        zf.write(temporal, "b/b.txt")
+    with open(ruta, "rb") as f:
+        return f.read()
+
+
+def test_mismo_contenido_mismos_bytes(tmp_path):
+    temporal = tmp_path / "b.txt"
+    temporal.write_text("dos")
+    primero = _armar(tmp_path / "1.zip", temporal)
+
+    # Otra fecha en el archivo de origen no cambia el ZIP
+    os.utime(temporal, (1_700_000_000, 1_700_000_000))
+    segundo = _armar(tmp_path / "2.zip", temporal)
+    assert primero == segundo
+
+    with zipfile.ZipFile(tmp_path / "1.zip") as zf:
+        assert {info.date_time for info in zf.infolist()} == {FECHA_ZIP}
+        assert zf.read("b/b.txt") == b"dos"
+
+
+def test_zip_salida_en_disco_y_reproducible(tmp_path):
+    rutas = []
+    for i in range(2):
+        zip_salida = ZipSalida(ruta=str(tmp_path / f"{i}.zip"))
+        zip_salida.agregar("Planillas_Zacapa/1 - Zacapa, Gualán, PLANILLA.pdf", b"%PDF-1")
+        rutas.append(zip_salida.cerrar())
+    assert len(zip_salida) == 1
+    with open(rutas[0], "rb") as a, open(rutas[1], "rb") as b:
+        assert a.read() == b.read()
+
+
+def test_zip_salida_sin_ruta_queda_en_memoria(tmp_path, monkeypatch):
+    monkeypatch.setattr(salida, "MAX_EN_MEMORIA", 1024 * 1024)
+    zip_salida = ZipSalida()
+    zip_salida.agregar("a.pdf", b"%PDF")
+    with zip_salida.cerrar() as archivo_zip:
+        assert not archivo_zip._rolled  # un ZIP chico no toca el disco
+        with zipfile.ZipFile(archivo_zip) as zf:
+            assert zf.read("a.pdf") == b"%PDF"
+
+        copia = zip_salida.guardar(str(tmp_path / "copia.zip"))
+        archivo_zip.seek(0)
+        assert (tmp_path / "copia.zip").read_bytes() == archivo_zip.read()
+    assert copia == str(tmp_path / "copia.zip")
+
+
+def test_zip_salida_grande_pasa_a_disco(monkeypatch):
+    monkeypatch.setattr(salida, "MAX_EN_MEMORIA", 100)
+    zip_salida = ZipSalida()
+    zip_salida.agregar("a.bin", os.urandom(1000))
+    archivo_zip = zip_salida.cerrar()
+    assert archivo_zip._rolled
+    zip_salida.descartar()
+    assert archivo_zip.closed
+
+
+def test_espejo_y_guardar(tmp_path):
+    espejo = tmp_path / "PLANILLAS 2025"
+    zip_salida = ZipSalida(espejo=str(espejo), ruta=str(tmp_path / "salida.zip"))
+    zip_salida.agregar("Planillas_Zacapa/a.pdf", b"a")
+    zip_salida.agregar("Planillas_Zacapa/b.pdf", b"b", espejo=False)
+    with open(tmp_path / "unido.tmp", "w+b") as archivo:
+        archivo.write(b"unido")
+        zip_salida.agregar_archivo("Planillas_Zacapa/unido.pdf", archivo)
+
+    assert (espejo / "Planillas_Zacapa" / "a.pdf").read_bytes() == b"a"
+    assert not (espejo / "Planillas_Zacapa" / "b.pdf").exists()
+    assert (espejo / "Planillas_Zacapa" / "unido.pdf").read_bytes() == b"unido"
+
+    copia = zip_salida.guardar(str(espejo / "Planillas.zip"))
+    with zipfile.ZipFile(copia) as zf:
+        assert zf.namelist() == ["Planillas_Zacapa/a.pdf", "Planillas_Zacapa/b.pdf", "Planillas_Zacapa/unido.pdf"]
+        assert zf.read("Planillas_Zacapa/unido.pdf") == b"unido"
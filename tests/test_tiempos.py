@@ -0,0 +1,38 @@
+import json
+
+import tiempos
+
+
+def test_sin_medicion_no_mide_nada():
+    assert not tiempos.midiendo()
+    with tiempos.etapa("plantilla"):
+        pass
+    tiempos.anotar(bytes_pdf=10)
+    tiempos.sumar({"etapas": {"plantilla": 1.0}})
+
+
+def test_etapas_de_trabajadores_aparte_del_reloj():
+    with tiempos.medicion(comunidad="(lote)") as medida:
+        with tiempos.etapa("cerrar zip"):
+            pass
+        # Dos comunidades en dos procesos a la vez: la suma pasa del tiempo de reloj
+        tiempos.sumar({"etapas": {"llenar hojas": 3.0, "pdf directo": 1.0}})
+        tiempos.sumar({"etapas": {"llenar hojas": 3.0}})
+    registro = medida.registro()
+
+    assert list(registro["etapas"]) == ["cerrar zip"]
+    assert registro["etapas_trabajadores"] == {"llenar hojas": 6.0, "pdf directo": 1.0}
+    filas = {(fila["etapa"], fila["medido"]): fila for fila in tiempos.tabla(registro)}
+    assert filas[("llenar hojas", "suma de trabajadores")]["%"] == 85.7
+    assert all(fila["%"] <= 100 for fila in filas.values())
+
+
+def test_registrar_en_la_carpeta_de_salida(tmp_path):
+    with tiempos.medicion(comunidad="Aldea Uno", tipo="entrega") as medida:
+        tiempos.anotar(bytes_pdf=10)
+        tiempos.anotar(bytes_pdf=5)
+    tiempos.registrar(str(tmp_path / "Planillas_Zacapa_DAPCA-001-2025"), medida)
+
+    lineas = (tmp_path / "Planillas_Zacapa_DAPCA-001-2025" / tiempos.NOMBRE_REGISTRO).read_text(encoding="utf-8")
+    registro = json.loads(lineas)
+    assert (registro["comunidad"], registro["bytes_pdf"]) == ("Aldea Uno", 15)
@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+import trabajos
+from salida import temporal
+
+
+def _esperar(trabajo):
+    limite = time.monotonic() + 10
+    while not trabajo.terminado:
+        assert time.monotonic() < limite
+        time.sleep(0.01)
+
+
+@pytest.fixture(autouse=True)
+def sin_trabajos():
+    yield
+    for trabajo in list(trabajos.de_sesion("prueba")):
+        trabajos.quitar(trabajo.id)
+
+
+def _zip():
+    archivo_zip = temporal()
+    archivo_zip.write(b"PK")
+    return archivo_zip
+
+
+def _generar(trabajo, archivo_zip):
+    trabajo.agregar_archivo("planilla.pdf", b"%PDF", "application/pdf")
+    trabajo.agregar_temporal("Planillas.zip", archivo_zip, "application/zip")
+    return "ok"
+
+
+def test_archivos_disponibles_hasta_quitar_el_trabajo():
+    archivo_zip = _zip()
+    trabajo = trabajos.enviar(_generar, archivo_zip, sesion="prueba")
+    _esperar(trabajo)
+
+    assert trabajo.estado == trabajos.LISTO
+    assert trabajo.resultado == "ok"
+    assert [archivo.nombre for archivo in trabajo.archivos] == ["planilla.pdf", "Planillas.zip"]
+    assert trabajo.archivos[0].leer() == b"%PDF"
+    assert trabajo.archivos[1].leer() == b"PK"
+    assert trabajo.archivos[1].leer() == b"PK"  # se puede volver a descargar
+
+    contenidos = [archivo.contenido for archivo in trabajo.archivos]
+    trabajos.quitar(trabajo.id)
+    assert all(contenido.closed for contenido in contenidos)
+    assert archivo_zip.closed
+
+
+def test_archivo_descargado_vence(monkeypatch):
+    trabajo = trabajos.enviar(_generar, _zip(), sesion="prueba")
+    _esperar(trabajo)
+
+    descargado = trabajo.archivos[0]
+    descargado.leer()
+    trabajos._limpiar()
+    assert descargado in trabajo.archivos
+
+    monkeypatch.setattr(trabajos, "RETENCION_DESCARGADO", -1)
+    trabajos._limpiar()
+    assert [archivo.nombre for archivo in trabajo.archivos] == ["Planillas.zip"]
+    assert descargado.contenido.closed
+
+
+def test_error_queda_en_el_trabajo():
+    def fallar(trabajo):
+        raise ValueError("sin plantilla")
+
+    trabajo = trabajos.enviar(fallar, sesion="prueba")
+    _esperar(trabajo)
+    assert trabajo.estado == trabajos.ERROR
+    assert trabajo.error == "ValueError: sin plantilla"
@@ -0,0 +1,147 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# Tiempos por etapa de una generación. El código de generación marca sus etapas con
+#
+#   with tiempos.etapa("guardar xlsx"):
+#       ...
+#   tiempos.anotar(bytes_xlsx=len(datos))
+#
+# y quien genera decide si se miden abriendo una medición:
+#
+#   with tiempos.medicion(comunidad="Aldea Uno", tipo="entrega") as medida:
+#       generar_planilla(...)
+#   medida.etapas  ->  [("plantilla", 0.41), ("copiar hojas", 1.2), ...]
+#
+# Sin una medición abierta en el hilo, etapa() devuelve siempre el mismo contexto
+# vacío y anotar() no hace nada: medir desactivado cuesta una búsqueda de atributo.
+
+NOMBRE_REGISTRO = "tiempos.jsonl"
+
+_local = threading.local()
+_NULO = nullcontext()
+
+
+class Medicion:
+    def __init__(self, **datos):
+        self.datos = datos  # comunidad, tipo, páginas, bytes, etc.
+        self.etapas = []    # (etapa, segundos) en el orden en que terminan
+        self.hijas = []     # registros de mediciones hechas en otros procesos (ver sumar)
+        self.inicio = time.perf_counter()
+        self.total = None
+
+    @contextmanager
+    def etapa(self, nombre):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.etapas.append((nombre, time.perf_counter() - inicio))
+
+    # Segundos por etapa, sumando las que se repiten (p. ej. una por tipo de planilla)
+    def por_etapa(self):
+        return _sumar_etapas(self.etapas)
+
+    # Segundos por etapa de las mediciones hijas, sumados entre todas. Los trabajadores
+    # corren a la vez, así que es tiempo de proceso: con varios puede pasar del total
+    def por_etapa_hijas(self):
+        return _sumar_etapas(etapa for hija in self.hijas for etapa in hija["etapas"].items())
+
+    def registro(self):
+        registro = {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            **self.datos,
+            "total": round(self.total if self.total is not None else time.perf_counter() - self.inicio, 4),
+            "etapas": {nombre: round(segundos, 4) for nombre, segundos in self.por_etapa().items()},
+        }
+        if self.hijas:
+            registro["etapas_trabajadores"] = {nombre: round(segundos, 4)
+                                               for nombre, segundos in self.por_etapa_hijas().items()}
+        return registro
+
+
+def _sumar_etapas(etapas):
+    sumas = {}
+    for nombre, segundos in etapas:
+        sumas[nombre] = sumas.get(nombre, 0.0) + segundos
+    return sumas
+
+
+# Abre una medición en este hilo; las etapas marcadas mientras dure quedan en ella.
+# Con `activa=False` no mide nada (para encenderla o apagarla desde la interfaz).
+@contextmanager
+def medicion(activa=True, **datos):
+    if not activa:
+        yield None
+        return
+    anterior = getattr(_local, "medicion", None)
+    medida = Medicion(**datos)
+    _local.medicion = medida
+    try:
+        yield medida
+    finally:
+        medida.total = time.perf_counter() - medida.inicio
+        _local.medicion = anterior
+
+
+def etapa(nombre):
+    medida = getattr(_local, "medicion", None)
+    return _NULO if medida is None else medida.etapa(nombre)
+
+
+# Agrega datos a la medición en curso (páginas, bytes...); los números se suman
+def anotar(**datos):
+    medida = getattr(_local, "medicion", None)
+    if medida is None:
+        return
+    for clave, valor in datos.items():
+        if isinstance(valor, (int, float)) and isinstance(medida.datos.get(clave), (int, float)):
+            medida.datos[clave] += valor
+        else:
+            medida.datos[clave] = valor
+
+
+def midiendo():
+    return getattr(_local, "medicion", None) is not None
+
+
+# Suma a la medición en curso el registro de una medición hecha en otro proceso (p. ej.
+# una comunidad de un lote). El registro queda en `hijas` y sus etapas se acumulan
+# aparte de las propias (ver Medicion.por_etapa_hijas), que son tiempo de reloj
+def sumar(registro):
+    medida = getattr(_local, "medicion", None)
+    if medida is None:
+        return
+    medida.hijas.append(registro)
+
+
+# Agrega una línea JSON por medición al registro tiempos.jsonl de `carpeta`, la de
+# salida de la corrida medida
+def registrar(carpeta, *mediciones):
+    try:
+        os.makedirs(carpeta, exist_ok=True)
+        with open(os.path.join(carpeta, NOMBRE_REGISTRO), "a", encoding="utf-8") as f:
+            for medida in mediciones:
+                registro = medida if isinstance(medida, dict) else medida.registro()
+                f.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+    except OSError:
+        pass  # Sin registro en disco la generación sigue igual
+
+
+# Filas para mostrar en una tabla: etapa, cómo se midió, segundos y porcentaje. Las
+# etapas propias son tiempo de reloj y su % es del total; las de los trabajadores son
+# la suma de todos los procesos y su % es de esa suma, no del total
+def tabla(medida):
+    registro = medida if isinstance(medida, dict) else medida.registro()
+    total = registro["total"] or 1.0
+    filas = [{"etapa": nombre, "medido": "reloj", "segundos": segundos, "%": round(100 * segundos / total, 1)}
+             for nombre, segundos in registro["etapas"].items()]
+    trabajadores = registro.get("etapas_trabajadores") or {}
+    suma = sum(trabajadores.values()) or 1.0
+    filas.extend({"etapa": nombre, "medido": "suma de trabajadores", "segundos": segundos,
+                  "%": round(100 * segundos / suma, 1)} for nombre, segundos in trabajadores.items())
+    return filas
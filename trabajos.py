@@ -0,0 +1,289 @@
+import os
+import shutil
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from salida import temporal
+
+# Cola de trabajos en segundo plano para la app. La generación corre en hilos del
+# servidor, fuera del script de Streamlit: la interfaz sigue respondiendo, un rerun
+# (cualquier widget) no corta el trabajo, varios usuarios generan a la vez y los
+# archivos terminados quedan disponibles entre reruns hasta que vencen. Cada archivo
+# es un temporal (ver salida.temporal: en memoria si es chico, en disco si no); la
+# descarga lo lee recién cuando se pide y se borra al vencer o al quitar el trabajo.
+#
+#   trabajo = trabajos.enviar(generar, tipo, datos, descripcion="Planilla de entrega", sesion=sesion)
+#
+# `generar(trabajo, tipo, datos)` recibe el trabajo como primer argumento para
+# informar avance (trabajo.progreso), revisar si lo cancelaron (trabajo.cancelado()
+# o trabajo.verificar()) y dejar archivos para descargar (trabajo.agregar_archivo con
+# bytes o un archivo que se copia, trabajo.agregar_temporal con un temporal que pasa
+# a ser del trabajo).
+
+# Trabajos que corren a la vez en este proceso; los demás esperan en cola
+MAX_SIMULTANEOS = int(os.environ.get("PLANILLAS_TRABAJOS", "2"))
+# Segundos que un trabajo terminado (y sus archivos) se conserva, y cuántos como máximo
+RETENCION = 15 * 60
+MAX_TERMINADOS = 20
+# Segundos que un archivo ya descargado sigue disponible (por si la descarga falló)
+RETENCION_DESCARGADO = 2 * 60
+
+EN_COLA = "en cola"
+EN_CURSO = "en curso"
+LISTO = "listo"
+ERROR = "error"
+CANCELADO = "cancelado"
+TERMINADOS = (LISTO, ERROR, CANCELADO)
+
+
+class Cancelado(Exception):
+    pass
+
+
+# Archivo de un trabajo, en un temporal hasta que se descarga y vence
+class Archivo:
+    def __init__(self, nombre, contenido, mime):
+        self.id = uuid.uuid4().hex
+        self.nombre = nombre
+        self.contenido = contenido  # temporal abierto, ver salida.temporal
+        self.mime = mime
+        self.descargado = None  # hora de la primera descarga
+        self._lock = threading.Lock()
+
+    # Contenido para st.download_button, que la llama recién al hacer clic
+    def leer(self):
+        with self._lock:
+            self.contenido.seek(0)
+            datos = self.contenido.read()
+        if self.descargado is None:
+            self.descargado = time.time()
+        return datos
+
+    def vencido(self, ahora):
+        return self.descargado is not None and ahora - self.descargado > RETENCION_DESCARGADO
+
+    def borrar(self):
+        with self._lock:
+            self.contenido.close()
+
+
+class Trabajo:
+    def __init__(self, descripcion, sesion):
+        self.id = uuid.uuid4().hex
+        self.descripcion = descripcion
+        self.sesion = sesion
+        self.estado = EN_COLA
+        self.completados = 0
+        self.total = 0
+        self.mensaje = ""
+        self.archivos = []  # Archivo, en el orden en que se agregaron
+        self.resultado = None
+        self.error = None
+        self.detalle = None
+        self.creado = time.time()
+        self.inicio = None
+        self.fin = None
+        self._cancelar = threading.Event()
+        self._futuro = None
+
+    @property
+    def terminado(self):
+        return self.estado in TERMINADOS
+
+    @property
+    def fraccion(self):
+        if self.estado == LISTO:
+            return 1.0
+        return self.completados / self.total if self.total else 0.0
+
+    @property
+    def segundos(self):
+        if self.inicio is None:
+            return 0.0
+        return (self.fin or time.time()) - self.inicio
+
+    # Firma compatible con los `progreso` de generar_lote y convertir_lote
+    def progreso(self, completados, total, mensaje=""):
+        self.completados, self.total, self.mensaje = completados, total, str(mensaje)
+
+    def cancelado(self):
+        return self._cancelar.is_set()
+
+    def verificar(self):
+        if self._cancelar.is_set():
+            raise Cancelado()
+
+    # `datos` son bytes o un archivo abierto, que se copia por partes. Se puede llamar
+    # mientras el trabajo corre: el panel ofrece cada archivo apenas llega
+    def agregar_archivo(self, nombre, datos, mime="application/octet-stream"):
+        contenido = temporal()
+        if isinstance(datos, (bytes, bytearray)):
+            contenido.write(datos)
+        else:
+            shutil.copyfileobj(datos, contenido, 1024 * 1024)
+        self.agregar_temporal(nombre, contenido, mime)
+
+    # Agrega un temporal ya escrito (p. ej. el ZIP de un lote) sin copiarlo; pasa a ser
+    # del trabajo y se cierra con él
+    def agregar_temporal(self, nombre, contenido, mime="application/octet-stream"):
+        self.archivos.append(Archivo(nombre, contenido, mime))
+
+    # Borra los archivos descargados hace más de RETENCION_DESCARGADO
+    def vencer(self, ahora):
+        for archivo in [a for a in self.archivos if a.vencido(ahora)]:
+            archivo.borrar()
+            self.archivos.remove(archivo)
+
+    # Borra todos los archivos del trabajo
+    def borrar(self):
+        archivos, self.archivos = self.archivos, []
+        for archivo in archivos:
+            archivo.borrar()
+
+    # Un trabajo en cola se cancela de inmediato; uno en curso se detiene en su
+    # próximo punto de revisión (p. ej. al terminar la comunidad que está generando)
+    def cancelar(self):
+        self._cancelar.set()
+        if self._futuro is not None and self._futuro.cancel():
+            self.estado = CANCELADO
+            self.fin = time.time()
+
+
+_trabajos = {}
+_lock = threading.Lock()
+_executor = None
+
+
+def _ejecutor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_SIMULTANEOS, thread_name_prefix="trabajo")
+        return _executor
+
+
+def _correr(trabajo, funcion, args, kwargs):
+    trabajo.estado = EN_CURSO
+    trabajo.inicio = time.time()
+    try:
+        trabajo.verificar()
+        trabajo.resultado = funcion(trabajo, *args, **kwargs)
+        trabajo.estado = CANCELADO if trabajo.cancelado() else LISTO
+    except Cancelado:
+        trabajo.estado = CANCELADO
+    except Exception as e:
+        trabajo.error = f"{type(e).__name__}: {e}"
+        trabajo.detalle = traceback.format_exc()
+        trabajo.estado = ERROR
+    finally:
+        trabajo.fin = time.time()
+        # Quitado mientras corría: nadie va a descargar lo que dejó
+        with _lock:
+            quitado = trabajo.id not in _trabajos
+        if quitado:
+            trabajo.borrar()
+
+
+# Descarta (con sus archivos) los trabajos terminados que vencieron o que exceden
+# MAX_TERMINADOS, y los archivos ya descargados que vencieron
+def _limpiar():
+    ahora = time.time()
+    descartados = []
+    with _lock:
+        terminados = sorted((t for t in _trabajos.values() if t.terminado), key=lambda t: t.fin or 0, reverse=True)
+        for posicion, trabajo in enumerate(terminados):
+            if posicion >= MAX_TERMINADOS or ahora - (trabajo.fin or ahora) > RETENCION:
+                descartados.append(_trabajos.pop(trabajo.id))
+            else:
+                trabajo.vencer(ahora)
+    for trabajo in descartados:
+        trabajo.borrar()
+
+
+# Encola funcion(trabajo, *args, **kwargs); devuelve el Trabajo para seguirlo
+def enviar(funcion, *args, descripcion="", sesion=None, **kwargs):
+    _limpiar()
+    trabajo = Trabajo(descripcion, sesion)
+    with _lock:
+        _trabajos[trabajo.id] = trabajo
+    trabajo._futuro = _ejecutor().submit(_correr, trabajo, funcion, args, kwargs)
+    return trabajo
+
+
+def obtener(id_trabajo):
+    with _lock:
+        return _trabajos.get(id_trabajo)
+
+
+# Trabajos de una sesión, del más reciente al más antiguo
+def de_sesion(sesion):
+    with _lock:
+        return sorted((t for t in _trabajos.values() if t.sesion == sesion), key=lambda t: t.creado, reverse=True)
+
+
+def quitar(id_trabajo):
+    with _lock:
+        trabajo = _trabajos.pop(id_trabajo, None)
+    if trabajo is None:
+        return
+    if trabajo.terminado:
+        trabajo.borrar()
+    else:
+        trabajo.cancelar()  # sus archivos se borran al detenerse (ver _correr)
+
+
+# Identificador de la sesión de Streamlit del usuario (se crea la primera vez)
+def sesion_actual():
+    import streamlit as st
+    if "sesion_trabajos" not in st.session_state:
+        st.session_state["sesion_trabajos"] = uuid.uuid4().hex
+    return st.session_state["sesion_trabajos"]
+
+
+def _mostrar_trabajo(st, trabajo, al_terminar):
+    with st.container(border=True):
+        st.markdown(f"**{trabajo.descripcion}** — {trabajo.estado} ({trabajo.segundos:.0f} s)")
+        if not trabajo.terminado:
+            st.progress(trabajo.fraccion, text=trabajo.mensaje or None)
+            if st.button("Cancelar", key=f"cancelar-{trabajo.id}", disabled=trabajo.cancelado()):
+                trabajo.cancelar()
+        elif trabajo.estado == ERROR:
+            st.error(trabajo.error)
+        if trabajo.terminado and al_terminar:
+            al_terminar(trabajo)
+        # Los archivos se ofrecen apenas llegan, aunque el trabajo siga corriendo
+        for archivo in list(trabajo.archivos):
+            st.download_button(f"Descargar {archivo.nombre}", data=archivo.leer, file_name=archivo.nombre,
+                               mime=archivo.mime, key=f"descargar-{trabajo.id}-{archivo.id}")
+            if archivo.descargado is not None:
+                st.caption(f"{archivo.nombre} ya se descargó; se borra en unos minutos.")
+        if trabajo.terminado:
+            if st.button("Quitar", key=f"quitar-{trabajo.id}"):
+                quitar(trabajo.id)
+                st.rerun(scope="fragment")
+
+
+# Panel con los trabajos de la sesión. Mientras haya alguno sin terminar se
+# actualiza solo cada `intervalo` segundos (como fragmento, sin rerun del script).
+# `al_terminar(trabajo)` muestra lo propio de cada tipo de trabajo (p. ej. un resumen).
+def panel(sesion=None, intervalo=1.0, al_terminar=None):
+    import streamlit as st
+    sesion = sesion or sesion_actual()
+    activos = any(not t.terminado for t in de_sesion(sesion))
+
+    @st.fragment(run_every=intervalo if activos else None)
+    def _panel():
+        _limpiar()
+        lista = de_sesion(sesion)
+        if lista:
+            st.markdown("### Trabajos")
+        for trabajo in lista:
+            _mostrar_trabajo(st, trabajo, al_terminar)
+        # Al terminar el último, un rerun completo deja de consultar el estado
+        if activos and not any(not t.terminado for t in lista):
+            st.rerun()
+
+    _panel()